@@ -0,0 +1,236 @@
+"""Read-only JSON API (v1) over the core tables, for bulk sync clients.
+
+Every resource is one table with a whitelist of fields. A list request can
+combine:
+
+- ids=1,2,3          batch lookup of up to MAX_IDS rows by id (one page,
+                     unless a smaller limit is given)
+- fields=a,b         only these columns are selected (id is always included)
+- <filter>=v[,v...]  per-resource filters, e.g. marks?student_id=4,5,6
+- since=<timestamp>  rows created, changed or deleted at or after it
+- after=<cursor>     keyset pagination; `next` in each response is the cursor
+                     for the following page (null on the last one)
+- limit=N            page size, up to MAX_LIMIT
+
+Pages are keyed on id, or on (updated_at, id) with `since`, through the same
+pagination.fetch_page() the HTML lists use. A `since` page interleaves the
+changed rows with the tombstones that record_deletes() left in deleted_rows
+(by deleted_at), and reports the latter as `deleted` ids. `since` responses
+also carry `synced_at`, the database clock when the page was read: pass it as
+the next run's `since` once the last page is fetched. A `since` with a UTC
+offset is converted to the database's clock first.
+"""
+import gzip
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from pagination import fetch_page
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_IDS = 1000
+GZIP_LEVEL = 6
+
+
+class ApiError(ValueError):
+    pass
+
+
+def _ints(value):
+    try:
+        ids = [int(v) for v in str(value).split(',') if v.strip()]
+    except ValueError:
+        raise ApiError(f"expected comma-separated integers, not {value!r}")
+    if len(ids) > MAX_IDS:
+        raise ApiError(f"at most {MAX_IDS} values per list")
+    return ids
+
+
+def _dates(value):
+    try:
+        return [date.fromisoformat(v.strip()) for v in str(value).split(',') if v.strip()]
+    except ValueError:
+        raise ApiError(f"expected YYYY-MM-DD dates, not {value!r}")
+
+
+def _strings(value):
+    return [v for v in str(value).split(',') if v]
+
+
+class Resource:
+    """
+    fields  -- field name -> SQL column, in the order they are returned
+    filters -- query arg -> (column, parser returning a list of values)
+    """
+
+    def __init__(self, table, fields, filters=None):
+        self.table = table
+        self.fields = fields
+        self.filters = filters or {}
+
+    def select_fields(self, value):
+        if not value:
+            return list(self.fields)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"unknown field(s) {', '.join(unknown)}; "
+                           f"{self.table} has {', '.join(self.fields)}")
+        return ['id'] + [name for name in names if name != 'id']
+
+
+RESOURCES = {
+    'students': Resource('students', {
+        'id': 'id', 'student_id': 'student_id', 'first_name': 'first_name', 'last_name': 'last_name',
+        'email': 'email', 'phone': 'phone', 'address': 'address', 'program': 'program',
+        'semester': 'semester', 'created_at': 'created_at', 'updated_at': 'updated_at',
+    }, {'program': ('program', _strings), 'semester': ('semester', _strings)}),
+    'subjects': Resource('subjects', {
+        'id': 'id', 'code': 'code', 'name': 'name', 'credits': 'credits',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }, {'code': ('code', _strings)}),
+    'enrollments': Resource('enrollments', {
+        'id': 'id', 'student_id': 'student_id', 'subject_id': 'subject_id',
+        'enrollment_date': 'enrollment_date', 'updated_at': 'updated_at',
+    }, {'student_id': ('student_id', _ints), 'subject_id': ('subject_id', _ints)}),
+    'marks': Resource('marks', {
+        'id': 'id', 'student_id': 'student_id', 'subject_id': 'subject_id', 'marks': 'marks',
+        'max_marks': 'max_marks', 'exam_date': 'exam_date', 'version': 'version',
+        'updated_at': 'updated_at',
+    }, {'student_id': ('student_id', _ints), 'subject_id': ('subject_id', _ints),
+        'exam_date': ('exam_date', _dates)}),
+    'attendance': Resource('attendance', {
+        'id': 'id', 'student_id': 'student_id', 'subject_id': 'subject_id', 'date': 'date',
+        'status': 'status', 'updated_at': 'updated_at',
+    }, {'student_id': ('student_id', _ints), 'subject_id': ('subject_id', _ints),
+        'date': ('date', _dates)}),
+}
+
+
+# Child rows the database removes through ON DELETE CASCADE, by parent table.
+CASCADES = {
+    'students': (('enrollments', 'student_id'), ('marks', 'student_id'), ('attendance', 'student_id')),
+    'subjects': (('enrollments', 'subject_id'), ('marks', 'subject_id'), ('attendance', 'subject_id')),
+}
+
+
+def record_deletes(cursor, table, where, params):
+    """Tombstone the rows of `table` matching `where`, and the rows that
+    cascade from them, in the caller's transaction before it deletes them."""
+    for child, column in CASCADES.get(table, ()):
+        cursor.execute(f"""
+            INSERT INTO deleted_rows (resource, row_id)
+            SELECT %s, id FROM {child} WHERE {column} IN (SELECT id FROM {table} WHERE {where})
+        """, [child, *params])
+    cursor.execute(f"INSERT INTO deleted_rows (resource, row_id) SELECT %s, id FROM {table} WHERE {where}",
+                   [table, *params])
+
+
+def parse_since(value):
+    """A naive timestamp, or an aware one if `value` has a UTC offset."""
+    if not value:
+        return None
+    try:
+        since = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ApiError(f"since must be an ISO timestamp, not {value!r}")
+    return since.replace(microsecond=0)
+
+
+def to_db_time(since, db_now):
+    """`since` on the database's clock, given what the database says it is now.
+
+    TIMESTAMP columns compare in the connection's time zone (UTC on SQLite);
+    its offset is taken from db_now, rounded to the quarter hour.
+    """
+    if since.tzinfo is None:
+        return since
+    utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    offset = timedelta(minutes=round((db_now - utc_now).total_seconds() / 900) * 15)
+    return since.astimezone(timezone.utc).replace(tzinfo=None) + offset
+
+
+def page_limit(value):
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError(f"limit must be an integer, not {value!r}")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def fetch(cursor, resource, args, after=None):
+    """One page of `resource` for the request args.
+
+    Returns (rows, deleted ids, Page, synced_at); deleted ids and synced_at
+    are only filled in for `since` requests.
+    """
+    fields = resource.select_fields(args.get('fields'))
+    since = parse_since(args.get('since'))
+    where, params = [], []
+    ids = None
+    if args.get('ids'):
+        ids = _ints(args['ids'])
+        where.append(f"id IN ({','.join(['%s'] * len(ids))})")
+        params.extend(ids)
+    # An ids lookup fits one page unless the client asks for smaller ones.
+    limit = page_limit(args.get('limit')) if args.get('limit') or not ids else len(ids)
+    for name, (column, parse) in resource.filters.items():
+        if args.get(name):
+            values = parse(args[name])
+            where.append(f"{column} IN ({','.join(['%s'] * len(values))})")
+            params.extend(values)
+
+    columns = ', '.join(f"{resource.fields[name]} AS {name}" for name in fields)
+    if since is None:
+        page = fetch_page(cursor, f"SELECT {columns}, id AS sort_value FROM {resource.table}",
+                          where, params, 'id', 'sort_value', after=after, limit=limit)
+        return [{name: plain(row[name]) for name in fields} for row in page.rows], [], page, None
+
+    cursor.execute("SELECT CURRENT_TIMESTAMP")
+    row = cursor.fetchone()
+    synced_at = next(iter(row.values())) if isinstance(row, dict) else row[0]
+    if isinstance(synced_at, str):
+        synced_at = datetime.fromisoformat(synced_at)
+    since = to_db_time(since, synced_at)
+
+    # Tombstones carry only an id; the filters on other columns can't apply.
+    gone = ', '.join('row_id AS id' if name == 'id' else f"NULL AS {name}" for name in fields)
+    gone_where, gone_params = ["resource = %s", "deleted_at >= %s"], [resource.table, since]
+    if ids:
+        gone_where.append(f"row_id IN ({','.join(['%s'] * len(ids))})")
+        gone_params.extend(ids)
+    changes = (f"SELECT * FROM ("
+               f"SELECT {columns}, updated_at AS sort_value, 0 AS deleted FROM {resource.table} "
+               f"WHERE {' AND '.join(where + ['updated_at >= %s'])} "
+               f"UNION ALL "
+               f"SELECT {gone}, deleted_at AS sort_value, 1 AS deleted FROM deleted_rows "
+               f"WHERE {' AND '.join(gone_where)}) changes")
+    page = fetch_page(cursor, changes, [], [*params, since, *gone_params],
+                      'sort_value', 'sort_value', after=after, limit=limit)
+    rows = [{name: plain(row[name]) for name in fields} for row in page.rows if not row['deleted']]
+    deleted = [row['id'] for row in page.rows if row['deleted']]
+    return rows, deleted, page, synced_at
+
+
+def compress(response, accepts_gzip, min_size=1024):
+    """gzip a buffered response in place if the client accepts it and it is worth it."""
+    response.vary.add('Accept-Encoding')
+    if (not accepts_gzip or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.status_code < 200):
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(gzip.compress(body, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -1,25 +1,435 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from datetime import datetime
-import mysql.connector
-from mysql.connector import Error
+from flask import (Flask, render_template, request, redirect, url_for, flash, g, jsonify, session,
+                   make_response, stream_with_context, has_app_context, has_request_context,
+                   before_render_template, template_rendered)
+from datetime import date, datetime
+import io
+import json
+import threading
+import time
+import click
+import functools
 import os
 
+from db import ConnectionPool, PoolTimeout
+from storage import Error, StorageError
+import storage
+from pagination import fetch_page, paginate_rows, decode_cursor, page_size
+from catalog import SubjectCatalog, FileSignal
+from student_profile import ChangeTracker, load_profile
+from grading import GradeCache
+import grading
+from search import StudentIndex
+import search
+from rollups import Rollups
+import rollups
+import gradebook
+import api
+import archive
+import importer
+import attendance
+import migrate
+import exports
+import metrics
+import routing
+from routing import replica_reads
+
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
+app.config.update(
+    # 'mysql', or 'sqlite' for an embedded database file at SQLITE_PATH.
+    DB_BACKEND=os.environ.get('DB_BACKEND', 'mysql'),
+    SQLITE_PATH=os.environ.get('SQLITE_PATH', os.path.join(app.root_path, 'student_management.db')),
+    DB_HOST=os.environ.get('DB_HOST', 'localhost'),
+    DB_PORT=int(os.environ.get('DB_PORT', 3306)),
+    DB_USER=os.environ.get('DB_USER', 'root'),         # Default user for XAMPP
+    DB_PASSWORD=os.environ.get('DB_PASSWORD', ''),     # Leave blank if not set
+    DB_NAME=os.environ.get('DB_NAME', 'student_management'),  # Ensure this DB exists in phpMyAdmin
+    DB_POOL_MIN=int(os.environ.get('DB_POOL_MIN', 2)),
+    DB_POOL_MAX=int(os.environ.get('DB_POOL_MAX', 10)),
+    DB_POOL_TIMEOUT=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    DB_POOL_MAX_USES=int(os.environ.get('DB_POOL_MAX_USES', 1000)),
+    DB_POOL_MAX_AGE=float(os.environ.get('DB_POOL_MAX_AGE', 3600)),
+    SUBJECT_CACHE_TTL=float(os.environ.get('SUBJECT_CACHE_TTL', 300)),
+    # Shared file touched on subject writes so every worker drops its copy.
+    SUBJECT_CACHE_SIGNAL=os.environ.get('SUBJECT_CACHE_SIGNAL'),
+    # Same idea for student profile ETags, but always on: CLI commands write
+    # from another process, and a missed bump would keep answering 304.
+    PROFILE_CHANGE_SIGNAL=os.environ.get('PROFILE_CHANGE_SIGNAL',
+                                         os.path.join(app.instance_path, 'profile-changes.signal')),
+    # Worker processes serving the app (gunicorn reads WEB_CONCURRENCY too).
+    WEB_WORKERS=int(os.environ.get('WEB_WORKERS', os.environ.get('WEB_CONCURRENCY', 1))),
+    # Read replicas as "host:port,host:port"; same user, password and database.
+    # Locally a second MySQL/MariaDB instance (e.g. DB_REPLICAS=127.0.0.1:3307) will do.
+    DB_REPLICAS=os.environ.get('DB_REPLICAS', ''),
+    DB_REPLICA_MAX_LAG=float(os.environ.get('DB_REPLICA_MAX_LAG', 5)),
+    DB_REPLICA_CHECK_INTERVAL=float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5)),
+    DB_REPLICA_COOLDOWN=float(os.environ.get('DB_REPLICA_COOLDOWN', 30)),
+    DB_PRIMARY_PIN_SECONDS=float(os.environ.get('DB_PRIMARY_PIN_SECONDS', 10)),
+    # 'rows' (one attendance row per class) or 'bitmap' (per-term bitsets);
+    # run `flask attendance-store convert` before switching to 'bitmap'.
+    ATTENDANCE_STORE=os.environ.get('ATTENDANCE_STORE', 'rows'),
+    SLOW_QUERY_SECONDS=float(os.environ.get('SLOW_QUERY_SECONDS', 0.25)),
+    # Append every distinct SELECT shape (with sample params) to this file,
+    # for `flask db check --queries`; meant for test and benchmark runs.
+    QUERY_LOG_PATH=os.environ.get('QUERY_LOG_PATH'),
+    # Cohort GPA/rank results; marks writes drop the affected cohort early.
+    GRADES_CACHE_TTL=float(os.environ.get('GRADES_CACHE_TTL', 600)),
+    GRADES_CACHE_SIGNAL=os.environ.get('GRADES_CACHE_SIGNAL'),
+    # Shared file so a student write in one worker reindexes the others.
+    STUDENT_SEARCH_SIGNAL=os.environ.get('STUDENT_SEARCH_SIGNAL'),
+    # Dashboard buckets are re-read from the database this often, and at once
+    # in every worker when ROLLUP_SIGNAL is shared.
+    ROLLUP_REFRESH_SECONDS=float(os.environ.get('ROLLUP_REFRESH_SECONDS', 300)),
+    ROLLUP_SIGNAL=os.environ.get('ROLLUP_SIGNAL'),
+    # Each /dashboard/stream connection holds a worker thread; browsers
+    # reconnect on their own when it is closed after this long.
+    DASHBOARD_STREAM_SECONDS=float(os.environ.get('DASHBOARD_STREAM_SECONDS', 300)),
+    DASHBOARD_HEARTBEAT_SECONDS=float(os.environ.get('DASHBOARD_HEARTBEAT_SECONDS', 15)),
+    # /api/v1 responses at least this large are gzipped for clients that accept it.
+    API_GZIP_MIN_BYTES=int(os.environ.get('API_GZIP_MIN_BYTES', 1024)),
+)
+
+attendance.use_store(app.config['ATTENDANCE_STORE'])
+
 # -------------------- DATABASE CONNECTION --------------------
-def get_db_connection():
+backend = storage.backend_from_config(app.config)
+_pool = None
+_replicas = None
+_pool_lock = threading.Lock()
+
+def _connect(host=None, port=None):
+    return backend.connect(host, port)
+
+def _new_pool(connect):
+    return ConnectionPool(
+        connect,
+        min_size=app.config['DB_POOL_MIN'],
+        max_size=app.config['DB_POOL_MAX'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        max_uses=app.config['DB_POOL_MAX_USES'],
+        max_age=app.config['DB_POOL_MAX_AGE'],
+        wrap_cursor=_instrument_cursor,
+    )
+
+def get_pool():
+    """Create the process-wide pool on first use (after any fork by the WSGI server)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(_connect)
+    return _pool
+
+def get_replicas():
+    """The read replicas from DB_REPLICAS (empty when none are configured)."""
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                hosts = routing.parse_hosts(app.config['DB_REPLICAS'], app.config['DB_PORT'])
+                if hosts and not backend.supports_replicas:
+                    app.logger.warning("DB_REPLICAS ignored: the %s backend has no replicas", backend.name)
+                    hosts = []
+                _replicas = routing.ReplicaSet(
+                    [(f"{host}:{port}", _new_pool(functools.partial(_connect, host, port)))
+                     for host, port in hosts],
+                    max_lag=app.config['DB_REPLICA_MAX_LAG'],
+                    check_interval=app.config['DB_REPLICA_CHECK_INTERVAL'],
+                    cooldown=app.config['DB_REPLICA_COOLDOWN'],
+                    errors=Error + (PoolTimeout,),
+                )
+    return _replicas
+
+def _wants_replica():
+    if not has_request_context() or request.method not in routing.SAFE_METHODS:
+        return False
+    view = app.view_functions.get(request.endpoint)
+    if not getattr(view, 'replica_ok', False):
+        return False
+    return bool(get_replicas()) and not routing.pinned_to_primary(session)
+
+def _acquire(primary=False):
+    started = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",        # Default user for XAMPP
-            password="",        # Leave blank if not set
-            database="student_management"  # Ensure this DB exists in phpMyAdmin
-        )
-        return connection
-    except Error as e:
-        print(f"❌ Database connection failed: {e}")
-        return None
+        if not primary and _wants_replica():
+            replica, conn = get_replicas().acquire()
+            if conn is not None:
+                return conn, replica.name
+        return get_pool().acquire(), None
+    finally:
+        elapsed = time.perf_counter() - started
+        CONN_ACQUIRE.observe(elapsed)
+        stats = _request_stats()
+        if stats is not None:
+            stats.acquire_time += elapsed
+
+def get_db_connection(primary=False):
+    """Return this request's pooled connection, borrowing one on first call.
+
+    Views marked @replica_reads get a replica connection on GET unless the
+    user wrote recently; pass primary=True for reads that must not be stale
+    (e.g. refilling a process-wide cache). The connection goes back to its
+    pool in teardown, so routes never close it.
+    """
+    if primary and g.get('db_replica'):
+        key = 'db_primary_conn'
+    else:
+        key = 'db_conn'
+    if key not in g:
+        try:
+            conn, replica = _acquire(primary)
+        except Error + (PoolTimeout,) as e:
+            app.logger.error("❌ Database connection failed: %s", e)
+            return None
+        setattr(g, key, conn)
+        if key == 'db_conn':
+            g.db_replica = replica
+    return g.get(key)
+
+@app.after_request
+def pin_writers_to_primary(response):
+    # Anyone who just wrote reads from the primary until replicas catch up.
+    if request.method not in routing.SAFE_METHODS and 'db_conn' in g:
+        routing.pin_to_primary(session, app.config['DB_PRIMARY_PIN_SECONDS'])
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    for key in ('db_conn', 'db_primary_conn'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+# -------------------- INSTRUMENTATION --------------------
+registry = metrics.Registry()
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Wall time per request, including streamed bodies.',
+    labels=('endpoint', 'method'))
+REQUESTS = registry.counter(
+    'http_requests_total', 'Requests served.', labels=('endpoint', 'method', 'status'))
+REQUEST_QUERIES = registry.histogram(
+    'db_queries_per_request', 'SQL statements issued per request.',
+    labels=('endpoint',), buckets=metrics.COUNT_BUCKETS)
+REQUEST_DB_TIME = registry.histogram(
+    'db_time_per_request_seconds', 'Time spent in cursor.execute() per request.', labels=('endpoint',))
+REQUEST_ROWS = registry.histogram(
+    'db_rows_fetched_per_request', 'Rows fetched from the database per request.',
+    labels=('endpoint',), buckets=metrics.ROW_BUCKETS)
+REQUEST_TEMPLATE_TIME = registry.histogram(
+    'template_time_per_request_seconds', 'Template rendering time per request.', labels=('endpoint',))
+TEMPLATE_RENDER = registry.histogram(
+    'template_render_seconds', 'Render time per template.', labels=('template',))
+CONN_ACQUIRE = registry.histogram(
+    'db_connection_acquire_seconds', 'Time to borrow a pooled connection.',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+SLOW_QUERIES = registry.counter(
+    'db_slow_queries_total', 'Statements slower than SLOW_QUERY_SECONDS.', labels=('endpoint',))
+registry.gauge(
+    'db_pool_connections', 'Pooled connections by state.',
+    lambda: {(k,): v for k, v in (_pool.stats() if _pool else {}).items()
+             if k in ('size', 'idle', 'in_use', 'waiting')},
+    labels=('state',))
+registry.gauge(
+    'db_pool_events', 'Cumulative pool events since start.',
+    lambda: {(k,): v for k, v in (_pool.stats() if _pool else {}).items()
+             if k in ('created', 'recycled', 'failed_pings', 'timeouts')},
+    labels=('event',))
+registry.gauge(
+    'db_replica_lag_seconds', 'Last measured replication lag per replica.',
+    lambda: {(r.name,): r.lag for r in (_replicas.replicas if _replicas else ()) if r.lag is not None},
+    labels=('replica',))
+registry.gauge(
+    'db_replica_healthy', '1 while a replica is in rotation, 0 while ejected.',
+    lambda: {(r.name,): int(r.healthy(time.monotonic())) for r in (_replicas.replicas if _replicas else ())},
+    labels=('replica',))
+registry.gauge(
+    'db_replica_fallbacks', 'Replica-eligible requests served by the primary because no replica was usable.',
+    lambda: {(): _replicas.fallbacks} if _replicas else {})
+registry.gauge(
+    'subject_cache_events', 'Subject catalog cache hits, misses and invalidations.',
+    lambda: {(k,): v for k, v in subject_catalog.stats().items()
+             if k in ('hits', 'misses', 'invalidations')},
+    labels=('event',))
+registry.gauge(
+    'grade_cache_events', 'Cohort grade cache hits, misses and invalidations.',
+    lambda: {(k,): v for k, v in grade_cache.stats().items()
+             if k in ('hits', 'misses', 'invalidations')},
+    labels=('event',))
+
+slow_queries = metrics.SlowQueryLog(app.config['SLOW_QUERY_SECONDS'], logger=app.logger)
+query_log = metrics.QueryLog(app.config['QUERY_LOG_PATH']) if app.config['QUERY_LOG_PATH'] else None
+
+def _request_stats():
+    return g.get('request_stats') if has_app_context() else None
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'cli'
+
+def _on_query(sql, params, seconds):
+    if query_log is not None:
+        query_log.record(sql, params, _endpoint())
+    if seconds >= slow_queries.threshold:
+        endpoint = _endpoint()
+        slow_queries.record(sql, seconds, endpoint)
+        SLOW_QUERIES.inc(endpoint)
+
+def _instrument_cursor(cursor):
+    return metrics.InstrumentedCursor(cursor, _request_stats, _on_query)
+
+@app.before_request
+def start_request_stats():
+    g.request_stats = metrics.RequestStats()
+
+@app.after_request
+def capture_status(response):
+    stats = _request_stats()
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_stats(exc):
+    # Runs after streamed bodies finish, so exports are timed end to end.
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    endpoint, method = _endpoint(), request.method
+    status = stats.status or (500 if exc else 200)
+    REQUEST_LATENCY.observe(time.perf_counter() - stats.started, endpoint, method)
+    REQUESTS.inc(endpoint, method, str(status))
+    REQUEST_QUERIES.observe(stats.queries, endpoint)
+    REQUEST_DB_TIME.observe(stats.db_time, endpoint)
+    REQUEST_ROWS.observe(stats.rows, endpoint)
+    REQUEST_TEMPLATE_TIME.observe(stats.template_time, endpoint)
+
+def _template_started(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        stats._template_starts.append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and stats._template_starts:
+        elapsed = time.perf_counter() - stats._template_starts.pop()
+        stats.template_time += elapsed
+        TEMPLATE_RENDER.observe(elapsed, template.name or 'inline')
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
+# -------------------- SUBJECT CATALOG CACHE --------------------
+def _load_subjects():
+    # The snapshot is shared by every request in the process, so never fill it
+    # from a replica that may not have the latest subject write yet.
+    conn = get_db_connection(primary=True)
+    if not conn:
+        raise StorageError("Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, code, name, credits FROM subjects ORDER BY id")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+subject_catalog = SubjectCatalog(
+    _load_subjects,
+    ttl=app.config['SUBJECT_CACHE_TTL'],
+    signal=FileSignal(app.config['SUBJECT_CACHE_SIGNAL']) if app.config['SUBJECT_CACHE_SIGNAL'] else None,
+)
+
+# -------------------- PROFILE CHANGE VERSIONS --------------------
+os.makedirs(os.path.dirname(app.config['PROFILE_CHANGE_SIGNAL']) or '.', exist_ok=True)
+profile_changes = ChangeTracker(signal=FileSignal(app.config['PROFILE_CHANGE_SIGNAL']))
+
+# -------------------- GRADES CACHE --------------------
+def _load_cohort(program, semester):
+    # Shared by every request like the subject catalog: read from the primary.
+    conn = get_db_connection(primary=True)
+    if not conn:
+        raise StorageError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        credits = {s['id']: s['credits'] for s in subject_catalog.get()}
+        return grading.load_cohort(cursor, program, semester, credits)
+    finally:
+        cursor.close()
+
+grade_cache = GradeCache(
+    _load_cohort,
+    ttl=app.config['GRADES_CACHE_TTL'],
+    signal=FileSignal(app.config['GRADES_CACHE_SIGNAL']) if app.config['GRADES_CACHE_SIGNAL'] else None,
+)
+
+# -------------------- STUDENT SEARCH INDEX --------------------
+def _load_search_rows():
+    # Built once per process and then kept current by the write routes.
+    conn = get_db_connection(primary=True)
+    if not conn:
+        raise StorageError("Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {', '.join(search.RESULT_FIELDS)} FROM students")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+student_index = StudentIndex(
+    _load_search_rows,
+    signal=FileSignal(app.config['STUDENT_SEARCH_SIGNAL']) if app.config['STUDENT_SEARCH_SIGNAL'] else None,
+)
+
+# -------------------- DASHBOARD ROLLUPS --------------------
+def _load_rollups(since):
+    conn = get_db_connection(primary=True)
+    if not conn:
+        raise StorageError("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        daily = attendance.daily_counts(cursor, since, date.today())
+        cursor.execute("""
+            SELECT DATE(created_at), COUNT(*) FROM students
+            WHERE created_at >= %s GROUP BY DATE(created_at)
+        """, (since,))
+        registrations = {date.fromisoformat(str(day)[:10]): count for day, count in cursor.fetchall()}
+        cursor.execute("""
+            SELECT first_name, last_name, created_at FROM students
+            ORDER BY id DESC LIMIT %s
+        """, (rollups.RECENT_EVENTS,))
+        events = [(created_at, 'student', f"New student registered: {first} {last}")
+                  for first, last, created_at in reversed(cursor.fetchall()) if created_at]
+        return rollups.Warmup(daily, registrations, events)
+    finally:
+        cursor.close()
+
+dashboard = Rollups(
+    _load_rollups,
+    ttl=app.config['ROLLUP_REFRESH_SECONDS'],
+    signal=FileSignal(app.config['ROLLUP_SIGNAL']) if app.config['ROLLUP_SIGNAL'] else None,
+)
+
+# -------------------- CROSS-WORKER SIGNALS --------------------
+# Without a shared signal file a write only reaches the caches of the worker
+# that handled it. Profile ETags always have one (see PROFILE_CHANGE_SIGNAL);
+# the rest only cost staleness until a TTL runs out (or, for the search
+# index, the worker restarts).
+if app.config['WEB_WORKERS'] > 1:
+    for _setting in ('SUBJECT_CACHE_SIGNAL', 'GRADES_CACHE_SIGNAL', 'STUDENT_SEARCH_SIGNAL', 'ROLLUP_SIGNAL'):
+        if not app.config[_setting]:
+            app.logger.warning("%s is not set: with %d workers, other workers' caches "
+                               "miss each write until they refresh", _setting, app.config['WEB_WORKERS'])
+
+def invalidate_after_import(kind):
+    """Drop every cache a bulk import can make stale (web upload and CLI)."""
+    profile_changes.bump_all()
+    grade_cache.invalidate_all()
+    if kind == 'students':
+        student_index.invalidate()
+    if kind == 'subjects':
+        subject_catalog.invalidate()
+    dashboard.invalidate()
 
 # -------------------- ROUTES --------------------
 
@@ -31,20 +441,89 @@ def index():
 # STUDENTS
 # ------------------------------------------------------------
 
+# Column order of the add/edit student forms' value tuples.
+STUDENT_FORM_FIELDS = ('student_id', 'first_name', 'last_name', 'email', 'phone', 'address',
+                       'program', 'semester')
+
+# Sortable list columns: query-string value -> SQL expression. Nullable
+# columns are coalesced so keyset comparisons never hit NULL.
+STUDENT_SORTS = {
+    'id': 'id',
+    'student_id': 'student_id',
+    'name': 'last_name',
+    'email': 'email',
+    'program': "COALESCE(program, '')",
+    'semester': "COALESCE(semester, '')",
+}
+STUDENT_LIST_COLUMNS = "id, student_id, first_name, last_name, email, program, semester"
+
+# Subjects are paged in memory from the cached catalog: value -> sort key.
+SUBJECT_SORTS = {
+    'id': lambda s: s['id'],
+    'code': lambda s: s['code'],
+    'name': lambda s: s['name'],
+    'credits': lambda s: s['credits'] or 0,
+}
+
+def student_filters(args):
+    """WHERE conditions for the program/semester filters shared by list pages."""
+    where, params = [], []
+    if args.get('program'):
+        where.append("program = %s")
+        params.append(args['program'])
+    if args.get('semester'):
+        where.append("semester = %s")
+        params.append(args['semester'])
+    return where, params
+
+def list_state(args, sorts, default_sort, filter_keys=()):
+    """Parse sort/dir/limit/filters and the query args that must survive paging."""
+    sort = args.get('sort') if args.get('sort') in sorts else default_sort
+    descending = args.get('dir') == 'desc'
+    limit = page_size(args.get('limit'))
+    list_args = {k: args[k] for k in filter_keys if args.get(k)}
+    list_args.update(sort=sort, dir='desc' if descending else 'asc')
+    if args.get('limit'):
+        list_args['limit'] = limit
+    return sort, descending, limit, list_args
+
+def fetch_list_page(cursor, table, columns, sorts, sort, descending, limit, where=(), params=()):
+    return fetch_page(
+        cursor,
+        f"SELECT {columns}, {sorts[sort]} AS sort_value FROM {table}",
+        where, params, sorts[sort], 'sort_value', descending,
+        after=decode_cursor(request.args.get('after')),
+        before=decode_cursor(request.args.get('before')),
+        limit=limit,
+    )
+
 @app.route('/students')
+@replica_reads
 def list_students():
+    sort, descending, limit, list_args = list_state(
+        request.args, STUDENT_SORTS, 'id', ('program', 'semester'))
     conn = get_db_connection()
     if not conn:
         flash("Database connection failed", "danger")
-        return render_template('students/list.html', students=[])
+        return render_template('students/list.html', students=[], page=None, list_args=list_args)
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM students")
-        students = cursor.fetchall()
+        where, params = student_filters(request.args)
+        page = fetch_list_page(cursor, 'students', STUDENT_LIST_COLUMNS, STUDENT_SORTS,
+                               sort, descending, limit, where, params)
     finally:
         cursor.close()
-        conn.close()
-    return render_template('students/list.html', students=students)
+    return render_template('students/list.html', students=page.rows, page=page, list_args=list_args)
+
+@app.route('/api/students/search')
+def api_student_search():
+    """Typeahead: ?q=<prefixes>&limit=N, matched against the in-process index."""
+    limit = max(1, min(request.args.get('limit', search.DEFAULT_LIMIT, type=int), search.MAX_LIMIT))
+    try:
+        results = student_index.search(request.args.get('q', ''), limit)
+    except Error as e:
+        return jsonify(error=f"Database connection failed: {e}"), 503
+    return jsonify(results=[dict(r, url=url_for('view_student', id=r['id'])) for r in results])
 
 
 @app.route('/students/add', methods=['GET', 'POST'])
@@ -71,13 +550,15 @@ def add_student():
                 VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
             """, data)
             conn.commit()
+            grade_cache.invalidate_all()
+            student_index.upsert(dict(zip(STUDENT_FORM_FIELDS, data), id=cursor.lastrowid))
+            dashboard.record_registration(f"{request.form['first_name']} {request.form['last_name']}")
             flash('✅ Student added successfully!', 'success')
         except Error as e:
             conn.rollback()
             flash(f'❌ Error adding student: {e}', 'danger')
         finally:
             cursor.close()
-            conn.close()
         return redirect(url_for('list_students'))
     return render_template('students/add.html')
 
@@ -113,6 +594,9 @@ def edit_student(id):
                     email=%s, phone=%s, address=%s, program=%s, semester=%s WHERE id=%s
                 """, updated)
                 conn.commit()
+                profile_changes.bump(id)
+                grade_cache.invalidate_all()
+                student_index.upsert(dict(zip(STUDENT_FORM_FIELDS, updated), id=id))
                 flash('✅ Student updated successfully!', 'success')
             except Error as e:
                 conn.rollback()
@@ -121,7 +605,6 @@ def edit_student(id):
 
     finally:
         cursor.close()
-        conn.close()
 
     return render_template('students/edit.html', student=student)
 
@@ -133,18 +616,20 @@ def delete_student(id):
         return redirect(url_for('list_students'))
     cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM marks WHERE student_id=%s", (id,))
-        cursor.execute("DELETE FROM attendance WHERE student_id=%s", (id,))
-        cursor.execute("DELETE FROM enrollments WHERE student_id=%s", (id,))
+        # Enrollments, marks and attendance go with it via ON DELETE CASCADE.
+        api.record_deletes(cursor, 'students', "id = %s", (id,))
         cursor.execute("DELETE FROM students WHERE id=%s", (id,))
         conn.commit()
+        profile_changes.bump(id)
+        grade_cache.invalidate(id)
+        student_index.remove(id)
+        dashboard.invalidate()
         flash('✅ Student deleted successfully!', 'success')
     except Error as e:
         conn.rollback()
         flash(f'❌ Error deleting student: {e}', 'danger')
     finally:
         cursor.close()
-        conn.close()
     return redirect(url_for('list_students'))
 
 # ------------------------------------------------------------
@@ -152,19 +637,19 @@ def delete_student(id):
 # ------------------------------------------------------------
 
 @app.route('/subjects')
+@replica_reads
 def list_subjects():
-    conn = get_db_connection()
-    if not conn:
-        flash("Database connection failed", "danger")
-        return render_template('subjects/list.html', subjects=[])
-    cursor = conn.cursor(dictionary=True)
+    sort, descending, limit, list_args = list_state(request.args, SUBJECT_SORTS, 'code')
     try:
-        cursor.execute("SELECT * FROM subjects")
-        subjects = cursor.fetchall()
-    finally:
-        cursor.close()
-        conn.close()
-    return render_template('subjects/list.html', subjects=subjects)
+        subjects = subject_catalog.get()
+    except Error as e:
+        flash(f"Database connection failed: {e}", "danger")
+        return render_template('subjects/list.html', subjects=[], page=None, list_args=list_args)
+    page = paginate_rows(subjects, SUBJECT_SORTS[sort], descending,
+                         after=decode_cursor(request.args.get('after')),
+                         before=decode_cursor(request.args.get('before')),
+                         limit=limit)
+    return render_template('subjects/list.html', subjects=page.rows, page=page, list_args=list_args)
 
 @app.route('/subjects/add', methods=['GET', 'POST'])
 def add_subject():
@@ -178,13 +663,15 @@ def add_subject():
         try:
             cursor.execute("INSERT INTO subjects (code, name, credits) VALUES (%s,%s,%s)", data)
             conn.commit()
+            subject_catalog.invalidate()
+            profile_changes.bump_all()
+            grade_cache.invalidate_all()
             flash('✅ Subject added successfully!', 'success')
         except Error as e:
             conn.rollback()
             flash(f'❌ Error adding subject: {e}', 'danger')
         finally:
             cursor.close()
-            conn.close()
         return redirect(url_for('list_subjects'))
     return render_template('subjects/add.html')
 
@@ -207,6 +694,9 @@ def edit_subject(id):
             try:
                 cursor.execute("UPDATE subjects SET code=%s, name=%s, credits=%s WHERE id=%s", updated)
                 conn.commit()
+                subject_catalog.invalidate()
+                profile_changes.bump_all()
+                grade_cache.invalidate_all()
                 flash('✅ Subject updated successfully!', 'success')
             except Error as e:
                 conn.rollback()
@@ -215,7 +705,6 @@ def edit_subject(id):
 
     finally:
         cursor.close()
-        conn.close()
 
     return render_template('subjects/edit.html', subject=subject)
 
@@ -227,15 +716,18 @@ def delete_subject(id):
         return redirect(url_for('list_subjects'))
     cursor = conn.cursor()
     try:
+        api.record_deletes(cursor, 'subjects', "id = %s", (id,))
         cursor.execute("DELETE FROM subjects WHERE id=%s", (id,))
         conn.commit()
+        subject_catalog.invalidate()
+        profile_changes.bump_all()
+        grade_cache.invalidate_all()
         flash('✅ Subject deleted successfully!', 'success')
     except Error as e:
         conn.rollback()
         flash(f'❌ Error deleting subject: {e}', 'danger')
     finally:
         cursor.close()
-        conn.close()
     return redirect(url_for('list_subjects'))
 
 # ------------------------------------------------------------
@@ -253,8 +745,7 @@ def enroll_student(id):
         cursor.execute("SELECT * FROM students WHERE id=%s", (id,))
         student = cursor.fetchone()
 
-        cursor.execute("SELECT * FROM subjects")
-        subjects = cursor.fetchall()
+        subjects = subject_catalog.get().rows
 
         if request.method == 'POST':
             subject_id = request.form['subject']
@@ -263,6 +754,7 @@ def enroll_student(id):
                 cursor.execute("INSERT INTO enrollments (student_id, subject_id, enrollment_date) VALUES (%s,%s,%s)",
                                (id, subject_id, enrollment_date))
                 conn.commit()
+                profile_changes.bump(id)
                 flash('✅ Enrollment successful!', 'success')
             except Error as e:
                 conn.rollback()
@@ -270,7 +762,6 @@ def enroll_student(id):
             return redirect(url_for('view_student', id=id))
     finally:
         cursor.close()
-        conn.close()
 
     return render_template('students/enroll.html', student=student, subjects=subjects)
 
@@ -278,36 +769,90 @@ def enroll_student(id):
 # VIEW STUDENT DETAILS (Marks + Attendance)
 # ------------------------------------------------------------
 
-@app.route('/students/<int:id>')
-def view_student(id):
+def profile_response(student_id, render):
+    """Answer with 304 if the client's copy of this student is still current,
+    otherwise call render(). Runs before any database access."""
+    etag, last_modified = profile_changes.validators(student_id)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = request.if_modified_since is not None and request.if_modified_since >= last_modified
+    # A pending flash message has to be rendered, so never short-circuit then.
+    if fresh and not session.get('_flashes'):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    response.headers['Cache-Control'] = 'private, no-cache'
+    # A body read from a replica shortly after a change may predate it; don't
+    # let the client cache it under the new validators.
+    if (g.get('db_replica') and
+            time.time() - last_modified.timestamp() < app.config['DB_REPLICA_MAX_LAG'] + 1):
+        return response
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+def fetch_profile(id):
     conn = get_db_connection()
     if not conn:
-        flash("Database connection failed", "danger")
-        return redirect(url_for('list_students'))
+        return None
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM students WHERE id=%s", (id,))
-        student = cursor.fetchone()
-
-        cursor.execute("""SELECT e.*, s.name AS subject_name 
-                          FROM enrollments e JOIN subjects s ON e.subject_id=s.id 
-                          WHERE e.student_id=%s""", (id,))
-        enrollments = cursor.fetchall()
-
-        cursor.execute("""SELECT m.*, s.name AS subject_name 
-                          FROM marks m LEFT JOIN subjects s ON m.subject_id=s.id 
-                          WHERE m.student_id=%s""", (id,))
-        marks = cursor.fetchall()
+        return load_profile(cursor, id)
+    finally:
+        cursor.close()
 
-        cursor.execute("""SELECT a.*, s.name AS subject_name 
-                          FROM attendance a LEFT JOIN subjects s ON a.subject_id=s.id 
-                          WHERE a.student_id=%s""", (id,))
-        attendance = cursor.fetchall()
+def fetch_archived(id):
+    conn = get_db_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    try:
+        return archive.load_archived(cursor, id)
     finally:
         cursor.close()
-        conn.close()
 
-    return render_template('students/view.html', student=student, enrollments=enrollments, marks=marks, attendance=attendance)
+@app.route('/students/<int:id>')
+@replica_reads
+def view_student(id):
+    def render():
+        profile = fetch_profile(id)
+        if profile:
+            return render_template('students/view.html', **profile.template_context())
+        archived = fetch_archived(id)
+        if archived:
+            return render_template('students/view.html', archived=archived,
+                                   **archived.profile.template_context())
+        flash("Student not found or database unavailable", "danger")
+        return redirect(url_for('list_students'))
+    return profile_response(id, render)
+
+@app.route('/api/students/<int:id>/profile')
+@replica_reads
+def api_student_profile(id):
+    def render():
+        profile = fetch_profile(id)
+        if profile:
+            return jsonify(profile.as_dict())
+        archived = fetch_archived(id)
+        if archived:
+            return jsonify(archived.as_dict())
+        return jsonify(error="Student not found"), 404
+    return profile_response(id, render)
+
+@app.route('/students/<int:id>/report')
+@replica_reads
+def student_report(id):
+    profile = fetch_profile(id)
+    if not profile:
+        flash("Student not found or database unavailable", "danger")
+        return redirect(url_for('list_students'))
+    student = profile.student
+    grades = grade_cache.get(student['program'], student['semester']).student(id)
+    return render_template('students/report.html', datetime=datetime, grades=grades,
+                           subjects=subject_catalog.get().by_id, **profile.template_context())
 
 # ------------------------------------------------------------
 # MARKS MANAGEMENT (added & fixed)
@@ -330,8 +875,7 @@ def manage_marks(id):
             return redirect(url_for('list_students'))
 
         # for the form, show subjects (so user can choose subject by id)
-        cursor.execute("SELECT * FROM subjects")
-        subjects = cursor.fetchall()
+        subjects = subject_catalog.get().rows
 
         if request.method == 'POST':
             subject_id = request.form['subject_id']
@@ -340,11 +884,13 @@ def manage_marks(id):
             exam_date = request.form.get('exam_date') or datetime.utcnow().date()
 
             try:
-                cursor.execute("""
-                    INSERT INTO marks (student_id, subject_id, marks, max_marks, exam_date)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (id, subject_id, marks_val, max_marks, exam_date))
+                gradebook.insert_marks(cursor, [(id, subject_id, marks_val, max_marks, exam_date)],
+                                       upsert=False)
                 conn.commit()
+                profile_changes.bump(id)
+                grade_cache.invalidate(id)
+                dashboard.record_event('marks', f"Marks recorded for {student['first_name']} "
+                                                f"{student['last_name']} ({subject_code(subject_id)})")
                 flash("✅ Marks added successfully!", "success")
             except Error as e:
                 conn.rollback()
@@ -362,7 +908,6 @@ def manage_marks(id):
 
     finally:
         cursor.close()
-        conn.close()
 
     return render_template('marks/manage.html', student=student, subjects=subjects, marks=marks)
 
@@ -382,8 +927,7 @@ def edit_mark(mark_id):
             return redirect(url_for('list_students'))
 
         # get subjects for dropdown
-        cursor.execute("SELECT * FROM subjects")
-        subjects = cursor.fetchall()
+        subjects = subject_catalog.get().rows
 
         if request.method == 'POST':
             subject_id = request.form['subject_id']
@@ -392,11 +936,21 @@ def edit_mark(mark_id):
             exam_date = request.form.get('exam_date') or datetime.utcnow().date()
 
             try:
-                cursor.execute("""
-                    UPDATE marks SET subject_id=%s, marks=%s, max_marks=%s, exam_date=%s
+                # The row may move to another cell: leave the old cell's version
+                # behind and continue past whatever the new cell had.
+                new_cell = (mark['student_id'], subject_id, exam_date)
+                gradebook.retire_versions(cursor, "id = %s", (mark_id,))
+                cleared = gradebook.CLEARED_VERSION_SQL
+                cursor.execute(f"""
+                    UPDATE marks SET subject_id=%s, marks=%s, max_marks=%s, exam_date=%s,
+                                     version=CASE WHEN {cleared} > version THEN {cleared}
+                                                  ELSE version END + 1
                     WHERE id=%s
-                """, (subject_id, marks_val, max_marks, exam_date, mark_id))
+                """, (subject_id, marks_val, max_marks, exam_date,
+                      *new_cell, *new_cell, mark_id))
                 conn.commit()
+                profile_changes.bump(mark['student_id'])
+                grade_cache.invalidate(mark['student_id'])
                 flash("✅ Mark updated successfully!", "success")
             except Error as e:
                 conn.rollback()
@@ -404,7 +958,6 @@ def edit_mark(mark_id):
             return redirect(url_for('manage_marks', id=mark['student_id']))
     finally:
         cursor.close()
-        conn.close()
 
     return render_template('marks/edit.html', mark=mark, subjects=subjects)
 
@@ -423,26 +976,293 @@ def delete_mark(mark_id):
             flash("Mark not found", "danger")
             return redirect(url_for('list_students'))
         student_id = row['student_id']
-        cursor.execute("DELETE FROM marks WHERE id=%s", (mark_id,))
+        gradebook.delete_marks(cursor, "id = %s", (mark_id,))
         conn.commit()
+        profile_changes.bump(student_id)
+        grade_cache.invalidate(student_id)
         flash("✅ Mark deleted successfully!", "success")
     except Error as e:
         conn.rollback()
         flash(f"❌ Error deleting mark: {e}", "danger")
     finally:
         cursor.close()
-        conn.close()
     return redirect(url_for('manage_marks', id=student_id))
 
+def _after_gradebook_save(subject_id, exam_date, result):
+    if not result.changed:
+        return
+    profile_changes.bump(*result.changed)
+    grade_cache.invalidate(*result.changed)
+    dashboard.record_event('marks', f"Gradebook saved for {subject_code(subject_id)} "
+                                    f"({exam_date.isoformat()}): {len(result.changed)} marks")
+
+@app.route('/gradebook', methods=['GET', 'POST'])
+def gradebook_grid():
+    """Marks for every enrolled student of one (subject, exam_date) on one page."""
+    subject_id = request.values.get('subject_id', type=int)
+    exam_date = parse_date(request.values.get('exam_date')) or datetime.utcnow().date()
+    conn = get_db_connection()
+    if not conn:
+        flash("Database connection failed", "danger")
+        return redirect(url_for('index'))
+
+    if request.method == 'POST' and subject_id:
+        try:
+            max_marks = gradebook.parse_max_marks(request.form.get('max_marks'))
+            max_changed = request.form.get('max_marks') != request.form.get('orig_max_marks')
+            cells = []
+            for key, value in request.form.items():
+                if not key.startswith('marks_'):
+                    continue
+                student_id = int(key[len('marks_'):])
+                # Only cells the grader touched are sent on, so untouched
+                # rows never conflict with someone else's save.
+                if value.strip() == request.form.get(f'orig_{student_id}', '') and not (max_changed and value.strip()):
+                    continue
+                cells.append((student_id, gradebook.parse_mark(value, max_marks), max_marks,
+                              request.form.get(f'version_{student_id}', type=int)))
+            result = gradebook.save(conn, subject_id, exam_date, cells)
+            _after_gradebook_save(subject_id, exam_date, result)
+            if result.conflicts:
+                flash(f"❌ {len(result.conflicts)} marks were changed by someone else since you loaded "
+                      f"the page and were not saved; their current values are shown below", "danger")
+            if result.changed or not result.conflicts:
+                flash(f"✅ {len(result.changed)} marks saved", "success")
+        except Error + (gradebook.GradebookError, ValueError) as e:
+            flash(f"❌ Error saving marks: {e}", "danger")
+        return redirect(url_for('gradebook_grid', subject_id=subject_id, exam_date=exam_date.isoformat()))
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        subjects = sorted(subject_catalog.get(), key=lambda s: s['code'])
+        rows = gradebook.grid(cursor, subject_id, exam_date) if subject_id else []
+    finally:
+        cursor.close()
+    max_marks = next((row['max_marks'] for row in rows if row['max_marks'] is not None), 100)
+    return render_template('marks/gradebook.html', subjects=subjects, rows=rows,
+                           subject_id=subject_id, exam_date=exam_date, max_marks=max_marks)
+
+@app.route('/api/gradebook', methods=['GET', 'POST'])
+def api_gradebook():
+    """GET ?subject_id=&exam_date= -> the grid with versions.
+
+    POST {"subject_id", "exam_date", "max_marks", "records": [{"student_id",
+    "marks", "max_marks", "version"}]} writes every record in one transaction.
+    A record without "version" overwrites whatever is there; with one, it is
+    only written if nobody saved that cell since (409 lists the conflicts).
+    """
+    payload = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    exam_date = parse_date(payload.get('exam_date'))
+    try:
+        subject_id = int(payload['subject_id'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="subject_id is a required integer"), 400
+    if not exam_date:
+        return jsonify(error="exam_date must be YYYY-MM-DD"), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify(error="Database connection failed"), 503
+    if request.method == 'GET':
+        cursor = conn.cursor(dictionary=True)
+        try:
+            rows = gradebook.grid(cursor, subject_id, exam_date)
+        finally:
+            cursor.close()
+        return jsonify(subject_id=subject_id, exam_date=exam_date.isoformat(), students=rows)
+
+    try:
+        default_max = gradebook.parse_max_marks(payload.get('max_marks', 100))
+        cells = []
+        for record in payload.get('records', []):
+            max_marks = gradebook.parse_max_marks(record.get('max_marks', default_max))
+            version = record.get('version')
+            cells.append((int(record['student_id']), gradebook.parse_mark(record.get('marks'), max_marks),
+                          max_marks, None if version is None else int(version)))
+    except gradebook.GradebookError as e:
+        return jsonify(error=str(e)), 400
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="records[].student_id and records[].version must be integers"), 400
+    try:
+        result = gradebook.save(conn, subject_id, exam_date, cells)
+    except Error as e:
+        return jsonify(error=str(e)), 500
+    _after_gradebook_save(subject_id, exam_date, result)
+    return (jsonify(subject_id=subject_id, exam_date=exam_date.isoformat(), **result.as_dict()),
+            409 if result.conflicts else 200)
+
+# ------------------------------------------------------------
+# ATTENDANCE
+# ------------------------------------------------------------
+
+def subject_code(subject_id):
+    try:
+        subject = subject_catalog.get().get(int(subject_id))
+    except (TypeError, ValueError):
+        return None
+    return subject['code'] if subject else None
+
+def parse_date(value):
+    """YYYY-MM-DD string -> date, or None if missing/invalid."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/students/<int:id>/attendance', methods=['GET', 'POST'])
+def manage_attendance(id):
+    conn = get_db_connection()
+    if not conn:
+        flash("Database connection failed", "danger")
+        return redirect(url_for('list_students'))
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, student_id, first_name, last_name FROM students WHERE id=%s", (id,))
+        student = cursor.fetchone()
+        if not student:
+            flash("Student not found", "danger")
+            return redirect(url_for('list_students'))
+
+        if request.method == 'POST':
+            day = parse_date(request.form.get('date'))
+            if not day:
+                flash("❌ Invalid date", "danger")
+                return redirect(url_for('manage_attendance', id=id))
+            try:
+                daily = {}
+                written, rejected = attendance.record_roll_call(
+                    conn, request.form['subject'], day, {id: request.form['status']}, daily=daily)
+                profile_changes.bump(*written)
+                dashboard.record_attendance(daily, subject_code(request.form['subject']))
+                if rejected:
+                    flash("❌ Student is not enrolled in that subject", "danger")
+                else:
+                    flash("✅ Attendance recorded!", "success")
+            except Error + (attendance.AttendanceError,) as e:
+                flash(f"❌ Error recording attendance: {e}", "danger")
+            return redirect(url_for('manage_attendance', id=id))
+
+        cursor.execute("""
+            SELECT DISTINCT s.id, s.code, s.name
+            FROM enrollments e JOIN subjects s ON s.id = e.subject_id
+            WHERE e.student_id=%s ORDER BY s.code
+        """, (id,))
+        subjects = cursor.fetchall()
+
+        history = attendance.history(cursor, id, limit=100)
+    finally:
+        cursor.close()
+
+    return render_template('students/attendance.html', student=student, subjects=subjects,
+                           history=history, datetime=datetime)
+
+@app.route('/attendance/rollcall', methods=['GET', 'POST'])
+def attendance_roll_call():
+    """Whole-class attendance for one (subject, date) session."""
+    subject_id = request.values.get('subject_id', type=int)
+    day = parse_date(request.values.get('date')) or datetime.utcnow().date()
+    conn = get_db_connection()
+    if not conn:
+        flash("Database connection failed", "danger")
+        return redirect(url_for('index'))
+
+    if request.method == 'POST' and subject_id:
+        try:
+            statuses = {}
+            for key, value in request.form.items():
+                if key.startswith('status_'):
+                    student_pk = key[len('status_'):]
+                    if not student_pk.isdigit():
+                        raise ValueError(f"invalid student id in field {key!r}")
+                    statuses[int(student_pk)] = value
+            daily = {}
+            written, rejected = attendance.record_roll_call(conn, subject_id, day, statuses, daily=daily)
+            profile_changes.bump(*written)
+            dashboard.record_attendance(daily, subject_code(subject_id))
+            flash(f"✅ Attendance saved for {len(written)} students", "success")
+        except Error + (attendance.AttendanceError, ValueError) as e:
+            flash(f"❌ Error saving attendance: {e}", "danger")
+        return redirect(url_for('attendance_roll_call', subject_id=subject_id, date=day.isoformat()))
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        subjects = sorted(subject_catalog.get(), key=lambda s: s['code'])
+        roster = attendance.roll_call(cursor, subject_id, day) if subject_id else []
+    finally:
+        cursor.close()
+    return render_template('attendance/rollcall.html', subjects=subjects, roster=roster,
+                           subject_id=subject_id, date=day, statuses=attendance.STATUSES)
+
+@app.route('/api/attendance/rollcall', methods=['POST'])
+def api_roll_call():
+    """Kiosk endpoint: {"subject_id", "date", "records": [{"student_id", "status"}],
+    "missing_status"}. Everything is written in one transaction."""
+    payload = request.get_json(silent=True) or {}
+    day = parse_date(payload.get('date'))
+    try:
+        subject_id = int(payload['subject_id'])
+        statuses = {int(r['student_id']): r.get('status', attendance.DEFAULT_STATUS)
+                    for r in payload.get('records', [])}
+    except (KeyError, TypeError, ValueError):
+        return jsonify(error="subject_id and records[].student_id are required integers"), 400
+    if not day:
+        return jsonify(error="date must be YYYY-MM-DD"), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify(error="Database connection failed"), 503
+    daily = {}
+    try:
+        written, rejected = attendance.record_roll_call(
+            conn, subject_id, day, statuses, missing_status=payload.get('missing_status'), daily=daily)
+    except attendance.AttendanceError as e:
+        return jsonify(error=str(e)), 400
+    except Error as e:
+        return jsonify(error=str(e)), 500
+    profile_changes.bump(*written)
+    dashboard.record_attendance(daily, subject_code(subject_id))
+    return jsonify(subject_id=subject_id, date=day.isoformat(), written=len(written), rejected=rejected)
+
 # ------------------------------------------------------------
 # REPORTS
 # ------------------------------------------------------------
 
 @app.route('/reports')
 def view_reports():
-    return render_template('reports/index.html')
+    try:
+        figures = dashboard.snapshot()
+    except Error as e:
+        flash(f"Dashboard figures unavailable: {e}", "danger")
+        figures = None
+    return render_template('reports/index.html', dashboard=figures)
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    return jsonify(dashboard.snapshot())
+
+@app.route('/dashboard/stream')
+def dashboard_stream():
+    """Server-sent events: the dashboard snapshot whenever the rollups change."""
+    deadline = time.monotonic() + app.config['DASHBOARD_STREAM_SECONDS']
+    heartbeat = app.config['DASHBOARD_HEARTBEAT_SECONDS']
+
+    def events():
+        sent = None
+        while time.monotonic() < deadline:
+            version = dashboard.version if sent is None else dashboard.wait(sent, heartbeat)
+            if version == sent:
+                yield ": keep-alive\n\n"
+                continue
+            figures = dashboard.snapshot()
+            sent = figures['version']
+            yield f"id: {sent}\ndata: {json.dumps(figures)}\n\n"
+
+    # Reloads (TTL, invalidate()) query the database from inside the generator.
+    return app.response_class(stream_with_context(events()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/reports/students')
+@replica_reads
 def student_reports():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
@@ -451,40 +1271,457 @@ def student_reports():
         students = cursor.fetchall()
     finally:
         cursor.close()
-        conn.close()
     return render_template('reports/students.html', students=students)
 
 @app.route('/reports/subjects')
+@replica_reads
 def subject_reports():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM subjects")
-        subjects = cursor.fetchall()
-    finally:
-        cursor.close()
-        conn.close()
+        subjects = subject_catalog.get().rows
+    except Error as e:
+        flash(f"Database connection failed: {e}", "danger")
+        subjects = []
     return render_template('reports/subjects.html', subjects=subjects)
 
 @app.route('/reports/attendance')
+@replica_reads
 def attendance_reports():
+    start, end = parse_date(request.args.get('from')), parse_date(request.args.get('to'))
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
+    try:
+        if start or end:
+            # Classes held in the window only, counted from the per-session store.
+            counts = attendance.range_counts(cursor, start or date.min, end or date.max)
+            students = {}
+            ids = sorted({student_id for student_id, _ in counts})
+            for offset in range(0, len(ids), 1000):
+                chunk = ids[offset:offset + 1000]
+                cursor.execute(f"SELECT id, first_name, last_name FROM students "
+                               f"WHERE id IN ({','.join(['%s'] * len(chunk))})", chunk)
+                students.update((row['id'], row) for row in cursor.fetchall())
+            subjects = subject_catalog.get()
+            rows = sorted(
+                ({'student_id': student_id, 'first_name': students[student_id]['first_name'],
+                  'last_name': students[student_id]['last_name'],
+                  'subject_code': subjects.get(subject_id)['code'],
+                  'subject_name': subjects.get(subject_id)['name'],
+                  'present_days': present, 'total_days': total}
+                 for (student_id, subject_id), (present, total) in counts.items()
+                 if student_id in students and subjects.get(subject_id)),
+                key=lambda r: (r['last_name'], r['first_name'], r['student_id'], r['subject_code']))
+        else:
+            # Reads the maintained per-(student, subject) counts, so the cost depends
+            # on enrollment size rather than on how many class days have been recorded.
+            cursor.execute("""
+                SELECT s.id AS student_id, s.first_name, s.last_name, sub.name AS subject_name,
+                       sm.present_count AS present_days, sm.total_count AS total_days
+                FROM attendance_summary sm
+                JOIN students s ON s.id=sm.student_id
+                JOIN subjects sub ON sub.id=sm.subject_id
+                ORDER BY s.last_name, s.first_name, s.id, sub.code
+            """)
+            rows = cursor.fetchall()
+        data = []
+        for row in rows:
+            if not data or data[-1]['student']['id'] != row['student_id']:
+                data.append({'student': {'id': row['student_id'], 'first_name': row['first_name'],
+                                         'last_name': row['last_name']},
+                             'subjects': []})
+            data[-1]['subjects'].append({
+                'name': row['subject_name'],
+                'present': row['present_days'],
+                'total': row['total_days'],
+                'percentage': attendance.percentage(row['present_days'], row['total_days']),
+            })
+    finally:
+        cursor.close()
+    return render_template('reports/attendance.html', attendance_data=data, start=start, end=end)
+
+# Cohort ranking columns: query-string value -> sort key (unranked last).
+GRADE_SORTS = {
+    'rank': lambda r: r['rank'] or 1 << 30,
+    'name': lambda r: (r['last_name'] or '') + ' ' + (r['first_name'] or ''),
+    'student_id': lambda r: r['student_id'] or '',
+}
+
+def selected_cohort(args):
+    """(program, semester, cohorts) from the query string; defaults to the first cohort."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
         cursor.execute("""
-            SELECT s.first_name, s.last_name, sub.name AS subject_name,
-            SUM(CASE WHEN a.status='Present' THEN 1 ELSE 0 END) AS present_days,
-            COUNT(a.id) AS total_days
-            FROM attendance a
-            JOIN students s ON s.id=a.student_id
-            JOIN subjects sub ON sub.id=a.subject_id
-            GROUP BY s.id, sub.id
+            SELECT DISTINCT program, semester FROM students
+            WHERE program IS NOT NULL AND semester IS NOT NULL
+            ORDER BY program, semester
         """)
-        data = cursor.fetchall()
+        cohorts = [tuple(row) for row in cursor.fetchall()]
     finally:
         cursor.close()
-        conn.close()
-    return render_template('reports/attendance.html', attendance_data=data)
+    program, semester = args.get('program'), args.get('semester')
+    if (program, semester) not in cohorts:
+        program, semester = cohorts[0] if cohorts else (None, None)
+    return program, semester, cohorts
+
+@app.route('/reports/grades')
+@replica_reads
+def grade_reports():
+    sort, descending, limit, list_args = list_state(request.args, GRADE_SORTS, 'rank')
+    program, semester, cohorts = selected_cohort(request.args)
+    if program is None:
+        return render_template('reports/grades.html', cohorts=[], grades=None, ranking=[],
+                               page=None, list_args=list_args, subjects={})
+    list_args.update(program=program, semester=semester)
+    grades = grade_cache.get(program, semester)
+    page = paginate_rows(grades.ranking(), GRADE_SORTS[sort], descending,
+                         after=decode_cursor(request.args.get('after')),
+                         before=decode_cursor(request.args.get('before')),
+                         limit=limit)
+    return render_template('reports/grades.html', cohorts=cohorts, grades=grades, ranking=page.rows,
+                           page=page, list_args=list_args, subjects=subject_catalog.get().by_id)
+
+@app.route('/reports/grades/export.<any(csv, xlsx):fmt>')
+@replica_reads
+def export_grades(fmt):
+    """Whole-cohort ranking with one percentage column per subject code."""
+    if fmt == 'xlsx' and not exports.xlsx_available():
+        flash("XLSX export needs the openpyxl package", "danger")
+        return redirect(url_for('grade_reports'))
+    program, semester, _ = selected_cohort(request.args)
+    if program is None:
+        flash("No students to grade yet", "danger")
+        return redirect(url_for('grade_reports'))
+    grades = grade_cache.get(program, semester)
+    subjects = subject_catalog.get().by_id
+    codes = [subjects[sid]['code'] if sid in subjects else str(sid) for sid in grades.subject_ids]
+    rows = [['rank', 'student_id', 'first_name', 'last_name', 'gpa', 'percentage', 'percentile'] + codes]
+    for r in grades.ranking():
+        rows.append([r['rank'], r['student_id'], r['first_name'], r['last_name'],
+                     r['gpa'], r['percentage'], r['percentile']]
+                    + [r['subjects'][sid] for sid in grades.subject_ids])
+    chunks = exports.xlsx_chunks(rows, title='Grades') if fmt == 'xlsx' else exports.csv_chunks(rows)
+    filename = f"grades-{program}-sem{semester}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    response = app.response_class(chunks, mimetype=exports.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@app.cli.command('attendance-summary')
+@click.argument('action', type=click.Choice(['rebuild', 'verify']))
+def attendance_summary_command(action):
+    """Rebuild attendance_summary from raw attendance, or report drift."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException("Database connection failed")
+    if action == 'rebuild':
+        rows = attendance.rebuild_summary(conn)
+        profile_changes.bump_all()
+        click.echo(f"attendance_summary rebuilt: {rows} (student, subject) rows")
+        return
+    cursor = conn.cursor()
+    try:
+        mismatches = attendance.verify_summary(cursor)
+    finally:
+        cursor.close()
+    for student_id, subject_id, s_present, s_total, a_present, a_total in mismatches:
+        click.echo(f"  student {student_id} subject {subject_id}: summary {s_present}/{s_total}, "
+                   f"actual {a_present}/{a_total}", err=True)
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} mismatched rows; run 'flask attendance-summary rebuild'")
+    click.echo("attendance_summary matches attendance")
+
+@app.cli.command('attendance-store')
+@click.argument('action', type=click.Choice(['convert', 'verify']))
+@click.option('--batch-size', default=500, show_default=True, help="Students per transaction.")
+def attendance_store_command(action, batch_size):
+    """Convert the attendance table into per-term bitmaps, or check them."""
+    import attendance_bitmap
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException("Database connection failed")
+    if action == 'convert':
+        rows = attendance_bitmap.convert(conn, batch_size=batch_size, echo=click.echo)
+        profile_changes.bump_all()
+        click.echo(f"{rows} attendance rows converted; set ATTENDANCE_STORE=bitmap to use them")
+        return
+    cursor = conn.cursor()
+    try:
+        mismatches = attendance_bitmap.verify_summary(cursor)
+    finally:
+        cursor.close()
+    for student_id, subject_id, s_present, s_total, b_present, b_total in mismatches:
+        click.echo(f"  student {student_id} subject {subject_id}: summary {s_present}/{s_total}, "
+                   f"bitmaps {b_present}/{b_total}", err=True)
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} (student, subject) pairs differ")
+    click.echo("attendance_bitmaps match attendance_summary")
+
+@app.route('/reports/export/<any(students, subjects, marks, attendance):dataset>.<any(csv, xlsx):fmt>')
+@replica_reads
+def export_report(dataset, fmt):
+    """Stream a dataset as CSV/XLSX; accepts the list pages' program/semester
+    filters plus ?subject=<code> for marks and attendance."""
+    if fmt == 'xlsx' and not exports.xlsx_available():
+        flash("XLSX export needs the openpyxl package", "danger")
+        return redirect(url_for('view_reports'))
+    conn = get_db_connection()
+    if not conn:
+        flash("Database connection failed", "danger")
+        return redirect(url_for('view_reports'))
+
+    where, params = ([], []) if dataset == 'subjects' else student_filters(request.args)
+    if dataset in ('marks', 'attendance') and request.args.get('subject'):
+        where.append("sub.code = %s")
+        params.append(request.args['subject'])
+
+    chunks = exports.export_chunks(conn, dataset, fmt, where, params)
+    filename = f"{dataset}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    response = app.response_class(stream_with_context(chunks), mimetype=exports.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ------------------------------------------------------------
+# BULK IMPORT
+# ------------------------------------------------------------
+
+@app.route('/import', methods=['GET', 'POST'])
+def bulk_import():
+    report = None
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        upload = request.files.get('file')
+        if kind not in importer.KINDS or not upload or not upload.filename:
+            flash("Choose what to import and a CSV file", "danger")
+            return redirect(url_for('bulk_import'))
+        conn = get_db_connection()
+        if not conn:
+            flash("Database connection failed", "danger")
+            return redirect(url_for('bulk_import'))
+        # Werkzeug spools large uploads to disk; wrap the stream so rows are decoded lazily.
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = importer.import_csv(conn, kind, stream, error_types=Error)
+        if report.imported:
+            invalidate_after_import(kind)
+        category = 'success' if not report.failed else 'warning'
+        flash(f"Imported {report.imported} of {report.processed} {kind} rows "
+              f"({report.failed} failed)", category)
+    return render_template('import.html', kinds=importer.KINDS, report=report)
+
+@app.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(importer.KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=importer.BATCH_SIZE, show_default=True)
+def import_csv_command(kind, path, batch_size):
+    """Stream a CSV file of KIND rows into the database."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException("Database connection failed")
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = importer.import_csv(conn, kind, f, batch_size=batch_size, error_types=Error)
+    click.echo(f"{report.imported}/{report.processed} rows imported in {report.chunks} chunk(s), "
+               f"{report.failed} failed")
+    if report.imported:
+        # Only reaches the web workers through the *_SIGNAL files.
+        invalidate_after_import(kind)
+    for line, message in report.errors:
+        click.echo(f"  line {line}: {message}", err=True)
+    if report.truncated:
+        click.echo(f"  ... {report.failed - len(report.errors)} more errors not shown", err=True)
+
+# ------------------------------------------------------------
+# COHORT ARCHIVAL
+# ------------------------------------------------------------
+
+@app.cli.group('archive')
+def archive_cli():
+    """Move graduated cohorts into archived_students."""
+
+def _archived_chunk(ids):
+    # Only reaches the web workers when the *_SIGNAL settings are set.
+    profile_changes.bump(*ids)
+    grade_cache.invalidate_all()
+    student_index.remove(*ids)
+    dashboard.invalidate()
+
+def _run_archive_job(job_id, pause):
+    try:
+        job = archive.run_job(_cli_connection(), job_id, pause=pause,
+                              on_chunk=_archived_chunk, echo=click.echo)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    if job['archived']:
+        dashboard.record_event('student', f"Archived {job['archived']} students "
+                                          f"from {job['program']}")
+
+@archive_cli.command('start')
+@click.option('--program', required=True, help="Program of the cohort to archive.")
+@click.option('--semester', help="Only this semester (default: every semester of the program).")
+@click.option('--chunk-size', default=archive.DEFAULT_CHUNK_SIZE, show_default=True,
+              help="Students per transaction.")
+@click.option('--pause', default=archive.DEFAULT_PAUSE, show_default=True,
+              help="Seconds to sleep between chunks.")
+def archive_start(program, semester, chunk_size, pause):
+    """Archive every student of a program (and semester)."""
+    try:
+        job_id = archive.create_job(_cli_connection(), program, semester, chunk_size)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"job {job_id}: archiving {program}" + (f" semester {semester}" if semester else ""))
+    _run_archive_job(job_id, pause)
+
+@archive_cli.command('resume')
+@click.argument('job_id', type=int)
+@click.option('--pause', default=archive.DEFAULT_PAUSE, show_default=True,
+              help="Seconds to sleep between chunks.")
+def archive_resume(job_id, pause):
+    """Continue an interrupted or failed job from its last archived id."""
+    _run_archive_job(job_id, pause)
+
+@archive_cli.command('status')
+def archive_status():
+    """List recent archive jobs."""
+    cursor = _cli_connection().cursor(dictionary=True)
+    try:
+        jobs = archive.list_jobs(cursor)
+    finally:
+        cursor.close()
+    for job in jobs:
+        cohort = job['program'] + (f" / {job['semester']}" if job['semester'] else "")
+        line = (f"{job['id']:>4}  {job['status']:<12} {job['archived']}/{job['total']}  "
+                f"{cohort}  (last id {job['last_id']})")
+        click.echo(line + (f"  {job['error']}" if job['error'] else ""))
+    if not jobs:
+        click.echo("no archive jobs")
+
+# ------------------------------------------------------------
+# SCHEMA MIGRATIONS
+# ------------------------------------------------------------
+
+@app.cli.group('db')
+def db_cli():
+    """Schema migrations and resets."""
+
+def _cli_connection():
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException("Database connection failed")
+    return conn
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, help="Stop after this migration version.")
+def db_upgrade(target):
+    """Apply pending migrations (SQLite: sync the schema file in place)."""
+    done = backend.upgrade(_cli_connection(), target=target, echo=click.echo)
+    click.echo(f"{len(done)} {'migration(s) applied' if backend.name == 'mysql' else 'schema change(s)'}")
+
+@db_cli.command('reset')
+@click.option('--no-sample-data', is_flag=True, help="Leave the tables empty.")
+@click.confirmation_option(prompt="Drop every table and recreate the schema?")
+def db_reset(no_sample_data):
+    """Drop all tables and recreate them from student_management.sql."""
+    backend.reset(_cli_connection(), sample_data=not no_sample_data)
+    subject_catalog.invalidate()
+    profile_changes.bump_all()
+    grade_cache.invalidate_all()
+    student_index.invalidate()
+    dashboard.invalidate()
+    click.echo(f"{backend.name} database reset")
+
+@db_cli.command('status')
+def db_status():
+    """List migrations and whether each is applied."""
+    if backend.name != 'mysql':
+        raise click.ClickException("migrations are MySQL-only; `flask db upgrade` syncs a SQLite schema")
+    for migration, applied in migrate.status(_cli_connection()):
+        click.echo(f"[{'x' if applied else ' '}] {migration.version:04d} {migration.name}")
+
+@db_cli.command('check')
+@click.option('--min-rows', default=1000, show_default=True,
+              help="Only flag full scans of tables estimated at least this large.")
+@click.option('--queries', 'query_logs', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help="Also check the SELECTs recorded in this QUERY_LOG_PATH file (repeatable).")
+def db_check(min_rows, query_logs):
+    """EXPLAIN the app's queries and fail on full table scans."""
+    if backend.name != 'mysql':
+        raise click.ClickException("the plan check reads MySQL's EXPLAIN output")
+    queries = migrate.EXPLAIN_QUERIES
+    for path in query_logs:
+        queries = migrate.merge_queries(queries, metrics.load_query_log(path))
+    problems = migrate.explain_check(_cli_connection(), min_rows=min_rows, queries=queries)
+    for route, table, rows, sql in problems:
+        click.echo(f"  {route}: full scan of {table} (~{rows} rows)\n    {sql}", err=True)
+    if problems:
+        raise click.ClickException(f"{len(problems)} query plan(s) scan a large table")
+    click.echo(f"{len(queries)} queries checked, no full scans")
+
+# ------------------------------------------------------------
+# JSON API (v1)
+# ------------------------------------------------------------
+
+@app.after_request
+def compress_api_responses(response):
+    if request.path.startswith('/api/v1/'):
+        api.compress(response, request.accept_encodings['gzip'] > 0, app.config['API_GZIP_MIN_BYTES'])
+    return response
+
+@app.route('/api/v1/')
+def api_v1_index():
+    """The resources with their fields and filters."""
+    return jsonify(resources={
+        name: {'url': url_for('api_v1_list', resource=name), 'fields': list(resource.fields),
+               'filters': list(resource.filters)}
+        for name, resource in api.RESOURCES.items()
+    }, max_ids=api.MAX_IDS, max_limit=api.MAX_LIMIT)
+
+@app.route('/api/v1/<any(students, subjects, enrollments, marks, attendance):resource>')
+@replica_reads
+def api_v1_list(resource):
+    """?ids=&fields=&since=&after=&limit= plus per-resource filters; see api.py."""
+    if resource == 'attendance' and attendance.STORE != 'rows':
+        return jsonify(error="per-session attendance is only served with ATTENDANCE_STORE=rows"), 409
+    after = decode_cursor(request.args.get('after'))
+    if request.args.get('after') and after is None:
+        return jsonify(error="after is not a valid cursor"), 400
+    conn = get_db_connection()
+    if not conn:
+        return jsonify(error="Database connection failed"), 503
+    cursor = conn.cursor(dictionary=True)
+    try:
+        rows, deleted, page, synced_at = api.fetch(cursor, api.RESOURCES[resource], request.args, after)
+    except api.ApiError as e:
+        return jsonify(error=str(e)), 400
+    except Error as e:
+        return jsonify(error=str(e)), 500
+    finally:
+        cursor.close()
+    body = {'data': rows, 'count': len(rows), 'next': page.next_cursor}
+    if page.next_cursor:
+        body['next_url'] = url_for('api_v1_list', resource=resource,
+                                   **dict(request.args.to_dict(), after=page.next_cursor))
+    if synced_at is not None:
+        body['deleted'] = deleted
+        body['synced_at'] = api.plain(synced_at)
+    return jsonify(body)
+
+# ------------------------------------------------------------
+# HEALTH
+# ------------------------------------------------------------
+
+@app.route('/health/db')
+def db_health():
+    return jsonify(primary=get_pool().stats(), **get_replicas().stats())
+
+@app.route('/health/cache')
+def cache_health():
+    return jsonify(subjects=subject_catalog.stats(), grades=grade_cache.stats(),
+                   search=student_index.stats(), dashboard=dashboard.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slow-queries')
+def slow_query_log():
+    return jsonify(threshold=slow_queries.threshold, queries=list(reversed(slow_queries.entries)))
 
 # ------------------------------------------------------------
 # MAIN
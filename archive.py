@@ -0,0 +1,232 @@
+"""Move a graduated cohort out of the live tables in small chunks.
+
+A job archives every student matching (program, semester) in id order,
+chunk_size students per transaction:
+
+- lock the next chunk with a keyset query (id > last_id ... LIMIT n FOR UPDATE)
+- write one archived_students row per student, with their profile and full
+  attendance history as a zlib-compressed JSON payload
+- DELETE the students; ON DELETE CASCADE takes their enrollments, marks,
+  attendance, summaries and bitmaps with them (tombstoned for the v1 API)
+- advance archive_jobs.last_id / archived and commit
+
+and sleeps `pause` seconds before the next chunk, so the live tables are
+only ever locked for one short chunk at a time. A job that is interrupted
+(Ctrl-C, crash, lost connection) has lost at most its uncommitted chunk;
+run_job() on it again continues from last_id.
+"""
+import json
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import api
+import attendance
+from student_profile import StudentProfile, load_profile
+
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_PAUSE = 0.5
+PAYLOAD_FORMAT = 1
+
+JOB_COLUMNS = ('id', 'program', 'semester', 'status', 'chunk_size', 'last_id',
+               'archived', 'total', 'error', 'created_at', 'updated_at')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"cannot archive {type(value).__name__} value {value!r}")
+
+
+def pack(profile, history):
+    document = {'format': PAYLOAD_FORMAT, 'profile': profile.as_dict(),
+                'attendance_history': history}
+    return zlib.compress(json.dumps(document, default=_plain, separators=(',', ':')).encode())
+
+
+def unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def _cohort(program, semester):
+    if semester is None:
+        return "program = %s", [program]
+    return "program = %s AND semester = %s", [program, semester]
+
+
+# -------------------- jobs --------------------
+
+def create_job(conn, program, semester=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Record a new job for the cohort and return its id. semester None = every semester."""
+    if not program:
+        raise ArchiveError("program is required")
+    if chunk_size < 1:
+        raise ArchiveError("chunk size must be at least 1")
+    where, params = _cohort(program, semester)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM students WHERE {where}", params)
+        total = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO archive_jobs (program, semester, status, chunk_size, total)
+            VALUES (%s, %s, 'pending', %s, %s)
+        """, (program, semester, chunk_size, total))
+        job_id = cursor.lastrowid
+        conn.commit()
+        return job_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def get_job(cursor, job_id, lock=False):
+    cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM archive_jobs WHERE id = %s"
+                   f"{' FOR UPDATE' if lock else ''}", (job_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(row) if isinstance(row, dict) else dict(zip(JOB_COLUMNS, row))
+
+
+def list_jobs(cursor, limit=20):
+    cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM archive_jobs ORDER BY id DESC LIMIT %s",
+                   (limit,))
+    return [dict(row) if isinstance(row, dict) else dict(zip(JOB_COLUMNS, row))
+            for row in cursor.fetchall()]
+
+
+def _set_status(conn, job_id, status, error=None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE archive_jobs SET status = %s, error = %s WHERE id = %s",
+                       (status, error, job_id))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def _archive_chunk(conn, job_id):
+    """Archive the job's next chunk in one transaction.
+
+    Returns (job, student pks archived); an empty list means the job is done.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        job = get_job(cursor, job_id, lock=True)
+        if job is None:
+            raise ArchiveError(f"no archive job {job_id}")
+        where, params = _cohort(job['program'], job['semester'])
+        cursor.execute(f"""
+            SELECT id FROM students
+            WHERE {where} AND id > %s
+            ORDER BY id LIMIT %s FOR UPDATE
+        """, [*params, job['last_id'], job['chunk_size']])
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            cursor.execute("UPDATE archive_jobs SET status = 'done', error = NULL WHERE id = %s",
+                           (job_id,))
+            conn.commit()
+            job['status'] = 'done'
+            return job, []
+
+        now = datetime.now().replace(microsecond=0)
+        rows = []
+        for student_pk in ids:
+            profile = load_profile(cursor, student_pk)
+            history = attendance.history(cursor, student_pk, limit=None)
+            student = profile.student
+            rows.append((student_pk, student['student_id'], student['first_name'],
+                         student['last_name'], student['email'], student['program'],
+                         student['semester'], job_id, now, pack(profile, history)))
+        cursor.execute(f"""
+            INSERT INTO archived_students (id, student_id, first_name, last_name, email,
+                                           program, semester, job_id, archived_at, payload)
+            VALUES {','.join(['(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)'] * len(rows))}
+        """, [value for row in rows for value in row])
+        in_ids = f"id IN ({','.join(['%s'] * len(ids))})"
+        api.record_deletes(cursor, 'students', in_ids, ids)
+        cursor.execute(f"DELETE FROM students WHERE {in_ids}", ids)
+        cursor.execute("""
+            UPDATE archive_jobs SET status = 'running', last_id = %s, archived = archived + %s
+            WHERE id = %s
+        """, (ids[-1], len(ids), job_id))
+        conn.commit()
+        job.update(status='running', last_id=ids[-1], archived=job['archived'] + len(ids))
+        return job, ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_job(conn, job_id, pause=DEFAULT_PAUSE, max_chunks=None, on_chunk=None, echo=print):
+    """Archive chunks until the cohort is empty (or max_chunks have run).
+
+    on_chunk(ids) is called after each committed chunk so the caller can drop
+    cached copies of those students. Returns the job row as it ends.
+    """
+    chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            started = time.monotonic()
+            job, ids = _archive_chunk(conn, job_id)
+            if not ids:
+                echo(f"job {job_id}: done, {job['archived']} archived")
+                return job
+            chunks += 1
+            if on_chunk:
+                on_chunk(ids)
+            echo(f"job {job_id}: {job['archived']}/{job['total']} archived "
+                 f"(ids {ids[0]}-{ids[-1]}, {time.monotonic() - started:.2f}s)")
+            if pause:
+                time.sleep(pause)
+    except KeyboardInterrupt:
+        _set_status(conn, job_id, 'interrupted')
+        echo(f"job {job_id}: interrupted; `flask archive resume {job_id}` continues it")
+        raise
+    except Exception as e:
+        _set_status(conn, job_id, 'failed', str(e)[:255])
+        raise
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return get_job(cursor, job_id)
+    finally:
+        cursor.close()
+
+
+# -------------------- reads --------------------
+
+class ArchivedStudent:
+    def __init__(self, profile, history, archived_at, job_id):
+        self.profile = profile
+        self.history = history
+        self.archived_at = archived_at
+        self.job_id = job_id
+
+    def as_dict(self):
+        return dict(self.profile.as_dict(), archived=True, job_id=self.job_id,
+                    archived_at=_plain(self.archived_at) if self.archived_at else None,
+                    attendance_history=self.history)
+
+
+def load_archived(cursor, student_pk):
+    """ArchivedStudent for an archived student pk, or None."""
+    cursor.execute("SELECT job_id, archived_at, payload FROM archived_students WHERE id = %s",
+                   (student_pk,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    job_id, archived_at, payload = row.values() if isinstance(row, dict) else row
+    document = unpack(payload)
+    return ArchivedStudent(StudentProfile.from_dict(document['profile']),
+                           document['attendance_history'], archived_at, job_id)
@@ -0,0 +1,319 @@
+"""Batched attendance writes shared by the roll-call page, the kiosk API,
+the single-student form and the CSV importer.
+
+Every path ends in write_attendance(), which turns a list of
+(student_id, subject_id, date, status) rows into multi-row upserts keyed on
+the (student_id, subject_id, date) unique index, so re-submitting a session
+updates rows instead of duplicating them. In the same transaction it applies
+the resulting present/total deltas to attendance_summary, the
+per-(student, subject) counts the reports read instead of aggregating the raw
+table.
+
+use_store('bitmap') moves per-session storage to the packed per-term bitsets
+in attendance_bitmap.py; the functions below then delegate to it.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+STATUSES = ('Present', 'Absent')
+DEFAULT_STATUS = 'Present'
+
+# Keep single statements comfortably under max_allowed_packet.
+ROWS_PER_STATEMENT = 1000
+
+
+# Where per-session attendance lives: 'rows' (the attendance table) or
+# 'bitmap' (attendance_bitmap.py). Set once at startup with use_store().
+STORES = ('rows', 'bitmap')
+STORE = 'rows'
+
+
+class AttendanceError(ValueError):
+    pass
+
+
+def use_store(name):
+    global STORE
+    if name not in STORES:
+        raise AttendanceError(f"attendance store must be one of {', '.join(STORES)}, not {name!r}")
+    STORE = name
+
+
+def _bitmaps():
+    """attendance_bitmap when that store is active, else None."""
+    if STORE != 'bitmap':
+        return None
+    import attendance_bitmap  # imports this module, so not at the top
+    return attendance_bitmap
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def normalize_status(value):
+    status = (value or '').strip().capitalize()
+    if status not in STATUSES:
+        raise AttendanceError(f"status must be one of {', '.join(STATUSES)}, not {value!r}")
+    return status
+
+
+def _existing_statuses(cursor, batch):
+    """Current status of each (student, subject, date) in batch, locked for update."""
+    keys = ','.join(['(%s,%s,%s)'] * len(batch))
+    cursor.execute(f"""
+        SELECT student_id, subject_id, date, status FROM attendance
+        WHERE (student_id, subject_id, date) IN ({keys})
+        FOR UPDATE
+    """, [value for row in batch for value in row[:3]])
+    return {(row[0], row[1], str(row[2])): row[3] for row in cursor.fetchall()}
+
+
+def _summary_deltas(existing, batch, daily=None):
+    """{(student, subject): [present_delta, total_delta]} for applying batch.
+
+    With `daily`, the same deltas are also added up per class date into it.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    current = dict(existing)
+    for student_id, subject_id, date, status in batch:
+        key = (student_id, subject_id, str(date))
+        old = current.get(key)
+        delta = deltas[(student_id, subject_id)]
+        change = [(status == 'Present') - (old == 'Present'), 1 if old is None else 0]
+        delta[0] += change[0]
+        delta[1] += change[1]
+        if daily is not None:
+            day_delta = daily.setdefault(_as_date(date), [0, 0])
+            day_delta[0] += change[0]
+            day_delta[1] += change[1]
+        current[key] = status
+    return {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+
+
+def _apply_summary_deltas(cursor, deltas):
+    if not deltas:
+        return
+    placeholders = ','.join(['(%s,%s,%s,%s)'] * len(deltas))
+    params = [value for (student_id, subject_id), (present, total) in deltas.items()
+              for value in (student_id, subject_id, present, total)]
+    cursor.execute(f"""
+        INSERT INTO attendance_summary (student_id, subject_id, present_count, total_count)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE present_count = present_count + VALUES(present_count),
+                                total_count = total_count + VALUES(total_count)
+    """, params)
+
+
+def write_attendance(cursor, rows, daily=None):
+    """Upsert (student_id, subject_id, date, status) rows and keep
+    attendance_summary in step. Caller commits.
+
+    daily -- optional dict that receives {date: [present_delta, total_delta]}
+    """
+    if _bitmaps():
+        return _bitmaps().write_attendance(cursor, rows, daily)
+    rows = list(rows)
+    for start in range(0, len(rows), ROWS_PER_STATEMENT):
+        batch = rows[start:start + ROWS_PER_STATEMENT]
+        deltas = _summary_deltas(_existing_statuses(cursor, batch), batch, daily)
+        placeholders = ','.join(['(%s,%s,%s,%s)'] * len(batch))
+        params = [value for row in batch for value in row]
+        cursor.execute(f"""
+            INSERT INTO attendance (student_id, subject_id, date, status)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE status=VALUES(status)
+        """, params)
+        _apply_summary_deltas(cursor, deltas)
+    return len(rows)
+
+
+def roll_call(cursor, subject_id, date):
+    """Enrolled students for a session with their recorded (or default) status."""
+    if _bitmaps():
+        return _bitmaps().roll_call(cursor, subject_id, date)
+    cursor.execute("""
+        SELECT s.id, s.student_id, s.first_name, s.last_name, a.status
+        FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN attendance a
+               ON a.student_id = s.id AND a.subject_id = %s AND a.date = %s
+        ORDER BY s.last_name, s.first_name, s.id
+    """, (subject_id, subject_id, date))
+    roster = cursor.fetchall()
+    for row in roster:
+        row['recorded'] = row['status'] is not None
+        if not row['recorded']:
+            row['status'] = DEFAULT_STATUS
+    return roster
+
+
+def history(cursor, student_id, limit=100):
+    """The student's most recent sessions as {date, status, subject_code} rows
+    (every session when limit is None)."""
+    if _bitmaps():
+        return _bitmaps().history(cursor, student_id, limit)
+    cursor.execute(f"""
+        SELECT a.date, a.status, s.code AS subject_code
+        FROM attendance a JOIN subjects s ON s.id = a.subject_id
+        WHERE a.student_id=%s
+        ORDER BY a.date DESC{' LIMIT %s' if limit is not None else ''}
+    """, (student_id, limit) if limit is not None else (student_id,))
+    return cursor.fetchall()
+
+
+def range_counts(cursor, start, end):
+    """{(student_id, subject_id): (present, total)} for classes held start..end."""
+    if _bitmaps():
+        return _bitmaps().range_counts(cursor, start, end)
+    cursor.execute("""
+        SELECT student_id, subject_id,
+               SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END), COUNT(*)
+        FROM attendance WHERE date BETWEEN %s AND %s
+        GROUP BY student_id, subject_id
+    """, (start, end))
+    rows = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+    return {(row[0], row[1]): (int(row[2]), row[3]) for row in rows}
+
+
+def daily_counts(cursor, start, end):
+    """{date: (present, total)} over every class held start..end."""
+    if _bitmaps():
+        return _bitmaps().daily_counts(cursor, start, end)
+    cursor.execute("""
+        SELECT date, SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END), COUNT(*)
+        FROM attendance WHERE date BETWEEN %s AND %s
+        GROUP BY date
+    """, (start, end))
+    rows = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+    return {_as_date(row[0]): (int(row[1]), row[2]) for row in rows}
+
+
+def enrolled_student_ids(cursor, subject_id):
+    cursor.execute("SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s", (subject_id,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def record_roll_call(conn, subject_id, date, statuses, missing_status=None, daily=None):
+    """Write a whole session in one transaction.
+
+    statuses       -- {student_pk: status} for the students being marked
+    missing_status -- if set, every other enrolled student gets this status
+                      (kiosks only report who tapped in)
+    daily          -- passed on to write_attendance()
+
+    Students not enrolled in the subject are rejected rather than written.
+    Returns (written_ids, rejected_ids). Rolls back and re-raises on failure.
+    """
+    try:
+        subject_id = int(subject_id)
+    except (TypeError, ValueError):
+        raise AttendanceError(f"invalid subject id {subject_id!r}")
+    cursor = conn.cursor()
+    try:
+        enrolled = enrolled_student_ids(cursor, subject_id)
+        rows, rejected = [], []
+        for student_id, status in statuses.items():
+            if student_id in enrolled:
+                rows.append((student_id, subject_id, date, normalize_status(status)))
+            else:
+                rejected.append(student_id)
+        if missing_status is not None:
+            missing_status = normalize_status(missing_status)
+            rows.extend((student_id, subject_id, date, missing_status)
+                        for student_id in sorted(enrolled - set(statuses)))
+        write_attendance(cursor, rows, daily)
+        conn.commit()
+        return [row[0] for row in rows], rejected
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# -------------------- summary reads & maintenance --------------------
+
+def percentage(present, total):
+    return (present / total * 100) if total else 0.0
+
+
+def student_summary(cursor, student_id):
+    """{subject_id: {name, code, present, total, percentage}} for one student."""
+    cursor.execute("""
+        SELECT sm.subject_id, sub.code, sub.name, sm.present_count, sm.total_count
+        FROM attendance_summary sm JOIN subjects sub ON sub.id = sm.subject_id
+        WHERE sm.student_id=%s
+        ORDER BY sub.code
+    """, (student_id,))
+    return {
+        row['subject_id']: {
+            'name': row['name'],
+            'code': row['code'],
+            'present': row['present_count'],
+            'total': row['total_count'],
+            'percentage': percentage(row['present_count'], row['total_count']),
+        }
+        for row in cursor.fetchall()
+    }
+
+
+def rebuild_summary(conn):
+    """Recompute attendance_summary from the raw table in one transaction."""
+    if _bitmaps():
+        return _bitmaps().rebuild_summary(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM attendance_summary")
+        cursor.execute("""
+            INSERT INTO attendance_summary (student_id, subject_id, present_count, total_count)
+            SELECT student_id, subject_id,
+                   SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END), COUNT(*)
+            FROM attendance
+            GROUP BY student_id, subject_id
+        """)
+        rows = cursor.rowcount
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def verify_summary(cursor):
+    """Rows where attendance_summary disagrees with the raw attendance table.
+
+    Returns (student_id, subject_id, summary_present, summary_total,
+    actual_present, actual_total) tuples; NULL on one side means the row is
+    missing there.
+    """
+    if _bitmaps():
+        return _bitmaps().verify_summary(cursor)
+    actual = """
+        SELECT student_id, subject_id,
+               SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END) AS present_count,
+               COUNT(*) AS total_count
+        FROM attendance GROUP BY student_id, subject_id
+    """
+    cursor.execute(f"""
+        SELECT a.student_id, a.subject_id, sm.present_count, sm.total_count,
+               a.present_count, a.total_count
+        FROM ({actual}) a
+        LEFT JOIN attendance_summary sm
+               ON sm.student_id = a.student_id AND sm.subject_id = a.subject_id
+        WHERE sm.student_id IS NULL
+           OR sm.present_count <> a.present_count OR sm.total_count <> a.total_count
+        UNION ALL
+        SELECT sm.student_id, sm.subject_id, sm.present_count, sm.total_count, NULL, NULL
+        FROM attendance_summary sm
+        LEFT JOIN ({actual}) a
+               ON a.student_id = sm.student_id AND a.subject_id = sm.subject_id
+        WHERE a.student_id IS NULL AND sm.total_count <> 0
+    """)
+    return cursor.fetchall()
@@ -0,0 +1,411 @@
+"""Packed per-term attendance bitsets, an alternative to one row per class.
+
+class_sessions numbers the classes a subject holds in a term (0, 1, 2, ...
+in the order they are first recorded). attendance_bitmaps keeps, per
+(student, subject, term), two bitsets indexed by that number: `recorded`
+(attendance was taken) and `present`. A term of daily classes costs a few
+dozen bytes per student instead of a row per class.
+
+Counts are popcounts, a date range is a mask over session numbers, and a
+whole-class roll call is one locked read and one multi-row upsert of the
+class's bitsets. attendance.py switches to this store with
+use_store('bitmap') and keeps calling the same functions; attendance_summary
+is maintained exactly as for the row store, so the reports and the profile
+page do not change.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+from attendance import DEFAULT_STATUS, ROWS_PER_STATEMENT, _apply_summary_deltas
+
+# Terms run January-June and July-December.
+SECOND_TERM_MONTH = 7
+
+
+def term_for(day):
+    return f"{day.year}-{1 if day.month < SECOND_TERM_MONTH else 2}"
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _rows(rows):
+    """Rows as tuples whether the caller's cursor returns tuples or dicts."""
+    return [tuple(row.values()) if isinstance(row, dict) else row for row in rows]
+
+
+# -------------------- bitsets --------------------
+# Bit n is session number n; stored little-endian so a term only grows at the end.
+
+def to_int(blob):
+    return int.from_bytes(blob or b'', 'little')
+
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def mask(session_nos):
+    bits = 0
+    for number in session_nos:
+        bits |= 1 << number
+    return bits
+
+
+def counts(present, recorded, within=-1):
+    """(present, total) over the sessions in `within` (default: all)."""
+    return (present & within).bit_count(), (recorded & within).bit_count()
+
+
+# -------------------- sessions --------------------
+
+def _load_sessions(cursor, pairs, lock=False):
+    found = {}
+    pairs = list(pairs)
+    for start in range(0, len(pairs), ROWS_PER_STATEMENT):
+        chunk = pairs[start:start + ROWS_PER_STATEMENT]
+        keys = ','.join(['(%s,%s)'] * len(chunk))
+        cursor.execute(f"""
+            SELECT subject_id, date, term, session_no FROM class_sessions
+            WHERE (subject_id, date) IN ({keys})
+            {'FOR UPDATE' if lock else ''}
+        """, [value for pair in chunk for value in pair])
+        for subject_id, day, term, number in _rows(cursor.fetchall()):
+            found[(subject_id, _day(day))] = (term, number)
+    return found
+
+
+def session_numbers(cursor, pairs, create=True):
+    """{(subject_id, date): (term, session_no)} for (subject_id, date) pairs.
+
+    With create, sessions seen for the first time are numbered after the last
+    one of their (subject, term), in date order.
+    """
+    pairs = {(int(subject_id), _day(day)) for subject_id, day in pairs}
+    found = _load_sessions(cursor, pairs)
+    missing = pairs - found.keys()
+    if not missing or not create:
+        return found
+
+    groups = sorted({(subject_id, term_for(day)) for subject_id, day in missing})
+    next_number = {}
+    for start in range(0, len(groups), ROWS_PER_STATEMENT):
+        chunk = groups[start:start + ROWS_PER_STATEMENT]
+        keys = ','.join(['(%s,%s)'] * len(chunk))
+        values = [value for group in chunk for value in group]
+        # MAX(session_no) FOR UPDATE locks nothing for a term's first session,
+        # so concurrent writers would both start at 0. The upsert creates (or
+        # write-locks) one row per (subject, term) for them to queue on.
+        cursor.execute(f"""
+            INSERT INTO class_session_locks (subject_id, term)
+            VALUES {keys}
+            ON DUPLICATE KEY UPDATE term = term
+        """, values)
+        cursor.execute(f"""
+            SELECT subject_id, term, MAX(session_no) FROM class_sessions
+            WHERE (subject_id, term) IN ({keys})
+            GROUP BY subject_id, term
+            FOR UPDATE
+        """, values)
+        for subject_id, term, last in _rows(cursor.fetchall()):
+            next_number[(subject_id, term)] = last + 1
+
+    # Whoever held the locks before us may have created some of these.
+    found.update(_load_sessions(cursor, missing, lock=True))
+    new = []
+    for subject_id, day in sorted(missing - found.keys(), key=lambda pair: (pair[1], pair[0])):
+        term = term_for(day)
+        number = next_number.get((subject_id, term), 0)
+        next_number[(subject_id, term)] = number + 1
+        new.append((subject_id, term, number, day))
+    for start in range(0, len(new), ROWS_PER_STATEMENT):
+        chunk = new[start:start + ROWS_PER_STATEMENT]
+        cursor.execute(f"""
+            INSERT INTO class_sessions (subject_id, term, session_no, date)
+            VALUES {','.join(['(%s,%s,%s,%s)'] * len(chunk))}
+        """, [value for row in chunk for value in row])
+    found.update({(subject_id, day): (term, number) for subject_id, term, number, day in new})
+    return found
+
+
+# -------------------- writes --------------------
+
+def _load_bitmaps(cursor, keys, lock=False):
+    """{(student, subject, term): [present_bits, recorded_bits]} for the keys given."""
+    bitmaps = {}
+    keys = list(keys)
+    for start in range(0, len(keys), ROWS_PER_STATEMENT):
+        chunk = keys[start:start + ROWS_PER_STATEMENT]
+        placeholders = ','.join(['(%s,%s,%s)'] * len(chunk))
+        cursor.execute(f"""
+            SELECT student_id, subject_id, term, present, recorded FROM attendance_bitmaps
+            WHERE (student_id, subject_id, term) IN ({placeholders})
+            {'FOR UPDATE' if lock else ''}
+        """, [value for key in chunk for value in key])
+        for student_id, subject_id, term, present, recorded in _rows(cursor.fetchall()):
+            bitmaps[(student_id, subject_id, term)] = [to_int(present), to_int(recorded)]
+    return bitmaps
+
+
+def _store_bitmaps(cursor, bitmaps):
+    items = list(bitmaps.items())
+    for start in range(0, len(items), ROWS_PER_STATEMENT):
+        chunk = items[start:start + ROWS_PER_STATEMENT]
+        cursor.execute(f"""
+            INSERT INTO attendance_bitmaps (student_id, subject_id, term, present, recorded)
+            VALUES {','.join(['(%s,%s,%s,%s,%s)'] * len(chunk))}
+            ON DUPLICATE KEY UPDATE present=VALUES(present), recorded=VALUES(recorded)
+        """, [value for (student_id, subject_id, term), (present, recorded) in chunk
+              for value in (student_id, subject_id, term, to_bytes(present), to_bytes(recorded))])
+
+
+def write_attendance(cursor, rows, daily=None):
+    """Set (student_id, subject_id, date, status) rows in the bitsets and keep
+    attendance_summary in step. Caller commits."""
+    rows = [(student_id, int(subject_id), _day(day), status)
+            for student_id, subject_id, day, status in rows]
+    if not rows:
+        return 0
+    sessions = session_numbers(cursor, {(subject_id, day) for _, subject_id, day, _ in rows})
+    keys = {(student_id, subject_id, sessions[(subject_id, day)][0])
+            for student_id, subject_id, day, _ in rows}
+    bitmaps = _load_bitmaps(cursor, keys, lock=True)
+    touched = {}
+    deltas = defaultdict(lambda: [0, 0])
+    for student_id, subject_id, day, status in rows:
+        term, number = sessions[(subject_id, day)]
+        key = (student_id, subject_id, term)
+        bits = touched[key] = bitmaps.setdefault(key, [0, 0])
+        bit = 1 << number
+        delta = deltas[(student_id, subject_id)]
+        change = [(status == 'Present') - bool(bits[0] & bit), 0 if bits[1] & bit else 1]
+        delta[0] += change[0]
+        delta[1] += change[1]
+        if daily is not None:
+            day_delta = daily.setdefault(day, [0, 0])
+            day_delta[0] += change[0]
+            day_delta[1] += change[1]
+        bits[1] |= bit
+        bits[0] = bits[0] | bit if status == 'Present' else bits[0] & ~bit
+    _store_bitmaps(cursor, touched)
+    _apply_summary_deltas(cursor, {key: delta for key, delta in deltas.items() if delta != [0, 0]})
+    return len(rows)
+
+
+# -------------------- reads --------------------
+
+def roll_call(cursor, subject_id, day):
+    """Enrolled students for a session with their recorded (or default) status."""
+    day = _day(day)
+    session = session_numbers(cursor, [(subject_id, day)], create=False).get((int(subject_id), day))
+    cursor.execute("""
+        SELECT s.id, s.student_id, s.first_name, s.last_name, b.present, b.recorded
+        FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN attendance_bitmaps b
+               ON b.student_id = s.id AND b.subject_id = %s AND b.term = %s
+        ORDER BY s.last_name, s.first_name, s.id
+    """, (subject_id, subject_id, term_for(day)))
+    roster = cursor.fetchall()
+    bit = 1 << session[1] if session else 0
+    for row in roster:
+        present, recorded = to_int(row.pop('present')), to_int(row.pop('recorded'))
+        row['recorded'] = bool(recorded & bit)
+        if row['recorded']:
+            row['status'] = 'Present' if present & bit else 'Absent'
+        else:
+            row['status'] = DEFAULT_STATUS
+    return roster
+
+
+def history(cursor, student_id, limit=100):
+    """The student's most recent sessions as {date, status, subject_code} rows."""
+    cursor.execute("""
+        SELECT b.subject_id, b.term, b.present, b.recorded, sub.code
+        FROM attendance_bitmaps b JOIN subjects sub ON sub.id = b.subject_id
+        WHERE b.student_id = %s
+    """, (student_id,))
+    bitmaps = {(row[0], row[1]): (to_int(row[2]), to_int(row[3]), row[4]) for row in _rows(cursor.fetchall())}
+    if not bitmaps:
+        return []
+    keys = list(bitmaps)
+    cursor.execute(f"""
+        SELECT subject_id, term, session_no, date FROM class_sessions
+        WHERE (subject_id, term) IN ({','.join(['(%s,%s)'] * len(keys))})
+        ORDER BY date DESC, subject_id
+    """, [value for key in keys for value in key])
+    rows = []
+    for subject_id, term, number, day in _rows(cursor.fetchall()):
+        present, recorded, code = bitmaps[(subject_id, term)]
+        bit = 1 << number
+        if recorded & bit:
+            rows.append({'date': _day(day), 'status': 'Present' if present & bit else 'Absent',
+                         'subject_code': code})
+            if len(rows) == limit:
+                break
+    return rows
+
+
+def range_counts(cursor, start, end):
+    """{(student_id, subject_id): (present, total)} for classes held start..end."""
+    cursor.execute("""
+        SELECT subject_id, term, session_no FROM class_sessions
+        WHERE date BETWEEN %s AND %s
+    """, (start, end))
+    masks = defaultdict(int)
+    for subject_id, term, number in _rows(cursor.fetchall()):
+        masks[(subject_id, term)] |= 1 << number
+    totals = defaultdict(lambda: [0, 0])
+    keys = list(masks)
+    for offset in range(0, len(keys), ROWS_PER_STATEMENT):
+        chunk = keys[offset:offset + ROWS_PER_STATEMENT]
+        cursor.execute(f"""
+            SELECT student_id, subject_id, term, present, recorded FROM attendance_bitmaps
+            WHERE (subject_id, term) IN ({','.join(['(%s,%s)'] * len(chunk))})
+        """, [value for key in chunk for value in key])
+        for student_id, subject_id, term, present, recorded in _rows(cursor.fetchall()):
+            p, t = counts(to_int(present), to_int(recorded), masks[(subject_id, term)])
+            if t:
+                total = totals[(student_id, subject_id)]
+                total[0] += p
+                total[1] += t
+    return {key: tuple(value) for key, value in totals.items()}
+
+
+def daily_counts(cursor, start, end):
+    """{date: (present, total)} over every class held start..end."""
+    cursor.execute("""
+        SELECT subject_id, term, session_no, date FROM class_sessions
+        WHERE date BETWEEN %s AND %s
+    """, (start, end))
+    sessions = defaultdict(dict)
+    for subject_id, term, number, day in _rows(cursor.fetchall()):
+        sessions[(subject_id, term)][number] = _day(day)
+    totals = defaultdict(lambda: [0, 0])
+    keys = list(sessions)
+    for offset in range(0, len(keys), ROWS_PER_STATEMENT):
+        chunk = keys[offset:offset + ROWS_PER_STATEMENT]
+        cursor.execute(f"""
+            SELECT subject_id, term, present, recorded FROM attendance_bitmaps
+            WHERE (subject_id, term) IN ({','.join(['(%s,%s)'] * len(chunk))})
+        """, [value for key in chunk for value in key])
+        for subject_id, term, present, recorded in _rows(cursor.fetchall()):
+            present, recorded = to_int(present), to_int(recorded)
+            for number, day in sessions[(subject_id, term)].items():
+                if recorded >> number & 1:
+                    total = totals[day]
+                    total[0] += present >> number & 1
+                    total[1] += 1
+    return {day: tuple(value) for day, value in totals.items()}
+
+
+def summary_counts(cursor):
+    """{(student_id, subject_id): [present, total]} over every term, by popcount."""
+    cursor.execute("SELECT student_id, subject_id, present, recorded FROM attendance_bitmaps")
+    totals = defaultdict(lambda: [0, 0])
+    while True:
+        rows = cursor.fetchmany(ROWS_PER_STATEMENT)
+        if not rows:
+            break
+        for student_id, subject_id, present, recorded in _rows(rows):
+            p, t = counts(to_int(present), to_int(recorded))
+            total = totals[(student_id, subject_id)]
+            total[0] += p
+            total[1] += t
+    return totals
+
+
+# -------------------- summary maintenance & conversion --------------------
+
+def rebuild_summary(conn):
+    """Recompute attendance_summary from the bitsets in one transaction."""
+    cursor = conn.cursor()
+    try:
+        totals = [(student_id, subject_id, p, t)
+                  for (student_id, subject_id), (p, t) in summary_counts(cursor).items() if t]
+        cursor.execute("DELETE FROM attendance_summary")
+        for start in range(0, len(totals), ROWS_PER_STATEMENT):
+            chunk = totals[start:start + ROWS_PER_STATEMENT]
+            cursor.execute(f"""
+                INSERT INTO attendance_summary (student_id, subject_id, present_count, total_count)
+                VALUES {','.join(['(%s,%s,%s,%s)'] * len(chunk))}
+            """, [value for row in chunk for value in row])
+        conn.commit()
+        return len(totals)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def verify_summary(cursor):
+    """Same shape as attendance.verify_summary(), against the bitsets."""
+    actual = summary_counts(cursor)
+    cursor.execute("SELECT student_id, subject_id, present_count, total_count FROM attendance_summary")
+    summary = {(row[0], row[1]): (row[2], row[3]) for row in _rows(cursor.fetchall())}
+    mismatches = []
+    for key in sorted(actual.keys() | summary.keys()):
+        a_present, a_total = actual.get(key, (None, None))
+        s_present, s_total = summary.get(key, (None, None))
+        if a_total is None and not s_total:
+            continue
+        if (s_present, s_total) != (a_present, a_total):
+            mismatches.append((key[0], key[1], s_present, s_total, a_present, a_total))
+    return mismatches
+
+
+def convert(conn, batch_size=500, echo=print):
+    """Build class_sessions and attendance_bitmaps from the attendance table.
+
+    Run before switching ATTENDANCE_STORE to 'bitmap': bitsets of the students
+    converted are overwritten with what the row table holds. Commits every
+    `batch_size` students, so an interrupted run can simply be started again.
+    Returns the number of attendance rows converted.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT subject_id, date FROM attendance ORDER BY date, subject_id")
+        pairs = [(subject_id, _day(day)) for subject_id, day in cursor.fetchall()]
+        for start in range(0, len(pairs), ROWS_PER_STATEMENT):
+            session_numbers(cursor, pairs[start:start + ROWS_PER_STATEMENT])
+            conn.commit()
+        echo(f"{len(pairs)} class sessions")
+
+        converted, last_id = 0, 0
+        while True:
+            cursor.execute("""
+                SELECT DISTINCT student_id FROM attendance
+                WHERE student_id > %s ORDER BY student_id LIMIT %s
+            """, (last_id, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.execute(f"""
+                SELECT a.student_id, a.subject_id, cs.term, cs.session_no, a.status
+                FROM attendance a
+                JOIN class_sessions cs ON cs.subject_id = a.subject_id AND cs.date = a.date
+                WHERE a.student_id IN ({','.join(['%s'] * len(ids))})
+            """, ids)
+            bitmaps = defaultdict(lambda: [0, 0])
+            for student_id, subject_id, term, number, status in cursor.fetchall():
+                bits = bitmaps[(student_id, subject_id, term)]
+                bits[1] |= 1 << number
+                if status == 'Present':
+                    bits[0] |= 1 << number
+                converted += 1
+            _store_bitmaps(cursor, bitmaps)
+            conn.commit()
+            last_id = ids[-1]
+            echo(f"  students up to id {last_id}: {converted} rows converted")
+        return converted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,159 @@
+"""Fill the configured database with seeded synthetic data.
+
+Writes students, subjects, enrollments, marks and attendance through the
+app's own connection settings (DB_BACKEND, MYSQL_* / SQLITE_PATH), in
+batches of students with one commit per batch, then rebuilds
+attendance_summary (and the bitmaps when ATTENDANCE_STORE=bitmap).
+The same --seed and sizes always produce the same rows.
+
+Rows are appended after the current maximum ids, so it can be run on top of
+existing data; use --reset for an empty schema first.
+
+    python benchmarks/datagen.py --reset                        # 100k students, 1M enrollments, 50M attendance
+    python benchmarks/datagen.py --reset --students 2000 --subjects 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typeahead import FIRST_NAMES, LAST_NAMES, PROGRAMS  # noqa: E402
+
+SUBJECT_WORDS = ['Algorithms', 'Databases', 'Networks', 'Statistics', 'Accounting', 'Marketing', 'Economics',
+                 'Calculus', 'Physics', 'Ethics', 'Compilers', 'Security', 'Finance', 'Design', 'Law']
+
+
+def weekdays_before(end, count):
+    """The `count` weekdays up to and including `end`, oldest first."""
+    days, day = [], end
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def insert_rows(cursor, table, columns, rows, batch=1000):
+    placeholders = '(' + ','.join(['%s'] * len(columns)) + ')'
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {','.join([placeholders] * len(chunk))}",
+                       [value for row in chunk for value in row])
+
+
+def max_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.sessions = weekdays_before(date.today() - timedelta(days=1), args.sessions)
+        # Exams spread evenly over the term.
+        self.exam_dates = [self.sessions[(e + 1) * len(self.sessions) // (args.exams + 1) - 1]
+                           for e in range(args.exams)]
+
+    def subjects(self, first_id):
+        rng = self.rng
+        return [(first_id + j, f"G{first_id + j:05d}",
+                 f"{rng.choice(SUBJECT_WORDS)} {rng.choice(['I', 'II', 'III', 'Lab', 'Seminar'])}",
+                 rng.choice([2, 3, 4]))
+                for j in range(self.args.subjects)]
+
+    def student_batch(self, first_id, count, subject_ids):
+        """(students, enrollments, marks, attendance) rows for ids first_id..first_id+count-1."""
+        rng, args = self.rng, self.args
+        students, enrollments, marks, rows = [], [], [], []
+        enrolled_on = datetime.combine(self.sessions[0] - timedelta(days=14), datetime.min.time())
+        per_student = min(args.enrollments_per_student, len(subject_ids))
+        for pk in range(first_id, first_id + count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            students.append((pk, f"G{pk:07d}", first, last, f"{first}.{last}.{pk}@example.edu".lower(),
+                             f"9{rng.randint(100000000, 999999999)}", f"{rng.randint(1, 999)} Campus Road",
+                             rng.choice(PROGRAMS), str(rng.randint(1, 8))))
+            ability = rng.gauss(65, 12)
+            presence = rng.uniform(0.6, 0.98)
+            for subject_id in rng.sample(subject_ids, per_student):
+                enrollments.append((pk, subject_id, enrolled_on))
+                for exam_date in self.exam_dates:
+                    score = min(100.0, max(0.0, round(rng.gauss(ability, 8), 1)))
+                    marks.append((pk, subject_id, score, 100.0, exam_date))
+                for day in self.sessions:
+                    rows.append((pk, subject_id, day, 'Present' if rng.random() < presence else 'Absent'))
+        return students, enrollments, marks, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=100_000)
+    parser.add_argument('--subjects', type=int, default=500)
+    parser.add_argument('--enrollments-per-student', type=int, default=10)
+    parser.add_argument('--sessions', type=int, default=50, help="Classes per subject (attendance rows per enrollment).")
+    parser.add_argument('--exams', type=int, default=2, help="Marks per enrollment.")
+    parser.add_argument('--batch-size', type=int, default=500, help="Students per transaction.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="Drop and recreate the schema first (no sample data).")
+    args = parser.parse_args(argv)
+
+    from app import app, backend, get_db_connection
+    import attendance
+
+    with app.app_context():
+        conn = get_db_connection(primary=True)
+        if not conn:
+            sys.exit("Database connection failed")
+        if args.reset:
+            backend.reset(conn, sample_data=False)
+            print(f"{backend.name} database reset")
+
+        gen = Generator(args)
+        cursor = conn.cursor()
+        try:
+            first_subject = max_id(cursor, 'subjects') + 1
+            subjects = gen.subjects(first_subject)
+            insert_rows(cursor, 'subjects', ('id', 'code', 'name', 'credits'), subjects)
+            conn.commit()
+            subject_ids = [row[0] for row in subjects]
+            print(f"{len(subjects)} subjects")
+
+            first_student = max_id(cursor, 'students') + 1
+            totals = {'students': 0, 'enrollments': 0, 'marks': 0, 'attendance': 0}
+            started = time.monotonic()
+            for offset in range(0, args.students, args.batch_size):
+                count = min(args.batch_size, args.students - offset)
+                students, enrollments, marks, rows = gen.student_batch(first_student + offset, count, subject_ids)
+                insert_rows(cursor, 'students', ('id', 'student_id', 'first_name', 'last_name', 'email',
+                                                 'phone', 'address', 'program', 'semester'), students)
+                insert_rows(cursor, 'enrollments', ('student_id', 'subject_id', 'enrollment_date'), enrollments)
+                insert_rows(cursor, 'marks', ('student_id', 'subject_id', 'marks', 'max_marks', 'exam_date'), marks)
+                insert_rows(cursor, 'attendance', ('student_id', 'subject_id', 'date', 'status'), rows)
+                conn.commit()
+                for key, batch in (('students', students), ('enrollments', enrollments),
+                                   ('marks', marks), ('attendance', rows)):
+                    totals[key] += len(batch)
+                elapsed = time.monotonic() - started
+                print(f"  students {totals['students']}/{args.students}: {totals['enrollments']} enrollments, "
+                      f"{totals['marks']} marks, {totals['attendance']} attendance rows "
+                      f"({sum(totals.values()) / elapsed:,.0f} rows/s)")
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        if attendance.STORE == 'bitmap':
+            import attendance_bitmap
+            attendance_bitmap.convert(conn, echo=print)
+        summary = attendance.rebuild_summary(conn)
+        print(f"attendance_summary rebuilt: {summary} rows; {sum(totals.values())} rows in "
+              f"{time.monotonic() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+"""Throughput and latency of the app's routes against the configured database.
+
+Each scenario is one route with ids drawn (seeded) from the data in the
+database, e.g. as filled by benchmarks/datagen.py. Scenarios run one after
+another; within a scenario `--concurrency` threads share `--requests`
+requests. Requests go through the Flask test client in this process, or
+to a running server with --url (ids are still sampled through the app's
+database settings, so point both at the same database).
+
+Reports requests/s and p50/p95/p99 latency per route, saves them as JSON
+and, given a baseline, flags routes that got slower.
+
+    python benchmarks/routes.py --save bench.json
+    python benchmarks/routes.py --baseline bench.json --concurrency 8
+    python benchmarks/routes.py --url http://127.0.0.1:5000 --writes --only 'marks|enroll'
+
+Write scenarios (enroll, marks, attendance, gradebook) change data and only
+run with --writes. Exports and other slow pages only run with --heavy.
+The dashboard event stream is left out: its requests never finish. So are
+the pages whose templates do not exist (the xfails in tests/test_routes.py):
+they only ever measure a 500.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor  # noqa: E402
+from typeahead import percentile  # noqa: E402
+
+SEARCH_PREFIXES = ['a', 'an', 'mar', 'smi', 'pat', 'g00', 'wil', 'kh', 'li', 'jo']
+# Deepest page of the student list to jump to.
+MAX_LIST_PAGE = 50
+
+
+class Scenario:
+    """make(rng) -> (path, form dict or None, json body or None)."""
+
+    def __init__(self, name, make, method='GET', writes=False, heavy=False):
+        self.name = name
+        self.make = make
+        self.method = method
+        self.writes = writes
+        self.heavy = heavy
+
+
+class Sample:
+    """Ids to fill route parameters with, read once from the database."""
+
+    def __init__(self, rng, size=2000):
+        from app import app, get_db_connection
+        with app.app_context():
+            conn = get_db_connection(primary=True)
+            if not conn:
+                sys.exit("Database connection failed")
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT id FROM students ORDER BY id")
+                students = [row[0] for row in cursor.fetchall()]
+                # The list is keyset-paginated, so page N is reached through
+                # the cursor of the last row on page N - 1 (default id sort).
+                self.page_cursors = [encode_cursor([students[end - 1], students[end - 1]])
+                                     for end in range(DEFAULT_PAGE_SIZE, len(students),
+                                                      DEFAULT_PAGE_SIZE)][:MAX_LIST_PAGE - 1]
+                cursor.execute("SELECT id FROM subjects ORDER BY id")
+                self.subjects = [row[0] for row in cursor.fetchall()]
+                self.students = rng.sample(students, min(size, len(students)))
+                enrollments = []
+                for start in range(0, len(self.students), 500):
+                    chunk = self.students[start:start + 500]
+                    cursor.execute(f"SELECT student_id, subject_id FROM enrollments "
+                                   f"WHERE student_id IN ({','.join(['%s'] * len(chunk))})", chunk)
+                    enrollments.extend(tuple(row) for row in cursor.fetchall())
+                self.enrollments = enrollments
+                cursor.execute("SELECT DISTINCT subject_id, exam_date FROM marks "
+                               "WHERE exam_date IS NOT NULL LIMIT 500")
+                self.exams = [(row[0], str(row[1])[:10]) for row in cursor.fetchall()]
+                cursor.execute("SELECT program, semester FROM students "
+                               "WHERE program IS NOT NULL AND semester IS NOT NULL "
+                               "GROUP BY program, semester")
+                self.cohorts = [tuple(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        if not self.students or not self.subjects:
+            sys.exit("No students or subjects to benchmark against; run benchmarks/datagen.py first")
+
+
+def scenarios(sample):
+    today = date.today().isoformat()
+
+    def student(rng):
+        return rng.choice(sample.students)
+
+    def get(path):
+        return lambda rng: (path(rng) if callable(path) else path, None, None)
+
+    def exam(rng):
+        return rng.choice(sample.exams) if sample.exams else (rng.choice(sample.subjects), today)
+
+    def cohort(rng):
+        program, semester = rng.choice(sample.cohorts) if sample.cohorts else ('', '')
+        return urlencode({'program': program, 'semester': semester})
+
+    def list_page(rng):
+        if not sample.page_cursors:
+            return "/students"
+        return "/students?" + urlencode({'after': rng.choice(sample.page_cursors)})
+
+    def enroll(rng):
+        return f"/students/{student(rng)}/enroll", {'subject': rng.choice(sample.subjects)}, None
+
+    def add_mark(rng):
+        student_pk, subject_id = rng.choice(sample.enrollments)
+        return (f"/students/{student_pk}/marks",
+                {'subject_id': subject_id, 'marks': rng.randint(0, 100), 'max_marks': 100,
+                 'exam_date': today}, None)
+
+    def attend(rng):
+        student_pk, subject_id = rng.choice(sample.enrollments)
+        return (f"/students/{student_pk}/attendance",
+                {'subject': subject_id, 'date': today, 'status': rng.choice(['Present', 'Absent'])}, None)
+
+    def roll_call(rng):
+        subject_id = rng.choice(sample.subjects)
+        students = [s for s, sub in sample.enrollments if sub == subject_id][:100]
+        return ("/api/attendance/rollcall", None,
+                {'subject_id': subject_id, 'date': today,
+                 'records': [{'student_id': s, 'status': rng.choice(['Present', 'Absent'])} for s in students]})
+
+    def gradebook_save(rng):
+        student_pk, subject_id = rng.choice(sample.enrollments)
+        return ("/api/gradebook", None,
+                {'subject_id': subject_id, 'exam_date': today, 'max_marks': 100,
+                 'records': [{'student_id': student_pk, 'marks': rng.randint(0, 100)}]})
+
+    return [
+        Scenario('home', get('/')),
+        Scenario('students.list', get('/students')),
+        Scenario('students.list.page', get(list_page)),
+        Scenario('students.search', get(lambda rng: f"/api/students/search?q={rng.choice(SEARCH_PREFIXES)}")),
+        Scenario('students.view', get(lambda rng: f"/students/{student(rng)}")),
+        Scenario('students.profile.api', get(lambda rng: f"/api/students/{student(rng)}/profile")),
+        Scenario('students.report', get(lambda rng: f"/students/{student(rng)}/report")),
+        Scenario('students.edit.form', get(lambda rng: f"/students/edit/{student(rng)}")),
+        Scenario('enroll.form', get(lambda rng: f"/students/{student(rng)}/enroll")),
+        Scenario('attendance.student', get(lambda rng: f"/students/{student(rng)}/attendance")),
+        Scenario('attendance.rollcall.form',
+                 get(lambda rng: f"/attendance/rollcall?subject_id={rng.choice(sample.subjects)}&date={today}")),
+        Scenario('gradebook', get(lambda rng: "/gradebook?" + urlencode(
+            dict(zip(('subject_id', 'exam_date'), exam(rng)))))),
+        Scenario('gradebook.api', get(lambda rng: "/api/gradebook?" + urlencode(
+            dict(zip(('subject_id', 'exam_date'), exam(rng)))))),
+        Scenario('subjects.list', get('/subjects')),
+        Scenario('reports', get('/reports')),
+        Scenario('dashboard.api', get('/api/dashboard')),
+        Scenario('reports.attendance', get('/reports/attendance')),
+        Scenario('reports.grades', get(lambda rng: "/reports/grades?" + cohort(rng))),
+        Scenario('health.db', get('/health/db')),
+        Scenario('reports.grades.csv', get(lambda rng: "/reports/grades/export.csv?" + cohort(rng)), heavy=True),
+        Scenario('export.students.csv', get('/reports/export/students.csv'), heavy=True),
+        Scenario('export.marks.csv', get('/reports/export/marks.csv'), heavy=True),
+        Scenario('export.attendance.csv', get('/reports/export/attendance.csv'), heavy=True),
+        Scenario('enroll.submit', enroll, 'POST', writes=True),
+        Scenario('marks.add', add_mark, 'POST', writes=True),
+        Scenario('attendance.record', attend, 'POST', writes=True),
+        Scenario('attendance.rollcall.api', roll_call, 'POST', writes=True),
+        Scenario('gradebook.save', gradebook_save, 'POST', writes=True),
+    ]
+
+
+# -------------------- clients --------------------
+
+class TestClient:
+    def __init__(self):
+        from app import app
+        self.client = app.test_client()
+
+    def request(self, method, path, form, body):
+        response = self.client.open(path, method=method, data=form, json=body)
+        response.get_data()
+        status = response.status_code
+        response.close()
+        return status
+
+
+class HTTPClient:
+    """One keep-alive connection per thread; redirects are not followed."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.prefix = parts.path.rstrip('/')
+        factory = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.conn = factory(parts.hostname, parts.port, timeout=60)
+
+    def request(self, method, path, form, body):
+        headers = {}
+        data = None
+        if body is not None:
+            data, headers['Content-Type'] = json.dumps(body), 'application/json'
+        elif form is not None:
+            data, headers['Content-Type'] = urlencode(form), 'application/x-www-form-urlencoded'
+        try:
+            self.conn.request(method, self.prefix + path, data, headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+
+
+# -------------------- running --------------------
+
+def run_scenario(scenario, make_client, requests, concurrency, warmup, seed):
+    local = threading.local()
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        return local.client
+
+    def one(rng):
+        path, form, body = scenario.make(rng)
+        started = time.perf_counter()
+        try:
+            status = client().request(scenario.method, path, form, body)
+        except Exception:
+            status = None
+        return time.perf_counter() - started, status
+
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        one(rng)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        results = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return results
+            results.append(one(rng))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = [r for rs in pool.map(worker, range(concurrency)) for r in rs]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 400)
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'statuses': {str(s): sum(1 for _, st in results if st == s) for s in sorted({st or 0 for _, st in results})},
+        'rps': round(len(results) / wall, 1) if wall else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print each route against the baseline; returns the names that regressed."""
+    regressed = []
+    print(f"\nvs baseline {baseline['meta'].get('revision')} ({baseline['meta'].get('started')}), "
+          f"threshold {threshold:.0%}:")
+    for key in ('target', 'backend', 'concurrency'):
+        if baseline['meta'].get(key) != results['meta'][key]:
+            print(f"  warning: {key} differs ({baseline['meta'].get(key)} -> {results['meta'][key]})")
+    for name, now in results['routes'].items():
+        before = baseline['routes'].get(name)
+        if not before:
+            print(f"  {name:<28} new")
+            continue
+        changes = {key: (now[key] - before[key]) / before[key] if before[key] else 0.0
+                   for key in ('p50_ms', 'p95_ms', 'p99_ms')}
+        rps = (now['rps'] - before['rps']) / before['rps'] if before['rps'] else 0.0
+        worse = changes['p95_ms'] > threshold or rps < -threshold
+        if worse:
+            regressed.append(name)
+        print(f"  {name:<28} p50 {changes['p50_ms']:+7.1%}  p95 {changes['p95_ms']:+7.1%}  "
+              f"p99 {changes['p99_ms']:+7.1%}  req/s {rps:+7.1%}{'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Benchmark a running server instead of the in-process test client.")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per route.")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per route first.")
+    parser.add_argument('--only', help="Regex; run routes whose name matches.")
+    parser.add_argument('--writes', action='store_true', help="Include routes that change data.")
+    parser.add_argument('--heavy', action='store_true', help="Include exports and other slow routes.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help="Write results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against results saved earlier with --save.")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative p95 / req/s change counted as a regression.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    sample = Sample(rng)
+    selected = [s for s in scenarios(sample)
+                if (args.writes or not s.writes) and (args.heavy or not s.heavy)
+                and (not args.only or re.search(args.only, s.name))]
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)  # noqa: E731
+    else:
+        make_client = TestClient
+
+    from app import backend
+    results = {
+        'meta': {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'target': args.url or 'test-client',
+            'backend': backend.name,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'students_sampled': len(sample.students),
+            'python': platform.python_version(),
+        },
+        'routes': {},
+    }
+    print(f"{len(selected)} routes x {args.requests} requests, concurrency {args.concurrency} "
+          f"({results['meta']['target']}, {backend.name})")
+    for scenario in selected:
+        stats = run_scenario(scenario, make_client, args.requests, args.concurrency, args.warmup, args.seed)
+        results['routes'][scenario.name] = stats
+        print(f"  {scenario.name:<28} {stats['rps']:8.1f} req/s  p50={stats['p50_ms']:8.2f}ms "
+              f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms"
+              f"{'  errors=%d' % stats['errors'] if stats['errors'] else ''}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            print(f"{len(regressed)} route(s) regressed: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Latency of the student typeahead index (search.StudentIndex).
+
+Builds the index over synthetic students in memory (no database) and times
+realistic typeahead queries: growing prefixes of ids, names, e-mails and
+phone numbers, plus two-term "first last" queries. Also times upserts.
+
+    python benchmarks/typeahead.py                    # 100k students
+    python benchmarks/typeahead.py --students 500000 --queries 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import StudentIndex  # noqa: E402
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Aarav', 'Priya',
+               'Wei', 'Mei', 'Mohammed', 'Fatima', 'Carlos', 'Sofia', 'Ivan', 'Olga', 'Kenji', 'Yuki',
+               'Ann', 'Anne', 'Annabel', 'Chris', 'Christina', 'Christopher']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Patel',
+              'Sharma', 'Wang', 'Li', 'Zhang', 'Khan', 'Ali', 'Nguyen', 'Kim', 'Ivanov', 'Sato', 'Tanaka']
+PROGRAMS = ['BSc CS', 'BSc IT', 'BBA', 'BCom', 'MSc CS', 'MBA']
+
+
+def make_students(n, rng):
+    students = []
+    for i in range(1, n + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        # Random suffixes keep names from collapsing onto a few dozen tokens.
+        if rng.random() < 0.5:
+            last += ''.join(rng.choices(string.ascii_lowercase, k=3))
+        students.append({
+            'id': i,
+            'student_id': f"S{2020 + i % 6}{i:06d}",
+            'first_name': first,
+            'last_name': last,
+            'email': f"{first}.{last}{i}@example.edu".lower(),
+            'phone': f"+1 ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+            'program': rng.choice(PROGRAMS),
+            'semester': str(rng.randint(1, 8)),
+        })
+    return students
+
+
+def make_queries(students, count, rng):
+    """(kind, query) pairs; each is a prefix a user would type on the way to a match."""
+    queries = []
+    for _ in range(count):
+        s = rng.choice(students)
+        kind = rng.choice(['student_id', 'first_name', 'last_name', 'email', 'phone', 'full_name'])
+        if kind == 'full_name':
+            last = s['last_name']
+            query = f"{s['first_name']} {last[:rng.randint(1, len(last))]}"
+        elif kind == 'phone':
+            digits = ''.join(ch for ch in s['phone'] if ch.isdigit())
+            query = digits[:rng.randint(3, len(digits))]
+        else:
+            value = s[kind]
+            query = value[:rng.randint(1, len(value))]
+        queries.append((kind, query))
+    return queries
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(label, seconds):
+    values = sorted(v * 1000 for v in seconds)
+    print(f"  {label:<12} n={len(values):<6} p50={percentile(values, 50):7.3f}ms "
+          f"p95={percentile(values, 95):7.3f}ms p99={percentile(values, 99):7.3f}ms "
+          f"max={values[-1]:7.3f}ms mean={statistics.fmean(values):7.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=10_000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--updates', type=int, default=1_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    students = make_students(args.students, rng)
+    index = StudentIndex(lambda: students)
+
+    started = time.perf_counter()
+    index.search('warm')
+    stats = index.stats()
+    print(f"index: {stats['students']} students, {stats['tokens']} tokens, "
+          f"built in {time.perf_counter() - started:.2f}s")
+
+    by_kind = {}
+    for kind, query in make_queries(students, args.queries, rng):
+        started = time.perf_counter()
+        index.search(query, args.limit)
+        by_kind.setdefault(kind, []).append(time.perf_counter() - started)
+
+    print(f"search (limit {args.limit}):")
+    for kind, seconds in sorted(by_kind.items()):
+        summarize(kind, seconds)
+    summarize('all', [s for seconds in by_kind.values() for s in seconds])
+
+    update_times = []
+    for student in rng.sample(students, min(args.updates, len(students))):
+        edited = dict(student, last_name=student['last_name'] + 'x')
+        started = time.perf_counter()
+        index.upsert(edited)
+        update_times.append(time.perf_counter() - started)
+    print("upsert:")
+    summarize('edit', update_times)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""In-process caches for small, read-mostly tables.
+
+SubjectCatalog keeps an immutable snapshot of the subjects table. Readers get
+the same snapshot until it expires (TTL) or a write calls invalidate(). With
+several worker processes, pass a FileSignal: invalidate() touches the shared
+file and every process notices the new mtime on its next read and reloads.
+"""
+import os
+import threading
+import time
+from types import MappingProxyType
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileSignal:
+    """Cross-process invalidation token backed by a file's modification time.
+
+    Checking is one stat() call, so it is cheap enough to do on every read.
+    Bumps are serialized by an exclusive lock on the file, so each one knows
+    the token it replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def token(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, seen=None):
+        """Move the token forward; returns the token the caller should now
+        treat as seen.
+
+        That is the new token if `seen` was current just before this bump, so
+        a process does not reload for its own write. If another process
+        bumped since, `seen` is returned unchanged and the caller still
+        notices that bump on its next check.
+        """
+        with open(self.path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                before = self.token()
+                # Strictly increase the mtime even if two bumps land in the same tick.
+                now = max(time.time_ns(), before + 1)
+                os.utime(self.path, ns=(now, now))
+            finally:
+                if fcntl is None:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return now if seen == before else seen
+
+
+class Snapshot:
+    """Read-only view of the table: rows in id order plus an id index."""
+
+    __slots__ = ('rows', 'by_id', 'version', 'loaded_at')
+
+    def __init__(self, rows, version):
+        self.rows = tuple(MappingProxyType(dict(row)) for row in rows)
+        self.by_id = MappingProxyType({row['id']: row for row in self.rows})
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, id_):
+        return self.by_id.get(id_)
+
+
+class SubjectCatalog:
+    """Cached subjects table.
+
+    loader -- zero-argument callable returning the rows (dicts with an 'id')
+    ttl    -- seconds a snapshot is served before reloading
+    signal -- optional FileSignal shared with the other worker processes
+    """
+
+    def __init__(self, loader, ttl=300, signal=None):
+        self._loader = loader
+        self.ttl = ttl
+        self.signal = signal
+        self._snapshot = None
+        self._signal_token = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _fresh(self, snapshot):
+        if snapshot is None:
+            return False
+        if self.ttl and time.monotonic() - snapshot.loaded_at >= self.ttl:
+            return False
+        if self.signal is not None and self.signal.token() != self._signal_token:
+            return False
+        return True
+
+    def get(self):
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock.
+            snapshot = self._snapshot
+            if self._fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            # Read the token before loading so a bump during the load is not lost.
+            token = self.signal.token() if self.signal is not None else None
+            rows = self._loader()
+            self._version += 1
+            self._snapshot = Snapshot(rows, self._version)
+            self._signal_token = token
+            return self._snapshot
+
+    def invalidate(self):
+        # Taking the lock waits out any reload that may have read pre-write rows.
+        with self._lock:
+            self._snapshot = None
+            self.invalidations += 1
+        if self.signal is not None:
+            self.signal.bump()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'version': self._version,
+            'cached_rows': len(snapshot) if snapshot is not None else 0,
+            'ttl': self.ttl,
+            'cross_process': self.signal is not None,
+        }
@@ -0,0 +1,230 @@
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class PooledConnection:
+    """Thin proxy around a driver connection that knows which pool it came from.
+
+    Everything except close() is forwarded to the real connection, so routes
+    keep using conn.cursor() / conn.commit() / conn.rollback() as before.
+    close() hands the connection back to the pool instead of dropping it.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.released = True
+        self.discarded = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        wrap = self._pool.wrap_cursor
+        return wrap(cursor) if wrap is not None else cursor
+
+    def discard(self):
+        """Close the driver connection on release instead of pooling it, e.g.
+        when a result set was abandoned half-read."""
+        self.discarded = True
+
+    def close(self):
+        if not self.released:
+            self._pool.release(self)
+
+
+def _default_ping(raw):
+    return raw.is_connected()
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    connect     -- zero-argument callable returning a new driver connection
+    min_size    -- connections opened eagerly and kept around when idle
+    max_size    -- hard cap on open connections (idle + in use)
+    timeout     -- seconds acquire() waits for a free slot before PoolTimeout
+    max_uses    -- recycle a connection after this many checkouts (0 = never)
+    max_age     -- recycle a connection older than this many seconds (0 = never)
+    ping        -- callable(raw) -> bool used as the liveness check on borrow
+    wrap_cursor -- optional callable(cursor) -> cursor applied to every cursor
+                   handed out, e.g. for query instrumentation
+    """
+
+    def __init__(self, connect, min_size=2, max_size=10, timeout=5.0,
+                 max_uses=1000, max_age=3600, ping=_default_ping, wrap_cursor=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("pool needs 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._ping = ping
+        self.wrap_cursor = wrap_cursor
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_pings = 0
+        self._timeouts = 0
+
+        for _ in range(min_size):
+            try:
+                self._idle.append(self._new_connection())
+            except Exception:
+                # The database may simply not be up yet; acquire() retries lazily.
+                break
+
+    # -------------------- internals --------------------
+
+    def _new_connection(self):
+        conn = PooledConnection(self, self._connect())
+        self._open += 1
+        self._created += 1
+        return conn
+
+    def _expired(self, conn):
+        if self.max_uses and conn.uses >= self.max_uses:
+            return True
+        if self.max_age and time.monotonic() - conn.created_at >= self.max_age:
+            return True
+        return False
+
+    def _close(self, conn):
+        # Called without the lock held: close() can block on a dead socket.
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    def _alive(self, conn):
+        try:
+            return bool(self._ping(conn.raw))
+        except Exception:
+            return False
+
+    # -------------------- public API --------------------
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                self._waiting += 1
+                try:
+                    while not self._idle and self._open >= self.max_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"no database connection available after {self.timeout}s "
+                                f"({self._in_use}/{self.max_size} in use)")
+                        self._lock.wait(remaining)
+                    if self._idle:
+                        # Still counted in _open while it is checked outside the lock.
+                        conn = self._idle.pop()
+                    else:
+                        # Reserve the slot before releasing the lock for the handshake.
+                        self._open += 1
+                        conn = None
+                finally:
+                    self._waiting -= 1
+
+            if conn is None:
+                break
+            expired = self._expired(conn)
+            if not expired and self._alive(conn):
+                with self._lock:
+                    return self._checkout(conn)
+            self._close(conn)
+            with self._lock:
+                self._open -= 1
+                if expired:
+                    self._recycled += 1
+                else:
+                    self._failed_pings += 1
+                self._lock.notify()
+
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        conn = PooledConnection(self, raw)
+        with self._lock:
+            self._created += 1
+            return self._checkout(conn)
+
+    def _checkout(self, conn):
+        conn.uses += 1
+        conn.released = False
+        self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        # Never hand a half-finished transaction to the next borrower. A
+        # discarded connection is not rolled back: the driver would first read
+        # whatever result is still pending.
+        healthy = False
+        if not conn.discarded:
+            try:
+                conn.raw.rollback()
+                healthy = True
+            except Exception:
+                pass
+
+        with self._lock:
+            if conn.released:
+                return
+            conn.released = True
+            self._in_use -= 1
+            keep = healthy and not self._expired(conn)
+            if keep:
+                self._idle.append(conn)
+            else:
+                if healthy:
+                    self._recycled += 1
+                self._open -= 1
+            self._lock.notify()
+        if not keep:
+            self._close(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'created': self._created,
+                'recycled': self._recycled,
+                'failed_pings': self._failed_pings,
+                'timeouts': self._timeouts,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
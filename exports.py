@@ -0,0 +1,177 @@
+"""Streaming CSV / XLSX exports.
+
+Rows come off an unbuffered (server-side) cursor in fetchmany() batches and
+are encoded as they arrive, so memory use stays flat however large the
+table is. Both writers are generators meant to be wrapped in a Flask
+streaming response. CSV reaches the client as it is encoded; an .xlsx is a
+zip whose directory is written last, so the workbook is finished on disk
+before its first byte is sent.
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+
+import storage
+
+FETCH_SIZE = 1000
+# Flush the CSV buffer to the client roughly every this many bytes.
+CSV_FLUSH_BYTES = 64 * 1024
+XLSX_CHUNK_BYTES = 64 * 1024
+
+
+class ExportError(Exception):
+    pass
+
+
+# -------------------- datasets --------------------
+# Each dataset: SQL up to (not including) WHERE, and an ORDER BY that walks
+# an index. Callers append filter conditions on the s./sub. aliases.
+
+DATASETS = {
+    'students': {
+        'sql': """SELECT s.student_id, s.first_name, s.last_name, s.email, s.phone, s.address,
+                         s.program, s.semester, s.created_at
+                  FROM students s""",
+        'order': "s.id",
+    },
+    'subjects': {
+        'sql': "SELECT sub.code, sub.name, sub.credits FROM subjects sub",
+        'order': "sub.code",
+    },
+    'marks': {
+        'sql': """SELECT s.student_id, s.first_name, s.last_name, s.program, s.semester,
+                         sub.code AS subject_code, sub.name AS subject_name,
+                         m.marks, m.max_marks,
+                         ROUND(m.marks / NULLIF(m.max_marks, 0) * 100, 2) AS percentage,
+                         m.exam_date
+                  FROM marks m
+                  JOIN students s ON s.id = m.student_id
+                  JOIN subjects sub ON sub.id = m.subject_id""",
+        'order': "m.id",
+    },
+    'attendance': {
+        'sql': """SELECT s.student_id, s.first_name, s.last_name, s.program, s.semester,
+                         sub.code AS subject_code, sub.name AS subject_name,
+                         sm.present_count AS present, sm.total_count AS total,
+                         ROUND(100.0 * sm.present_count / NULLIF(sm.total_count, 0), 2) AS percentage
+                  FROM attendance_summary sm
+                  JOIN students s ON s.id = sm.student_id
+                  JOIN subjects sub ON sub.id = sm.subject_id""",
+        'order': "sm.student_id, sm.subject_id",
+    },
+}
+
+FORMATS = ('csv', 'xlsx')
+
+
+def build_query(dataset, where, params):
+    spec = DATASETS[dataset]
+    sql = spec['sql']
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY " + spec['order'], list(params)
+
+
+def stream_rows(conn, sql, params, fetch_size=FETCH_SIZE):
+    """Yield the column names, then every row, from an unbuffered cursor.
+
+    If the consumer stops early (the client disconnected), the rest of the
+    result is still unread on the connection; draining it could mean reading
+    the whole table, so the connection is discarded instead of going back to
+    the pool.
+    """
+    cursor = conn.cursor(buffered=False)
+    exhausted = False
+    try:
+        cursor.execute(sql, params)
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+        exhausted = True
+    finally:
+        if exhausted:
+            cursor.close()
+        else:
+            discard = getattr(conn, 'discard', None)
+            if discard is not None:
+                discard()
+            try:
+                cursor.close()
+            except storage.Error:
+                # mysql.connector: "Unread result found".
+                pass
+
+
+def _cell(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+# -------------------- writers --------------------
+
+def csv_chunks(rows):
+    """Encode an iterator of [header, row, row, ...] as UTF-8 CSV chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_cell(v) for v in row])
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_available():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def xlsx_chunks(rows, title='Export'):
+    """Write rows with openpyxl's write-only workbook and stream the file.
+
+    Write-only mode spills rows to a temporary file as they are appended, so
+    the workbook is never held in memory. The .xlsx (a zip) is only valid once
+    complete, so every row is read and the file saved before the first chunk
+    is yielded; it is then read back in fixed-size chunks.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("XLSX export needs the openpyxl package (pip install openpyxl)")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in rows:
+        sheet.append([_cell(v) for v in row])
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(XLSX_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_chunks(conn, dataset, fmt, where=(), params=()):
+    sql, params = build_query(dataset, where, params)
+    rows = stream_rows(conn, sql, params)
+    if fmt == 'xlsx':
+        return xlsx_chunks(rows, title=dataset.capitalize())
+    return csv_chunks(rows)
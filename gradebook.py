@@ -0,0 +1,193 @@
+"""Whole-class marks entry for one (subject, exam_date).
+
+grid() lists every enrolled student with their mark for the exam, if any,
+and its `version`. save() writes a batch of changed cells in one
+transaction: it locks the exam's existing rows, turns away any cell whose
+version moved since the grader loaded it (another grader saved first), then
+applies the rest as one multi-row upsert plus one DELETE for cleared cells.
+Every write bumps marks.version, so the next stale save of that cell
+conflicts instead of overwriting it. A cleared cell leaves its next version
+in mark_versions and a mark entered there again continues from it, so
+versions never repeat for a cell (no ABA through clear and re-enter).
+Every path that inserts or deletes marks goes through insert_marks() /
+delete_marks() for that reason.
+"""
+import api
+from attendance import ROWS_PER_STATEMENT, enrolled_student_ids
+
+
+# A cell's version when it has no marks row: 0, or where it was when cleared.
+CLEARED_VERSION_SQL = ("(SELECT COALESCE(MAX(version), 0) FROM mark_versions "
+                       "WHERE student_id = %s AND subject_id = %s AND exam_date = %s)")
+
+
+class GradebookError(ValueError):
+    pass
+
+
+class SaveResult:
+    def __init__(self):
+        self.saved = []         # student pks written
+        self.deleted = []       # student pks whose mark was cleared
+        self.conflicts = []     # {student_id, marks, max_marks, version} as they now stand
+        self.rejected = []      # student pks not enrolled in the subject
+
+    @property
+    def changed(self):
+        return self.saved + self.deleted
+
+    def as_dict(self):
+        return {'saved': self.saved, 'deleted': self.deleted,
+                'conflicts': self.conflicts, 'rejected': self.rejected}
+
+
+def parse_mark(value, max_marks):
+    """'' / None -> None (clear the cell), else a float within 0..max_marks."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        marks = float(value)
+    except (TypeError, ValueError):
+        raise GradebookError(f"marks must be a number, not {value!r}")
+    if marks < 0 or marks > max_marks:
+        raise GradebookError(f"marks must be between 0 and {max_marks:g}, not {marks:g}")
+    return marks
+
+
+def parse_max_marks(value):
+    try:
+        max_marks = float(value)
+    except (TypeError, ValueError):
+        raise GradebookError(f"max_marks must be a number, not {value!r}")
+    if max_marks <= 0:
+        raise GradebookError("max_marks must be greater than 0")
+    return max_marks
+
+
+def insert_marks(cursor, rows, upsert=True):
+    """Insert (student_id, subject_id, marks, max_marks, exam_date) rows.
+
+    A new row starts one past its cell's cleared version; with upsert an
+    existing row is overwritten and bumped instead of raising a duplicate.
+    """
+    value = f"(%s,%s,%s,%s,%s,{CLEARED_VERSION_SQL} + 1)"
+    for start in range(0, len(rows), ROWS_PER_STATEMENT):
+        batch = rows[start:start + ROWS_PER_STATEMENT]
+        sql = f"""
+            INSERT INTO marks (student_id, subject_id, marks, max_marks, exam_date, version)
+            VALUES {','.join([value] * len(batch))}
+        """
+        if upsert:
+            sql += """
+                ON DUPLICATE KEY UPDATE marks=VALUES(marks), max_marks=VALUES(max_marks),
+                                        version=version + 1
+            """
+        cursor.execute(sql, [v for row in batch for v in (*row, row[0], row[1], row[4])])
+
+
+def retire_versions(cursor, where, params):
+    """Keep the next version of the marks rows matching `where` in mark_versions,
+    for rows about to leave their cell (deleted, or moved by an edit)."""
+    cursor.execute(f"""
+        INSERT INTO mark_versions (student_id, subject_id, exam_date, version)
+        SELECT student_id, subject_id, exam_date, version + 1 FROM marks
+        WHERE exam_date IS NOT NULL AND {where}
+        ON DUPLICATE KEY UPDATE version=VALUES(version)
+    """, params)
+
+
+def delete_marks(cursor, where, params):
+    """Delete the marks rows matching `where`, keeping their versions and
+    tombstones for the v1 API. Caller commits."""
+    retire_versions(cursor, where, params)
+    api.record_deletes(cursor, 'marks', where, params)
+    cursor.execute(f"DELETE FROM marks WHERE {where}", params)
+
+
+def grid(cursor, subject_id, exam_date):
+    """Enrolled students with {marks, max_marks, version}; version 0 = never marked."""
+    cursor.execute("""
+        SELECT s.id, s.student_id, s.first_name, s.last_name, m.marks, m.max_marks,
+               COALESCE(m.version, mv.version, 0) AS version
+        FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN marks m ON m.student_id = s.id AND m.subject_id = %s AND m.exam_date = %s
+        LEFT JOIN mark_versions mv ON mv.student_id = s.id AND mv.subject_id = %s AND mv.exam_date = %s
+        ORDER BY s.last_name, s.first_name, s.id
+    """, (subject_id, subject_id, exam_date, subject_id, exam_date))
+    return cursor.fetchall()
+
+
+def _current(cursor, subject_id, exam_date, student_ids):
+    """({student pk: (marks, max_marks, version)}, {student pk: cleared version})
+    for the exam, locked for update."""
+    current, cleared = {}, {}
+    for start in range(0, len(student_ids), ROWS_PER_STATEMENT):
+        chunk = student_ids[start:start + ROWS_PER_STATEMENT]
+        in_chunk = f"student_id IN ({','.join(['%s'] * len(chunk))})"
+        cursor.execute(f"""
+            SELECT student_id, marks, max_marks, version FROM marks
+            WHERE subject_id = %s AND exam_date = %s AND {in_chunk}
+            FOR UPDATE
+        """, [subject_id, exam_date, *chunk])
+        for student_id, marks, max_marks, version in cursor.fetchall():
+            current[student_id] = (marks, max_marks, version)
+        cursor.execute(f"""
+            SELECT student_id, version FROM mark_versions
+            WHERE subject_id = %s AND exam_date = %s AND {in_chunk}
+            FOR UPDATE
+        """, [subject_id, exam_date, *chunk])
+        cleared.update(cursor.fetchall())
+    return current, cleared
+
+
+def save(conn, subject_id, exam_date, cells):
+    """Write changed cells in one transaction.
+
+    cells -- [(student_pk, marks or None, max_marks, version)]; marks None
+             clears the cell. version is what the grader loaded (0 = no mark
+             yet), or None to write regardless of other graders.
+
+    Returns a SaveResult. Rolls back and re-raises on failure.
+    """
+    result = SaveResult()
+    cursor = conn.cursor()
+    try:
+        enrolled = enrolled_student_ids(cursor, subject_id)
+        cells = {student_id: cell for student_id, *cell in cells}
+        result.rejected = sorted(student_id for student_id in cells if student_id not in enrolled)
+        student_ids = sorted(student_id for student_id in cells if student_id in enrolled)
+        current, cleared = _current(cursor, subject_id, exam_date, student_ids)
+
+        upserts, deletes = [], []
+        for student_id in student_ids:
+            marks, max_marks, version = cells[student_id]
+            now = current.get(student_id)
+            now_version = now[2] if now else cleared.get(student_id, 0)
+            if version is not None and version != now_version:
+                result.conflicts.append({
+                    'student_id': student_id,
+                    'marks': now[0] if now else None,
+                    'max_marks': now[1] if now else None,
+                    'version': now_version,
+                })
+            elif marks is None:
+                if now:
+                    deletes.append(student_id)
+            else:
+                upserts.append((student_id, subject_id, marks, max_marks, exam_date))
+
+        insert_marks(cursor, upserts)
+        for start in range(0, len(deletes), ROWS_PER_STATEMENT):
+            chunk = deletes[start:start + ROWS_PER_STATEMENT]
+            delete_marks(cursor, f"subject_id = %s AND exam_date = %s AND student_id IN "
+                                 f"({','.join(['%s'] * len(chunk))})", [subject_id, exam_date, *chunk])
+        conn.commit()
+        result.saved = [row[0] for row in upserts]
+        result.deleted = deletes
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,306 @@
+"""Cohort grade computations done in batch with numpy.
+
+A cohort is every student of one (program, semester). load_cohort() reads
+the cohort's marks in one query into columnar arrays, and CohortGrades then
+computes, for all students at once:
+
+- per-subject percentage: sum(marks) / sum(max_marks) over the subject's exams
+- grade points on the 10-point scale below, credit-weighted into a GPA
+- the credit-weighted overall percentage
+- class rank (ties share a rank) and percentile
+- per-subject mean / standard deviation / percentiles
+
+GradeCache keeps one CohortGrades per cohort until a marks write touches one
+of its students (or a credit / enrolment change drops everything).
+"""
+import threading
+import time
+
+import numpy as np
+
+# (minimum percentage, grade point, letter) on a 10-point scale, best first.
+GRADE_SCALE = (
+    (90, 10, 'O'),
+    (80, 9, 'A+'),
+    (70, 8, 'A'),
+    (60, 7, 'B+'),
+    (50, 6, 'B'),
+    (45, 5, 'C'),
+    (40, 4, 'P'),
+    (0, 0, 'F'),
+)
+PERCENTILES = (25, 50, 75, 90)
+
+_CUTOFFS = np.array([row[0] for row in reversed(GRADE_SCALE)], dtype=float)
+_POINTS = np.array([row[1] for row in reversed(GRADE_SCALE)], dtype=float)
+_LETTERS = [row[2] for row in reversed(GRADE_SCALE)]
+
+
+def grade_points(percentages):
+    """Vectorized percentage -> grade point; NaN stays NaN."""
+    percentages = np.asarray(percentages, dtype=float)
+    index = np.searchsorted(_CUTOFFS, np.nan_to_num(percentages, nan=0.0), side='right') - 1
+    return np.where(np.isnan(percentages), np.nan, _POINTS[np.clip(index, 0, None)])
+
+
+def letter(percentage):
+    if percentage is None or np.isnan(percentage):
+        return None
+    index = int(np.searchsorted(_CUTOFFS, percentage, side='right')) - 1
+    return _LETTERS[max(index, 0)]
+
+
+def _number(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+class CohortGrades:
+    """Grades of one cohort. Arrays are indexed [student, subject]."""
+
+    def __init__(self, program, semester, students, subject_ids, marks, max_marks, credits):
+        """students    -- [(id, student_id, first_name, last_name)] in row order
+        subject_ids -- column order
+        marks / max_marks -- summed per [student, subject] (max 0 = no marks)
+        credits     -- per subject column"""
+        self.program = program
+        self.semester = semester
+        self.students = students
+        self.subject_ids = list(subject_ids)
+        self.computed_at = time.time()
+        self._row = {student[0]: i for i, student in enumerate(students)}
+        self._column = {subject_id: j for j, subject_id in enumerate(self.subject_ids)}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.percentages = np.where(max_marks > 0, marks / max_marks * 100, np.nan)
+        self.points = grade_points(self.percentages)
+        taken = ~np.isnan(self.percentages)
+        weights = np.where(taken, credits[np.newaxis, :], 0.0)
+        weight_sum = weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.gpa = np.where(weight_sum > 0,
+                                np.nansum(self.points * weights, axis=1) / weight_sum, np.nan)
+            self.percentage = np.where(weight_sum > 0,
+                                       np.nansum(self.percentages * weights, axis=1) / weight_sum, np.nan)
+        self.rank, self.percentile = self._ranks()
+        self.subject_stats = self._subject_stats(taken)
+
+    def _ranks(self):
+        """Competition ranks (1, 2, 2, 4) by GPA then percentage; unranked = 0."""
+        n = len(self.students)
+        rank = np.zeros(n, dtype=int)
+        percentile = np.full(n, np.nan)
+        ranked = np.flatnonzero(~np.isnan(self.gpa))
+        if not len(ranked):
+            return rank, percentile
+        gpa = np.round(self.gpa[ranked], 6)
+        pct = np.round(self.percentage[ranked], 6)
+        order = np.lexsort((-pct, -gpa))
+        gpa, pct = gpa[order], pct[order]
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = (gpa[1:] != gpa[:-1]) | (pct[1:] != pct[:-1])
+        positions = np.arange(1, len(order) + 1)
+        group_rank = np.maximum.accumulate(np.where(new_group, positions, 0))
+        rank[ranked[order]] = group_rank
+        # Share of the ranked cohort strictly behind each student.
+        tied = np.bincount(group_rank)[group_rank]
+        percentile[ranked[order]] = (len(order) - group_rank - tied + 1) / len(order) * 100
+        return rank, percentile
+
+    def _subject_stats(self, taken):
+        stats = {}
+        for j, subject_id in enumerate(self.subject_ids):
+            values = self.percentages[taken[:, j], j]
+            if not len(values):
+                continue
+            quantiles = np.percentile(values, PERCENTILES)
+            stats[subject_id] = {
+                'count': int(len(values)),
+                'mean': _number(values.mean()),
+                'std': _number(values.std()),
+                'min': _number(values.min()),
+                'max': _number(values.max()),
+                'percentiles': {p: _number(q) for p, q in zip(PERCENTILES, quantiles)},
+                'pass_rate': _number((values >= GRADE_SCALE[-2][0]).mean() * 100, 1),
+            }
+        return stats
+
+    def __contains__(self, student_id):
+        return student_id in self._row
+
+    def __len__(self):
+        return len(self.students)
+
+    @property
+    def ranked_count(self):
+        return int((self.rank > 0).sum())
+
+    def student(self, student_id):
+        """Grades for one student, or None if they have no marks in the cohort."""
+        i = self._row.get(student_id)
+        if i is None:
+            return None
+        subjects = {}
+        for subject_id, j in self._column.items():
+            pct = self.percentages[i, j]
+            if not np.isnan(pct):
+                subjects[subject_id] = {'percentage': _number(pct), 'points': _number(self.points[i, j], 1),
+                                        'grade': letter(pct)}
+        return {
+            'gpa': _number(self.gpa[i]),
+            'percentage': _number(self.percentage[i]),
+            'rank': int(self.rank[i]) or None,
+            'ranked': self.ranked_count,
+            'percentile': _number(self.percentile[i], 1),
+            'subjects': subjects,
+        }
+
+    def ranking(self):
+        """One dict per student in rank order, for the report page and exports."""
+        order = sorted(range(len(self.students)),
+                       key=lambda i: (self.rank[i] == 0, self.rank[i], self.students[i][3], self.students[i][0]))
+        rows = []
+        for i in order:
+            pk, student_id, first_name, last_name = self.students[i]
+            rows.append({
+                'id': pk, 'student_id': student_id, 'first_name': first_name, 'last_name': last_name,
+                'rank': int(self.rank[i]) or None,
+                'gpa': _number(self.gpa[i]),
+                'percentage': _number(self.percentage[i]),
+                'percentile': _number(self.percentile[i], 1),
+                'subjects': {subject_id: _number(self.percentages[i, j])
+                             for subject_id, j in self._column.items()},
+            })
+        return rows
+
+
+def cohort_where(program, semester, alias='s'):
+    """WHERE conditions selecting a cohort (NULL program/semester included)."""
+    where, params = [], []
+    for column, value in (('program', program), ('semester', semester)):
+        if value is None:
+            where.append(f"{alias}.{column} IS NULL")
+        else:
+            where.append(f"{alias}.{column} = %s")
+            params.append(value)
+    return where, params
+
+
+def load_cohort(cursor, program, semester, credits):
+    """CohortGrades for (program, semester) from one query.
+
+    Students without marks are members (so later marks invalidate the right
+    cohort) but stay unranked. credits -- {subject_id: credits}; subjects
+    missing from it weigh 0.
+    """
+    where, params = cohort_where(program, semester)
+    cursor.execute(f"""
+        SELECT s.id, s.student_id, s.first_name, s.last_name, m.subject_id, m.marks, m.max_marks
+        FROM students s LEFT JOIN marks m ON m.student_id = s.id
+        WHERE {' AND '.join(where)}
+        ORDER BY s.id
+    """, params)
+    rows = cursor.fetchall()
+    if rows and isinstance(rows[0], dict):
+        rows = [tuple(row.values()) for row in rows]
+
+    students, student_index = [], {}
+    for row in rows:
+        if row[0] not in student_index:
+            student_index[row[0]] = len(students)
+            students.append(row[:4])
+    rows = [row for row in rows if row[4] is not None]
+    subject_ids = sorted({row[4] for row in rows})
+    subject_index = {subject_id: j for j, subject_id in enumerate(subject_ids)}
+
+    shape = (len(students), len(subject_ids))
+    size = shape[0] * shape[1]
+    i = np.fromiter((student_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+    j = np.fromiter((subject_index[row[4]] for row in rows), dtype=np.intp, count=len(rows))
+    flat = np.ravel_multi_index((i, j), shape) if rows else np.zeros(0, dtype=np.intp)
+    marks = np.fromiter((row[5] or 0 for row in rows), dtype=float, count=len(rows))
+    max_marks = np.fromiter((row[6] or 0 for row in rows), dtype=float, count=len(rows))
+    # Sum every exam of a (student, subject) into one cell.
+    marks = np.bincount(flat, weights=marks, minlength=size).reshape(shape)
+    max_marks = np.bincount(flat, weights=max_marks, minlength=size).reshape(shape)
+    credit_vector = np.array([float(credits.get(subject_id) or 0) for subject_id in subject_ids])
+    return CohortGrades(program, semester, students, subject_ids, marks, max_marks, credit_vector)
+
+
+class GradeCache:
+    """CohortGrades per (program, semester).
+
+    loader -- callable(program, semester) -> CohortGrades
+    ttl    -- seconds a cohort is served before recomputing (0 = until invalidated)
+    signal -- optional catalog.FileSignal; any invalidation in one process
+              drops every cohort in the others
+    """
+
+    def __init__(self, loader, ttl=600, signal=None):
+        self._loader = loader
+        self.ttl = ttl
+        self.signal = signal
+        self._cohorts = {}
+        self._generation = 0
+        self._signal_token = signal.token() if signal is not None else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_signal(self):
+        if self.signal is not None:
+            token = self.signal.token()
+            if token != self._signal_token:
+                with self._lock:
+                    self._cohorts.clear()
+                    self._generation += 1
+                    self._signal_token = token
+
+    def get(self, program, semester):
+        self._check_signal()
+        key = (program, semester)
+        entry = self._cohorts.get(key)
+        if entry is not None and (not self.ttl or time.monotonic() - entry[1] < self.ttl):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        generation = self._generation
+        grades = self._loader(program, semester)
+        with self._lock:
+            # A write that landed while we were loading may not be in `grades`.
+            if generation == self._generation:
+                self._cohorts[key] = (grades, time.monotonic())
+        return grades
+
+    def invalidate(self, *student_ids):
+        """Drop the cohorts holding these students (marks changed)."""
+        with self._lock:
+            self._generation += 1
+            for key, (grades, _) in list(self._cohorts.items()):
+                if any(student_id in grades for student_id in student_ids):
+                    del self._cohorts[key]
+            self.invalidations += 1
+        self._bump()
+
+    def invalidate_all(self):
+        """Drop everything (credits, cohort membership or bulk data changed)."""
+        with self._lock:
+            self._generation += 1
+            self._cohorts.clear()
+            self.invalidations += 1
+        self._bump()
+
+    def _bump(self):
+        if self.signal is not None:
+            self._signal_token = self.signal.bump(self._signal_token)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'cohorts': len(self._cohorts),
+            'students': sum(len(grades) for grades, _ in self._cohorts.values()),
+            'ttl': self.ttl,
+            'cross_process': self.signal is not None,
+        }
@@ -0,0 +1,310 @@
+"""Streaming CSV import for students, subjects, marks and attendance.
+
+Rows are read one at a time, validated against the column rules of
+student_management.sql and written in executemany() chunks with one commit
+per chunk. A bad row is reported with its line number and skipped; it never
+aborts the rest of the file. Students upsert on student_id (a row whose
+email belongs to another student is rejected) and subjects on code, marks on (student, subject, exam_date) and attendance on
+(student, subject, date), so re-running the same file is a no-op update.
+"""
+import csv
+import re
+from datetime import datetime
+
+import attendance
+import gradebook
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def truncated(self):
+        return self.failed > len(self.errors)
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'processed': self.processed,
+            'imported': self.imported,
+            'failed': self.failed,
+            'chunks': self.chunks,
+            'errors': [{'line': line, 'error': msg} for line, msg in self.errors],
+            'errors_truncated': self.truncated,
+        }
+
+
+# -------------------- field validators --------------------
+
+def _text(max_len, required=False):
+    def check(value):
+        value = (value or '').strip()
+        if not value:
+            if required:
+                raise RowError("is required")
+            return None
+        if len(value) > max_len:
+            raise RowError(f"is longer than {max_len} characters")
+        return value
+    return check
+
+def _email(value):
+    value = _text(150, required=True)(value)
+    if not EMAIL_RE.match(value):
+        raise RowError("is not a valid email address")
+    return value
+
+def _int(default=None):
+    def check(value):
+        value = (value or '').strip()
+        if not value:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise RowError("must be a whole number")
+    return check
+
+def _float(default=None, required=False):
+    def check(value):
+        value = (value or '').strip()
+        if not value:
+            if required:
+                raise RowError("is required")
+            return default
+        try:
+            number = float(value)
+        except ValueError:
+            raise RowError("must be a number")
+        if number < 0:
+            raise RowError("must not be negative")
+        return number
+    return check
+
+def _date(value):
+    value = (value or '').strip()
+    if not value:
+        raise RowError("is required")
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError("must be a YYYY-MM-DD date")
+
+def _status(value):
+    try:
+        return attendance.normalize_status(value or 'Absent')
+    except attendance.AttendanceError:
+        raise RowError("must be Present or Absent")
+
+
+# -------------------- per-table specs --------------------
+# columns: CSV header -> validator, in the order the INSERT expects them.
+
+SPECS = {
+    'students': {
+        'columns': {
+            'student_id': _text(20, required=True),
+            'first_name': _text(100, required=True),
+            'last_name': _text(100, required=True),
+            'email': _email,
+            'phone': _text(20),
+            'address': _text(255),
+            'program': _text(100),
+            'semester': _text(20),
+        },
+        'optional': ('phone', 'address', 'program', 'semester'),
+        'sql': """
+            INSERT INTO students (student_id, first_name, last_name, email, phone, address, program, semester)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE first_name=VALUES(first_name), last_name=VALUES(last_name),
+                email=VALUES(email), phone=VALUES(phone), address=VALUES(address),
+                program=VALUES(program), semester=VALUES(semester)
+        """,
+    },
+    'subjects': {
+        'columns': {
+            'code': _text(20, required=True),
+            'name': _text(150, required=True),
+            'credits': _int(default=3),
+        },
+        'optional': ('credits',),
+        'sql': """
+            INSERT INTO subjects (code, name, credits) VALUES (%s,%s,%s)
+            ON DUPLICATE KEY UPDATE name=VALUES(name), credits=VALUES(credits)
+        """,
+    },
+    'marks': {
+        'columns': {
+            'student_id': _text(20, required=True),
+            'subject_code': _text(20, required=True),
+            'marks': _float(required=True),
+            'max_marks': _float(default=100),
+            'exam_date': _date,
+        },
+        'optional': ('max_marks',),
+        # Continues the versions of cleared gradebook cells.
+        'writer': gradebook.insert_marks,
+    },
+    'attendance': {
+        'columns': {
+            'student_id': _text(20, required=True),
+            'subject_code': _text(20, required=True),
+            'date': _date,
+            'status': _status,
+        },
+        'optional': ('status',),
+        # Shares the roll-call write path instead of a plain INSERT.
+        'writer': attendance.write_attendance,
+    },
+}
+
+KINDS = tuple(SPECS)
+
+
+def validate_row(kind, row):
+    values = []
+    for column, check in SPECS[kind]['columns'].items():
+        try:
+            values.append(check(row.get(column)))
+        except RowError as e:
+            raise RowError(f"{column} {e}")
+    if kind == 'marks' and values[3] and values[2] > values[3]:
+        raise RowError("marks exceed max_marks")
+    return values
+
+
+def _lookup(cursor, sql_prefix, keys):
+    keys = sorted(set(keys))
+    if not keys:
+        return {}
+    placeholders = ','.join(['%s'] * len(keys))
+    cursor.execute(f"{sql_prefix} IN ({placeholders})", keys)
+    return {key: id_ for id_, key in cursor.fetchall()}
+
+
+def _resolve_refs(cursor, chunk, report):
+    """Swap student_id / subject_code strings for primary keys; drop unknown refs."""
+    students = _lookup(cursor, "SELECT id, student_id FROM students WHERE student_id",
+                       [values[0] for _, values in chunk])
+    subjects = _lookup(cursor, "SELECT id, code FROM subjects WHERE code",
+                       [values[1] for _, values in chunk])
+    resolved = []
+    for line, values in chunk:
+        if values[0] not in students:
+            report.error(line, f"unknown student_id {values[0]!r}")
+        elif values[1] not in subjects:
+            report.error(line, f"unknown subject code {values[1]!r}")
+        else:
+            resolved.append((line, [students[values[0]], subjects[values[1]]] + values[2:]))
+    return resolved
+
+
+def _check_emails(cursor, chunk, report):
+    """Drop student rows whose email belongs to a different student_id.
+
+    The upsert matches on any unique key, so without this a row reusing
+    another student's email would overwrite that student in place.
+    """
+    # Compared case-insensitively, as MySQL's unique index does.
+    owners = {email.lower(): student_id for email, student_id in _lookup(
+        cursor, "SELECT student_id, email FROM students WHERE email",
+        [values[3] for _, values in chunk]).items()}
+    accepted = []
+    for line, values in chunk:
+        owner = owners.setdefault(values[3].lower(), values[0])
+        if owner != values[0]:
+            report.error(line, f"email {values[3]!r} belongs to student {owner!r}")
+        else:
+            accepted.append((line, values))
+    return accepted
+
+
+def _write_chunk(conn, kind, chunk, report, error_types):
+    cursor = conn.cursor()
+    try:
+        if kind in ('marks', 'attendance'):
+            chunk = _resolve_refs(cursor, chunk, report)
+        elif kind == 'students':
+            chunk = _check_emails(cursor, chunk, report)
+        if not chunk:
+            return
+        write = SPECS[kind].get('writer') or (
+            lambda cur, rows: cur.executemany(SPECS[kind]['sql'], rows))
+        try:
+            write(cursor, [values for _, values in chunk])
+            conn.commit()
+            report.imported += len(chunk)
+        except error_types:
+            # Something in the chunk violates a constraint the checks above
+            # cannot see. Redo it row by row to pin down the culprits, each
+            # under a savepoint: a writer that runs several statements per
+            # row (attendance + its summary) must not leave half a row behind.
+            conn.rollback()
+            for line, values in chunk:
+                cursor.execute("SAVEPOINT import_row")
+                try:
+                    write(cursor, [values])
+                except error_types as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+                    report.error(line, str(e))
+                else:
+                    report.imported += 1
+                cursor.execute("RELEASE SAVEPOINT import_row")
+            conn.commit()
+    finally:
+        report.chunks += 1
+        cursor.close()
+
+
+def import_csv(conn, kind, stream, batch_size=BATCH_SIZE, error_types=(Exception,)):
+    """Import CSV text from `stream` into `kind`; returns an ImportReport.
+
+    `stream` is any iterable of text lines, so an uploaded file or an open
+    file handle are read incrementally and never held in memory at once.
+    """
+    if kind not in SPECS:
+        raise ValueError(f"unknown import kind {kind!r}; expected one of {', '.join(KINDS)}")
+    report = ImportReport(kind)
+    reader = csv.DictReader(stream)
+    spec = SPECS[kind]
+    missing = [c for c in spec['columns']
+               if c not in (reader.fieldnames or []) and c not in spec['optional']]
+    if missing:
+        report.error(1, f"missing column(s): {', '.join(missing)}")
+        return report
+
+    chunk = []
+    for row in reader:
+        report.processed += 1
+        line = reader.line_num
+        try:
+            chunk.append((line, validate_row(kind, row)))
+        except RowError as e:
+            report.error(line, str(e))
+            continue
+        if len(chunk) >= batch_size:
+            _write_chunk(conn, kind, chunk, report, error_types)
+            chunk = []
+    if chunk:
+        _write_chunk(conn, kind, chunk, report, error_types)
+    return report
@@ -0,0 +1,297 @@
+"""Low-overhead request instrumentation rendered in Prometheus text format.
+
+Metrics are plain in-process counters and fixed-bucket histograms guarded by
+one lock each; recording an observation is a bisect and two additions, so
+the layer is cheap enough to leave on in production. Each worker process
+exposes its own numbers at /metrics; Prometheus aggregates across workers.
+
+InstrumentedCursor wraps driver cursors to time every execute() and count
+fetched rows against the current request, and SlowQueryLog keeps the most
+recent statements over the threshold with their normalized SQL and route.
+QueryLog appends each distinct SELECT shape the app runs to a JSON-lines
+file, which `flask db check --queries` EXPLAINs.
+"""
+import bisect
+import json
+import re
+import threading
+import time
+from collections import deque
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time: fn() -> {labels tuple: value}."""
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name, self.help, self.label_names, self._fn = name, help, tuple(labels), fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self._fn()
+        except Exception:
+            values = {}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket"
+                             f"{_labels(self.label_names, labels, ('le', _number(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# -------------------- SQL instrumentation --------------------
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_RE = re.compile(r'(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Collapse literals, placeholders, IN lists and multi-row VALUES so one
+    query shape maps to one string."""
+    sql = _SPACE_RE.sub(' ', sql).strip()
+    sql = _STRING_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _VALUES_RE.sub(r'\1, ...', sql)
+    sql = _IN_LIST_RE.sub('(?, ...)', sql)
+    return sql
+
+
+class SlowQueryLog:
+    def __init__(self, threshold, size=100, logger=None):
+        self.threshold = threshold
+        self.entries = deque(maxlen=size)
+        self.logger = logger
+
+    def record(self, sql, seconds, route):
+        normalized = normalize_sql(sql)
+        entry = {
+            'at': time.time(),
+            'route': route,
+            'seconds': round(seconds, 6),
+            'sql': normalized,
+        }
+        self.entries.append(entry)
+        if self.logger is not None:
+            self.logger.warning("slow query (%.3fs) in %s: %s", seconds, route, normalized)
+
+
+class QueryLog:
+    """Record the first (route, sql, params) seen for every SELECT shape.
+
+    Shapes are keyed on (route, normalize_sql(sql)) and written once, so a
+    test or benchmark run leaves a file of exactly the queries the app
+    issues, each with real parameters to EXPLAIN it with.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def record(self, sql, params, route):
+        if sql.lstrip()[:6].upper() != 'SELECT':
+            return
+        key = (route, normalize_sql(sql))
+        if key in self._seen:
+            return
+        with self._lock:
+            if key in self._seen:
+                return
+            self._seen.add(key)
+            if not isinstance(params, dict):
+                params = list(params or ())
+            line = json.dumps({'route': route, 'sql': sql, 'params': params}, default=str)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def load_query_log(path):
+    """[(route, sql, params)] from a QueryLog file, deduplicated by shape."""
+    queries, seen = [], set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = (entry['route'], normalize_sql(entry['sql']))
+            if key not in seen:
+                seen.add(key)
+                params = entry['params']
+                queries.append((entry['route'], entry['sql'],
+                                params if isinstance(params, dict) else tuple(params)))
+    return queries
+
+
+class RequestStats:
+    """Per-request accumulators, kept on flask.g."""
+
+    __slots__ = ('started', 'queries', 'db_time', 'rows', 'template_time', 'acquire_time',
+                 'status', '_template_starts')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.template_time = 0.0
+        self.acquire_time = 0.0
+        self.status = None
+        self._template_starts = []
+
+
+class InstrumentedCursor:
+    """Cursor proxy that charges execute() time and fetched rows to a request.
+
+    `stats` returns the current RequestStats (or None outside a request) and
+    `on_query(sql, params, seconds)` is told about every statement, for
+    slow-query logging, the query log and per-statement metrics.
+    """
+
+    def __init__(self, cursor, stats, on_query):
+        self._cursor = cursor
+        self._stats = stats
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, sql, params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self._stats()
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += elapsed
+            self._on_query(sql, params, elapsed)
+
+    def execute(self, sql, *args, **kwargs):
+        params = args[0] if args else kwargs.get('params')
+        return self._timed(self._cursor.execute, sql, params, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.executemany, sql, None, *args, **kwargs)
+
+    def _count(self, rows):
+        stats = self._stats()
+        if stats is not None and rows:
+            stats.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count([row])
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self._count(self._cursor.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
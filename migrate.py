@@ -0,0 +1,328 @@
+"""Versioned schema migrations.
+
+Migrations live in migrations/ as NNNN_name.sql or NNNN_name.py files and run
+in version order. Applied versions are recorded in schema_migrations, so
+`flask db upgrade` only runs what a database is missing and can be pointed
+at a live database. SQL files are split on ';' at line ends. Python files
+define upgrade(cursor), may return lines to show the operator, and use the
+helpers below to stay idempotent, which lets a database created straight
+from student_management.sql adopt the migration history without errors.
+
+`flask db check` EXPLAINs the queries the routes run (EXPLAIN_QUERIES) and
+fails if any of them does a full table scan on a large table. With
+`--queries <file>` it also checks every SELECT shape recorded by a run with
+QUERY_LOG_PATH set (the test suite, a benchmark), so new queries are
+checked without being added here by hand.
+"""
+import importlib.util
+import os
+import re
+
+import exports
+from metrics import normalize_sql
+from student_profile import PROFILE_SQL
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+LOCK_NAME = 'student_management.schema_migrations'
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.name}>"
+
+    def apply(self, cursor):
+        if self.path.endswith('.sql'):
+            with open(self.path, encoding='utf-8') as f:
+                for statement in split_sql(f.read()):
+                    cursor.execute(statement)
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{self.version:04d}", self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module.upgrade(cursor)
+
+
+def split_sql(text):
+    """Split a SQL script into statements, dropping -- comments."""
+    lines = [line for line in text.splitlines() if not line.strip().startswith('--')]
+    statements, current = [], []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statement = '\n'.join(current).strip().rstrip(';').strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    tail = '\n'.join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("duplicate migration version numbers in " + directory)
+    return migrations
+
+
+# -------------------- helpers for python migrations --------------------
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone()[0] > 0
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def index_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, name))
+    return cursor.fetchone()[0] > 0
+
+
+def add_index(cursor, table, name, columns, unique=False):
+    """Create an index online (no table lock) unless it already exists."""
+    if index_exists(cursor, table, name):
+        return False
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)}), "
+                   f"ALGORITHM=INPLACE, LOCK=NONE")
+    return True
+
+
+def move_duplicates(cursor, table, columns):
+    """Move every row that repeats an earlier row's `columns` into <table>_duplicates.
+
+    Rows with a NULL in `columns` are left alone: a unique index allows
+    them. The lowest id of each group stays; the others are kept in the
+    side table for review rather than deleted. Returns the number moved.
+
+    MySQL commits implicitly around DDL, so a failed migration can leave the
+    copy done without the delete. Both steps are therefore safe to repeat:
+    rows already in the side table are skipped, and every row in it is
+    deleted from `table`, so the next run finishes the move.
+    """
+    join = ' AND '.join(f"a.{c} = b.{c}" for c in columns)
+    side = f"{table}_duplicates"
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {side} LIKE {table}")
+    cursor.execute(f"""
+        INSERT IGNORE INTO {side}
+        SELECT a.* FROM {table} a
+        WHERE EXISTS (SELECT 1 FROM {table} b WHERE {join} AND b.id < a.id)
+    """)
+    cursor.execute(f"DELETE a FROM {table} a JOIN {side} d ON d.id = a.id")
+    return cursor.rowcount
+
+
+# -------------------- runner --------------------
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def status(conn):
+    """[(migration, applied?)] in version order."""
+    cursor = conn.cursor()
+    try:
+        applied = applied_versions(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+    return [(m, m.version in applied) for m in discover()]
+
+
+def upgrade(conn, target=None, echo=print):
+    """Apply pending migrations up to `target` (inclusive). Returns those applied.
+
+    A named lock keeps two processes (e.g. several workers starting at once)
+    from migrating the same database concurrently.
+    """
+    cursor = conn.cursor()
+    done = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("another process is running migrations")
+        try:
+            applied = applied_versions(cursor)
+            for migration in discover():
+                if migration.version in applied or (target is not None and migration.version > target):
+                    continue
+                echo(f"applying {migration.version:04d}_{migration.name}")
+                # A Python migration may return notes for the operator.
+                for note in migration.apply(cursor) or ():
+                    echo(f"  {note}")
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                               (migration.version, migration.name))
+                conn.commit()
+                done.append(migration)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return done
+
+
+# -------------------- EXPLAIN check --------------------
+# One entry per query shape the routes issue: (route, sql, sample params).
+# Keep this in step with app.py when adding or changing queries.
+
+EXPLAIN_QUERIES = [
+    ('list_students', "SELECT id, student_id, first_name, last_name, email, program, semester "
+                      "FROM students ORDER BY id LIMIT 26", ()),
+    ('list_students', "SELECT id, student_id, first_name, last_name, email, program, semester "
+                      "FROM students WHERE program = %s AND semester = %s "
+                      "ORDER BY id LIMIT 26", ('B.Tech Computer Engg', '5')),
+    ('list_students', "SELECT id, last_name FROM students WHERE (last_name > %s OR "
+                      "(last_name = %s AND id > %s)) ORDER BY last_name, id LIMIT 26", ('M', 'M', 1)),
+    ('edit_student', "SELECT * FROM students WHERE id=%s", (1,)),
+    ('subject_catalog', "SELECT id, code, name, credits FROM subjects ORDER BY id", ()),
+    ('view_student', PROFILE_SQL, (1, 1, 1, 1)),
+    ('manage_marks', "SELECT m.*, s.name AS subject_name FROM marks m "
+                     "LEFT JOIN subjects s ON m.subject_id = s.id WHERE m.student_id = %s "
+                     "ORDER BY m.exam_date DESC", (1,)),
+    ('edit_mark', "SELECT * FROM marks WHERE id=%s", (1,)),
+    ('gradebook', "SELECT s.id, m.marks, m.max_marks, m.version "
+                  "FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e "
+                  "JOIN students s ON s.id = e.student_id "
+                  "LEFT JOIN marks m ON m.student_id = s.id AND m.subject_id = %s "
+                  "AND m.exam_date = %s", (1, 1, '2026-01-05')),
+    ('manage_attendance', "SELECT a.date, a.status, s.code AS subject_code FROM attendance a "
+                          "JOIN subjects s ON s.id = a.subject_id WHERE a.student_id=%s "
+                          "ORDER BY a.date DESC LIMIT 100", (1,)),
+    ('attendance_roll_call', "SELECT s.id, s.student_id, s.first_name, s.last_name, a.status "
+                             "FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e "
+                             "JOIN students s ON s.id = e.student_id "
+                             "LEFT JOIN attendance a ON a.student_id = s.id AND a.subject_id = %s "
+                             "AND a.date = %s", (1, 1, '2026-01-05')),
+    ('api_roll_call', "SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s", (1,)),
+    ('api_roll_call', "SELECT student_id, subject_id, date, status FROM attendance "
+                      "WHERE (student_id, subject_id, date) IN ((%s,%s,%s))", (1, 1, '2026-01-05')),
+    ('attendance_roll_call', "SELECT s.id, b.present, b.recorded "
+                             "FROM (SELECT DISTINCT student_id FROM enrollments WHERE subject_id=%s) e "
+                             "JOIN students s ON s.id = e.student_id "
+                             "LEFT JOIN attendance_bitmaps b ON b.student_id = s.id AND b.subject_id = %s "
+                             "AND b.term = %s", (1, 1, '2026-1')),
+    ('manage_attendance', "SELECT subject_id, term, session_no, date FROM class_sessions "
+                          "WHERE (subject_id, term) IN ((%s,%s)) ORDER BY date DESC", (1, '2026-1')),
+    ('attendance_reports', "SELECT subject_id, term, session_no FROM class_sessions "
+                           "WHERE date BETWEEN %s AND %s", ('2026-01-01', '2026-03-31')),
+    ('attendance_reports', "SELECT student_id, present, recorded FROM attendance_bitmaps "
+                           "WHERE (subject_id, term) IN ((%s,%s))", (1, '2026-1')),
+    ('attendance_reports', "SELECT s.id, sub.name, sm.present_count, sm.total_count "
+                           "FROM attendance_summary sm JOIN students s ON s.id=sm.student_id "
+                           "JOIN subjects sub ON sub.id=sm.subject_id", ()),
+    ('bulk_import', "SELECT id, student_id FROM students WHERE student_id IN (%s, %s)", ('S001', 'S002')),
+    ('bulk_import', "SELECT id, code FROM subjects WHERE code IN (%s, %s)", ('CS101', 'CS102')),
+    ('api_v1_list', "SELECT id, status, updated_at AS sort_value FROM attendance "
+                    "WHERE updated_at >= %s ORDER BY updated_at, id LIMIT 101", ('2026-01-01 00:00:00',)),
+    ('api_v1_list', "SELECT row_id AS id, deleted_at AS sort_value FROM deleted_rows "
+                    "WHERE resource = %s AND deleted_at >= %s", ('attendance', '2026-01-01 00:00:00')),
+    ('list_students', "SELECT id, program, COALESCE(program, '') AS sort_value FROM students "
+                      "WHERE (COALESCE(program, '') > %s OR (COALESCE(program, '') = %s AND id > %s)) "
+                      "ORDER BY COALESCE(program, ''), id LIMIT 26", ('B', 'B', 1)),
+    ('list_students', "SELECT id, semester, COALESCE(semester, '') AS sort_value FROM students "
+                      "ORDER BY COALESCE(semester, ''), id LIMIT 26", ()),
+    ('dashboard_rollups', "SELECT date, SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END), COUNT(*) "
+                          "FROM attendance WHERE date BETWEEN %s AND %s GROUP BY date",
+     ('2026-01-01', '2026-01-30')),
+    ('dashboard_rollups', "SELECT DATE(created_at), COUNT(*) FROM students "
+                          "WHERE created_at >= %s GROUP BY DATE(created_at)", ('2026-01-01',)),
+    ('dashboard_rollups', "SELECT first_name, last_name, created_at FROM students "
+                          "ORDER BY id DESC LIMIT %s", (20,)),
+    ('grade_cohort', "SELECT s.id, s.student_id, s.first_name, s.last_name, m.subject_id, m.marks, "
+                     "m.max_marks FROM students s LEFT JOIN marks m ON m.student_id = s.id "
+                     "WHERE s.program = %s AND s.semester = %s ORDER BY s.id",
+     ('B.Tech Computer Engg', '5')),
+    ('student_index', "SELECT id, student_id, first_name, last_name, email, phone, program, semester "
+                      "FROM students", ()),
+    *((f'export_{name}', *exports.build_query(name, [], [])) for name in exports.DATASETS),
+    ('export_filtered', *exports.build_query('students', ["program = %s", "semester = %s"],
+                                             ['B.Tech Computer Engg', '5'])),
+]
+
+# Reports, exports and the search index loader legitimately read every row of
+# these; they are checked for index use on their joins but a scan of the
+# driving table is expected.
+FULL_SCAN_ALLOWED = {
+    ('attendance_reports', 'sm'),
+    ('student_index', 'students'),
+    ('export_students', 's'),
+    ('export_subjects', 'sub'),
+    ('export_marks', 'm'),
+    ('export_attendance', 'sm'),
+}
+
+
+def merge_queries(queries, recorded):
+    """`queries` plus every recorded (route, sql, params) of a shape not already in it.
+
+    A recorded statement that matches a registered one keeps the registered
+    route name, so FULL_SCAN_ALLOWED still applies to it.
+    """
+    shapes = {normalize_sql(sql) for _, sql, _ in queries}
+    merged = list(queries)
+    for route, sql, params in recorded:
+        shape = normalize_sql(sql)
+        if shape not in shapes:
+            shapes.add(shape)
+            merged.append((route, sql, params))
+    return merged
+
+
+def explain_check(conn, min_rows=1000, queries=EXPLAIN_QUERIES):
+    """EXPLAIN every registered query; return [(route, table, rows, sql)] scans."""
+    cursor = conn.cursor(dictionary=True)
+    problems = []
+    try:
+        for route, sql, params in queries:
+            cursor.execute("EXPLAIN " + sql, params)
+            for row in cursor.fetchall():
+                table = row.get('table') or ''
+                if table.startswith('<') or (route, table) in FULL_SCAN_ALLOWED:
+                    continue
+                if row.get('type') == 'ALL' and (row.get('rows') or 0) >= min_rows:
+                    problems.append((route, table, row['rows'], sql))
+    finally:
+        cursor.close()
+    return problems
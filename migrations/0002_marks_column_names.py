@@ -0,0 +1,9 @@
+"""Rename marks_obtained/total_marks to the marks/max_marks names app.py uses."""
+from migrate import column_exists
+
+
+def upgrade(cursor):
+    if column_exists(cursor, 'marks', 'marks_obtained'):
+        cursor.execute("ALTER TABLE marks CHANGE marks_obtained marks FLOAT DEFAULT 0")
+    if column_exists(cursor, 'marks', 'total_marks'):
+        cursor.execute("ALTER TABLE marks CHANGE total_marks max_marks FLOAT DEFAULT 100")
@@ -0,0 +1,24 @@
+"""Unique keys the upserts rely on.
+
+Existing duplicates keep their oldest row; the rest are moved to
+<table>_duplicates for review instead of being deleted.
+"""
+from migrate import add_index, index_exists, move_duplicates
+
+UNIQUE_KEYS = [
+    ('enrollments', 'uq_enrollments_student_subject', ('student_id', 'subject_id')),
+    ('marks', 'uq_marks_student_subject_exam', ('student_id', 'subject_id', 'exam_date')),
+    ('attendance', 'uq_attendance_student_subject_date', ('student_id', 'subject_id', 'date')),
+]
+
+
+def upgrade(cursor):
+    notes = []
+    for table, name, columns in UNIQUE_KEYS:
+        if not index_exists(cursor, table, name):
+            moved = move_duplicates(cursor, table, columns)
+            if moved:
+                notes.append(f"{moved} duplicate {table} row(s) moved to {table}_duplicates; "
+                             f"review them before dropping the table")
+            add_index(cursor, table, name, columns, unique=True)
+    return notes
@@ -0,0 +1,25 @@
+"""attendance_summary: per-(student, subject) counts, backfilled on creation."""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if table_exists(cursor, 'attendance_summary'):
+        return
+    cursor.execute("""
+        CREATE TABLE attendance_summary (
+            student_id INT NOT NULL,
+            subject_id INT NOT NULL,
+            present_count INT NOT NULL DEFAULT 0,
+            total_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, subject_id),
+            FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+            FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO attendance_summary (student_id, subject_id, present_count, total_count)
+        SELECT student_id, subject_id,
+               SUM(CASE WHEN status='Present' THEN 1 ELSE 0 END), COUNT(*)
+        FROM attendance
+        GROUP BY student_id, subject_id
+    """)
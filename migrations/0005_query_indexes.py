@@ -0,0 +1,21 @@
+"""Secondary indexes for the WHERE / ORDER BY shapes in app.py."""
+from migrate import add_index
+
+INDEXES = [
+    # list_students: program/semester filters, name sort
+    ('students', 'idx_students_program_semester', ('program', 'semester')),
+    ('students', 'idx_students_last_name', ('last_name',)),
+    # roll call: enrolled students of a subject
+    ('enrollments', 'idx_enrollments_subject_student', ('subject_id', 'student_id')),
+    # manage_marks: WHERE student_id ORDER BY exam_date DESC
+    ('marks', 'idx_marks_student_exam_date', ('student_id', 'exam_date')),
+    # per-session lookups by subject and day
+    ('attendance', 'idx_attendance_subject_date', ('subject_id', 'date')),
+    # manage_attendance history: WHERE student_id ORDER BY date DESC
+    ('attendance', 'idx_attendance_student_date', ('student_id', 'date')),
+]
+
+
+def upgrade(cursor):
+    for table, name, columns in INDEXES:
+        add_index(cursor, table, name, columns)
@@ -0,0 +1,36 @@
+"""class_sessions + attendance_bitmaps for the packed attendance store.
+
+Created empty; `flask attendance-store convert` fills them from attendance.
+"""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if not table_exists(cursor, 'class_sessions'):
+        cursor.execute("""
+            CREATE TABLE class_sessions (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                subject_id INT NOT NULL,
+                term VARCHAR(10) NOT NULL,
+                session_no INT NOT NULL,
+                date DATE NOT NULL,
+                UNIQUE KEY uq_class_sessions_subject_date (subject_id, date),
+                UNIQUE KEY uq_class_sessions_subject_term_no (subject_id, term, session_no),
+                INDEX idx_class_sessions_date (date),
+                FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+            )
+        """)
+    if not table_exists(cursor, 'attendance_bitmaps'):
+        cursor.execute("""
+            CREATE TABLE attendance_bitmaps (
+                student_id INT NOT NULL,
+                subject_id INT NOT NULL,
+                term VARCHAR(10) NOT NULL,
+                present VARBINARY(512) NOT NULL,
+                recorded VARBINARY(512) NOT NULL,
+                PRIMARY KEY (student_id, subject_id, term),
+                INDEX idx_attendance_bitmaps_subject_term (subject_id, term),
+                FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+                FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+            )
+        """)
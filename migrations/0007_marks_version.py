@@ -0,0 +1,9 @@
+"""marks.version for the gradebook's optimistic concurrency, and an index
+for loading one (subject, exam_date) grid."""
+from migrate import add_index, column_exists
+
+
+def upgrade(cursor):
+    if not column_exists(cursor, 'marks', 'version'):
+        cursor.execute("ALTER TABLE marks ADD COLUMN version INT NOT NULL DEFAULT 1")
+    add_index(cursor, 'marks', 'idx_marks_subject_exam_date', ('subject_id', 'exam_date'))
@@ -0,0 +1,43 @@
+"""archived_students + archive_jobs for `flask archive`.
+
+Archived students keep their own columns for lookups and their marks,
+enrollments and attendance as one compressed JSON payload.
+"""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if not table_exists(cursor, 'archive_jobs'):
+        cursor.execute("""
+            CREATE TABLE archive_jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                program VARCHAR(100) NOT NULL,
+                semester VARCHAR(20),
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                chunk_size INT NOT NULL,
+                last_id INT NOT NULL DEFAULT 0,
+                archived INT NOT NULL DEFAULT 0,
+                total INT NOT NULL DEFAULT 0,
+                error VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+    if not table_exists(cursor, 'archived_students'):
+        cursor.execute("""
+            CREATE TABLE archived_students (
+                id INT PRIMARY KEY,
+                student_id VARCHAR(20) NOT NULL,
+                first_name VARCHAR(100) NOT NULL,
+                last_name VARCHAR(100) NOT NULL,
+                email VARCHAR(150) NOT NULL,
+                program VARCHAR(100),
+                semester VARCHAR(20),
+                job_id INT,
+                archived_at DATETIME NOT NULL,
+                payload LONGBLOB NOT NULL,
+                INDEX idx_archived_students_student_id (student_id),
+                INDEX idx_archived_students_program_semester (program, semester),
+                FOREIGN KEY (job_id) REFERENCES archive_jobs(id) ON DELETE SET NULL
+            )
+        """)
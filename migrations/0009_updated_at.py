@@ -0,0 +1,14 @@
+"""updated_at on the tables the v1 API syncs, for `since` queries."""
+from migrate import add_index, column_exists
+
+TABLES = ('students', 'subjects', 'enrollments', 'marks', 'attendance')
+
+
+def upgrade(cursor):
+    for table in TABLES:
+        if not column_exists(cursor, table, 'updated_at'):
+            cursor.execute(f"""
+                ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP
+                DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            """)
+        add_index(cursor, table, f"idx_{table}_updated_at", ('updated_at',))
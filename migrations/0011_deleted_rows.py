@@ -0,0 +1,15 @@
+"""deleted_rows: tombstones so `since` syncs through the v1 API see deletes."""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if not table_exists(cursor, 'deleted_rows'):
+        cursor.execute("""
+            CREATE TABLE deleted_rows (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                resource VARCHAR(32) NOT NULL,
+                row_id INT NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_deleted_rows_resource_deleted_at (resource, deleted_at)
+            )
+        """)
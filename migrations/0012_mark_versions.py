@@ -0,0 +1,18 @@
+"""mark_versions: the last version of marks cells that were cleared, so a
+re-entered mark continues the count instead of starting again at 1."""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if not table_exists(cursor, 'mark_versions'):
+        cursor.execute("""
+            CREATE TABLE mark_versions (
+                student_id INT NOT NULL,
+                subject_id INT NOT NULL,
+                exam_date DATE NOT NULL,
+                version INT NOT NULL,
+                PRIMARY KEY (student_id, subject_id, exam_date),
+                FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+                FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+            )
+        """)
@@ -0,0 +1,15 @@
+"""class_session_locks: one row per (subject, term) that numbering a new
+class session locks, so the first sessions of a term are numbered in turn."""
+from migrate import table_exists
+
+
+def upgrade(cursor):
+    if not table_exists(cursor, 'class_session_locks'):
+        cursor.execute("""
+            CREATE TABLE class_session_locks (
+                subject_id INT NOT NULL,
+                term VARCHAR(10) NOT NULL,
+                PRIMARY KEY (subject_id, term),
+                FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+            )
+        """)
@@ -0,0 +1,139 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class Page:
+    """One keyset page of rows plus the cursors needed to move either way."""
+
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    return values
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def fetch_page(cursor, select, where, params, sort_expr, sort_key,
+               descending=False, after=None, before=None, limit=DEFAULT_PAGE_SIZE,
+               id_expr='id', id_key='id'):
+    """Run `select` with keyset pagination on (sort_expr, id_expr).
+
+    `where` is a list of SQL conditions ANDed together, `params` their values.
+    `sort_key` / `id_key` name the same columns in the fetched row dicts so the
+    boundary rows can be turned back into cursors. Only one of `after` /
+    `before` (decoded cursors) is used; `before` walks backwards and the rows
+    are flipped back into display order.
+    """
+    where = list(where)
+    params = list(params)
+    backwards = before is not None and after is None
+    boundary = before if backwards else after
+    # Walking backwards over an ascending sort is a descending scan and vice versa.
+    scan_desc = descending != backwards
+    op = '<' if scan_desc else '>'
+    if boundary is not None:
+        where.append(f"({sort_expr} {op} %s OR ({sort_expr} = %s AND {id_expr} {op} %s))")
+        params.extend([boundary[0], boundary[0], boundary[1]])
+
+    order = 'DESC' if scan_desc else 'ASC'
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_expr} {order}, {id_expr} {order} LIMIT %s"
+    params.append(limit + 1)
+
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor([row[sort_key], row[id_key]])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            prev_cursor = cursor_for(rows[0]) if more else None
+            next_cursor = cursor_for(rows[-1])
+        else:
+            next_cursor = cursor_for(rows[-1]) if more else None
+            prev_cursor = cursor_for(rows[0]) if boundary is not None else None
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def paginate_rows(rows, sort_value, descending=False, after=None, before=None,
+                  limit=DEFAULT_PAGE_SIZE, id_key='id'):
+    """fetch_page() for rows already in memory (e.g. a cached table snapshot).
+
+    `sort_value(row)` must return the same value the cursor was built from and
+    must never be None. Cursors are interchangeable with fetch_page()'s.
+    """
+    def key(row):
+        return (sort_value(row), row[id_key])
+
+    ordered = sorted(rows, key=key, reverse=descending)
+    backwards = before is not None and after is None
+    boundary = before if backwards else after
+    if boundary is not None:
+        boundary = tuple(boundary)
+        if backwards:
+            ordered = [r for r in ordered if (key(r) > boundary if descending else key(r) < boundary)]
+            more = len(ordered) > limit
+            page = ordered[-limit:]
+        else:
+            ordered = [r for r in ordered if (key(r) < boundary if descending else key(r) > boundary)]
+            more = len(ordered) > limit
+            page = ordered[:limit]
+    else:
+        more = len(ordered) > limit
+        page = ordered[:limit]
+
+    def cursor_for(row):
+        return encode_cursor(list(key(row)))
+
+    next_cursor = prev_cursor = None
+    if page:
+        if backwards:
+            prev_cursor = cursor_for(page[0]) if more else None
+            next_cursor = cursor_for(page[-1])
+        else:
+            next_cursor = cursor_for(page[-1]) if more else None
+            prev_cursor = cursor_for(page[0]) if boundary is not None else None
+    return Page(list(page), next_cursor, prev_cursor)
@@ -1,7 +1,14 @@
-import os
-from app import app, db
+"""Drop and recreate every table, with the sample data from student_management.sql.
+
+Same as `flask db reset --yes`; honours DB_BACKEND / SQLITE_PATH / DB_* env vars.
+"""
+import sys
+
+from app import app, backend, get_db_connection
 
 with app.app_context():
-    db.drop_all()
-    db.create_all()
-    print("Database reset successfully!")
\ No newline at end of file
+    conn = get_db_connection()
+    if conn is None:
+        sys.exit("Database connection failed")
+    backend.reset(conn, sample_data='--no-sample-data' not in sys.argv)
+    print("Database reset successfully!")
@@ -0,0 +1,278 @@
+"""Pre-aggregated dashboard figures kept in memory.
+
+Rollups holds small time buckets instead of scanning `attendance` and
+`students` on every dashboard hit:
+
+- daily and weekly (ISO week, Monday-keyed) attendance [present, total],
+  bucketed by class date
+- daily new registrations
+- a bounded deque of recent write events
+
+The write routes feed it as they commit. A loader re-warms it from the
+database on first use, every `ttl` seconds (to pick up CLI imports and the
+like), and whenever another worker bumps the shared FileSignal. The loader
+runs outside the lock: writes recorded meanwhile are applied to the old
+buckets and replayed onto the new ones, and only a cold cache makes callers
+wait for it. Every change bumps `version` and wakes wait()ers, which is what
+the server-sent-events feed blocks on.
+"""
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+
+DAILY_DAYS = 62
+WEEKLY_WEEKS = 12
+RECENT_EVENTS = 20
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def rate(present, total):
+    return round(present / total * 100, 1) if total else None
+
+
+def ago(seconds):
+    """'just now', '5 minutes ago', '3 hours ago', '2 days ago'."""
+    seconds = max(0, int(seconds))
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            count = seconds // size
+            return f"{count} {unit}{'s' if count != 1 else ''} ago"
+    return 'just now'
+
+
+class Warmup:
+    """What a loader returns: the buckets as they stand in the database."""
+
+    def __init__(self, attendance=None, registrations=None, events=()):
+        self.attendance = attendance or {}          # {date: (present, total)}
+        self.registrations = registrations or {}    # {date: count}
+        self.events = list(events)                  # [(datetime, kind, message)] oldest first
+
+
+class Rollups:
+    """
+    loader -- callable(since_date) -> Warmup
+    ttl    -- seconds between re-warms from the database (0 = only on demand)
+    signal -- optional catalog.FileSignal shared with the other worker processes
+    """
+
+    def __init__(self, loader, ttl=300, signal=None, today=date.today):
+        self._loader = loader
+        self.ttl = ttl
+        self.signal = signal
+        self._today = today
+        self._daily = {}
+        self._weekly = {}
+        self._registrations = {}
+        self._events = deque(maxlen=RECENT_EVENTS)
+        self._warmed_at = None
+        self._warm = False          # buckets hold data, even if stale
+        self._signal_token = None
+        self.version = 0
+        self._changed = threading.Condition()
+        self._loading = threading.Lock()
+        self._journal = None        # deltas recorded while a load is in flight
+        self.warms = 0
+
+    # -------------------- loading --------------------
+
+    def _stale(self):
+        if self._warmed_at is None:
+            return True
+        if self.ttl and time.monotonic() - self._warmed_at >= self.ttl:
+            return True
+        return self.signal is not None and self.signal.token() != self._signal_token
+
+    def _ensure(self):
+        if not self._stale():
+            return
+        # With stale data in hand, serve it rather than queue behind a reload.
+        if not self._loading.acquire(blocking=not self._warm):
+            return
+        try:
+            if not self._stale():
+                return
+            # Read the token before loading so a bump during the load is not lost.
+            token = self.signal.token() if self.signal is not None else None
+            since = self._today() - timedelta(days=max(DAILY_DAYS, WEEKLY_WEEKS * 7))
+            with self._changed:
+                self._journal = []
+            try:
+                warm = self._loader(since)
+            except BaseException:
+                with self._changed:
+                    self._journal = None
+                raise
+            with self._changed:
+                journal, self._journal = self._journal, None
+                self._daily, self._weekly = {}, {}
+                for day, (present, total) in warm.attendance.items():
+                    self._add_attendance(day, present, total)
+                self._registrations = dict(warm.registrations)
+                for kind, day, *delta in journal:
+                    if kind == 'attendance':
+                        self._add_attendance(day, *delta)
+                    else:
+                        self._registrations[day] = self._registrations.get(day, 0) + delta[0]
+                # Keep events this process saw that the database cannot reproduce.
+                seen = {(e['kind'], e['message']) for e in self._events}
+                events = [(e['at'], e['kind'], e['message']) for e in self._events]
+                events += [event for event in warm.events if (event[1], event[2]) not in seen]
+                self._events.clear()
+                for at, kind, message in sorted(events)[-RECENT_EVENTS:]:
+                    self._events.append({'at': at, 'kind': kind, 'message': message})
+                self._prune()
+                self._warmed_at = time.monotonic()
+                self._warm = True
+                self._signal_token = token
+                self.warms += 1
+                self._notify()
+        finally:
+            self._loading.release()
+
+    def invalidate(self):
+        """Re-warm from the database on the next read (bulk writes)."""
+        with self._changed:
+            self._warmed_at = None
+        self._bump()
+
+    # -------------------- writes --------------------
+
+    def _add_attendance(self, day, present, total):
+        bucket = self._daily.setdefault(day, [0, 0])
+        bucket[0] += present
+        bucket[1] += total
+        bucket = self._weekly.setdefault(week_start(day), [0, 0])
+        bucket[0] += present
+        bucket[1] += total
+
+    def _prune(self):
+        today = self._today()
+        oldest_day = today - timedelta(days=DAILY_DAYS)
+        oldest_week = week_start(today) - timedelta(weeks=WEEKLY_WEEKS)
+        for buckets, oldest in ((self._daily, oldest_day), (self._registrations, oldest_day),
+                                (self._weekly, oldest_week)):
+            for key in [key for key in buckets if key < oldest]:
+                del buckets[key]
+
+    def _notify(self):
+        self.version += 1
+        self._changed.notify_all()
+
+    def _bump(self):
+        if self.signal is not None:
+            self._signal_token = self.signal.bump(self._signal_token)
+
+    def _event(self, kind, message):
+        self._events.append({'at': datetime.now(), 'kind': kind, 'message': message})
+
+    def record_attendance(self, daily, subject=None):
+        """Apply {date: [present_delta, total_delta]} from attendance.write_attendance()."""
+        if not daily:
+            return
+        self._ensure()
+        with self._changed:
+            for day, (present, total) in daily.items():
+                self._add_attendance(day, present, total)
+                if self._journal is not None:
+                    self._journal.append(('attendance', day, present, total))
+            days = sorted(daily)
+            when = days[0].isoformat() if len(days) == 1 else f"{len(days)} days"
+            self._event('attendance', f"Attendance marked for {subject} ({when})" if subject
+                        else f"Attendance marked ({when})")
+            self._prune()
+            self._notify()
+        self._bump()
+
+    def record_registration(self, name, count=1, day=None):
+        self._ensure()
+        with self._changed:
+            day = day or self._today()
+            self._registrations[day] = self._registrations.get(day, 0) + count
+            if self._journal is not None:
+                self._journal.append(('registration', day, count))
+            self._event('student', f"New student registered: {name}" if count == 1
+                        else f"{count} students imported")
+            self._notify()
+        self._bump()
+
+    def record_event(self, kind, message):
+        """A write with no bucket of its own (marks, deletes, subjects)."""
+        self._ensure()
+        with self._changed:
+            self._event(kind, message)
+            self._notify()
+        self._bump()
+
+    # -------------------- reads --------------------
+
+    def _window(self, days):
+        today = self._today()
+        present = total = 0
+        for offset in range(days):
+            bucket = self._daily.get(today - timedelta(days=offset))
+            if bucket:
+                present += bucket[0]
+                total += bucket[1]
+        return present, total
+
+    def snapshot(self):
+        """JSON-ready figures for the dashboard."""
+        self._ensure()
+        with self._changed:
+            today = self._today()
+            week, month = self._window(7), self._window(30)
+            daily = []
+            for offset in range(13, -1, -1):
+                day = today - timedelta(days=offset)
+                present, total = self._daily.get(day, (0, 0))
+                daily.append({'date': day.isoformat(), 'present': present, 'total': total,
+                              'rate': rate(present, total)})
+            weekly = []
+            for offset in range(WEEKLY_WEEKS - 1, -1, -1):
+                start = week_start(today) - timedelta(weeks=offset)
+                present, total = self._weekly.get(start, (0, 0))
+                weekly.append({'week': start.isoformat(), 'present': present, 'total': total,
+                               'rate': rate(present, total)})
+            registrations = {
+                'today': self._registrations.get(today, 0),
+                'week': sum(n for day, n in self._registrations.items() if (today - day).days < 7),
+                'month': sum(n for day, n in self._registrations.items() if (today - day).days < 30),
+            }
+            now = datetime.now()
+            events = [{'kind': e['kind'], 'message': e['message'], 'at': e['at'].isoformat(),
+                       'ago': ago((now - e['at']).total_seconds())}
+                      for e in reversed(self._events)]
+            return {
+                'version': self.version,
+                'attendance': {
+                    'week': {'present': week[0], 'total': week[1], 'rate': rate(*week)},
+                    'month': {'present': month[0], 'total': month[1], 'rate': rate(*month)},
+                    'daily': daily,
+                    'weekly': weekly,
+                },
+                'registrations': registrations,
+                'events': events,
+            }
+
+    def wait(self, version, timeout):
+        """Block until `version` is outdated or `timeout` passes; returns the current version."""
+        self._ensure()
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'warms': self.warms,
+            'daily_buckets': len(self._daily),
+            'weekly_buckets': len(self._weekly),
+            'events': len(self._events),
+            'ttl': self.ttl,
+            'cross_process': self.signal is not None,
+        }
@@ -0,0 +1,181 @@
+"""Read/write splitting across a primary and any number of read replicas.
+
+Routes opt in to replica reads with @replica_reads; everything else, and
+every non-GET request, uses the primary. After a user writes, the session is
+pinned to the primary for a few seconds so their next page shows what they
+just saved (read-your-writes).
+
+Replica health is checked lazily: at most once per check_interval a request
+that wants a replica measures its lag first. A replica that lags more than
+max_lag, has replication stopped, or cannot be reached is ejected for
+`cooldown` seconds and its traffic falls back to the others, then to the
+primary. A server that reports no replication status at all (a second,
+independent instance standing in for a replica locally) counts as lag 0.
+"""
+import itertools
+import threading
+import time
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_SESSION_KEY = '_primary_until'
+
+
+def replica_reads(view):
+    """Mark a view whose queries are all reads and may run on a replica."""
+    view.replica_ok = True
+    return view
+
+
+def replication_lag(conn):
+    """Seconds the server behind `conn` trails its source.
+
+    0 when it is not a replica at all, None when replication is stopped.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except Exception:
+            # MariaDB and MySQL before 8.0.22 only know the old spelling.
+            cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if not row:
+        return 0
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = 0.0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.last_error = None
+        self._checking = threading.Lock()
+
+    def healthy(self, now):
+        return now >= self.ejected_until
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            'name': self.name,
+            'healthy': self.healthy(now),
+            'lag': self.lag,
+            'ejections': self.ejections,
+            'ejected_for': max(0.0, round(self.ejected_until - now, 1)),
+            'last_error': self.last_error,
+            'pool': self.pool.stats(),
+        }
+
+
+class ReplicaSet:
+    """Round-robin over the healthy replicas.
+
+    replicas       -- [(name, ConnectionPool)]
+    max_lag        -- eject a replica trailing the primary by more seconds
+    check_interval -- seconds between lag checks of one replica
+    cooldown       -- seconds an ejected replica is left alone
+    lag_probe      -- callable(conn) -> lag seconds, 0 or None (see replication_lag)
+    """
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=5.0, cooldown=30.0,
+                 lag_probe=replication_lag, errors=(Exception,)):
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.cooldown = cooldown
+        self._probe = lag_probe
+        self._errors = errors
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def eject(self, replica, reason):
+        replica.ejected_until = time.monotonic() + self.cooldown
+        replica.ejections += 1
+        replica.last_error = reason
+
+    def _check(self, replica):
+        """Measure lag if it is due; only one thread checks a replica at a time."""
+        now = time.monotonic()
+        if now - replica.checked_at < self.check_interval or not replica._checking.acquire(False):
+            return replica.healthy(now)
+        try:
+            replica.checked_at = now
+            conn = replica.pool.acquire()
+            try:
+                lag = self._probe(conn)
+            finally:
+                conn.close()
+        except self._errors as e:
+            self.eject(replica, f"unreachable: {e}")
+            return False
+        finally:
+            replica._checking.release()
+        replica.lag = lag
+        if lag is None:
+            self.eject(replica, "replication stopped")
+            return False
+        if lag > self.max_lag:
+            self.eject(replica, f"lag {lag:.0f}s > {self.max_lag:.0f}s")
+            return False
+        return True
+
+    def acquire(self):
+        """Borrow a connection from the next healthy replica.
+
+        Returns (replica, connection), or (None, None) when none is usable.
+        """
+        if not self.replicas:
+            return None, None
+        with self._lock:
+            order = [next(self._next) for _ in self.replicas]
+        for index in order:
+            replica = self.replicas[index]
+            if not replica.healthy(time.monotonic()) or not self._check(replica):
+                continue
+            try:
+                return replica, replica.pool.acquire()
+            except self._errors as e:
+                self.eject(replica, f"unreachable: {e}")
+        self.fallbacks += 1
+        return None, None
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'replicas': [r.stats(now) for r in self.replicas],
+            'fallbacks': self.fallbacks,
+            'max_lag': self.max_lag,
+            'cooldown': self.cooldown,
+        }
+
+
+def pinned_to_primary(session, now=None):
+    return session.get(PIN_SESSION_KEY, 0) > (time.time() if now is None else now)
+
+
+def pin_to_primary(session, seconds):
+    session[PIN_SESSION_KEY] = time.time() + seconds
+
+
+def parse_hosts(value, default_port=3306):
+    """'db2:3307, db3' -> [('db2', 3307), ('db3', 3306)]"""
+    hosts = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', '')
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
@@ -0,0 +1,198 @@
+"""In-process prefix index over students for typeahead search.
+
+Every student is broken into lowercase tokens: the student id (whole and
+split on punctuation), each name part, the whole e-mail and its local-part
+words, and the phone number's digits. The tokens are kept in one sorted list
+with a posting set of student ids per token. A prefix query is then a
+bisect into that list followed by a short forward scan.
+
+A query's terms must all match (AND) as a prefix of some token of the same
+student. The most selective term drives the scan and the others filter its
+candidates, so work stops after `limit` hits.
+Results come out in token order. An exact token match sorts ahead of longer
+tokens sharing the prefix, so "ann" lists Ann before Anne and Annabel.
+
+Student add/edit/delete keep the index current with upsert()/remove().
+With several worker processes, pass a FileSignal: a write in one process
+makes the others rebuild from the database on their next search.
+"""
+import bisect
+import re
+import threading
+import time
+
+RESULT_FIELDS = ('id', 'student_id', 'first_name', 'last_name', 'email', 'phone', 'program', 'semester')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+_MAX_CHAR = chr(0x10FFFF)
+
+_WORD_RE = re.compile(r'[0-9a-z]+')
+_PHONE_PUNCTUATION_RE = re.compile(r'[\s()+.-]')
+
+
+def tokens_for(row):
+    tokens = set()
+    for field in ('student_id', 'first_name', 'last_name'):
+        value = (row.get(field) or '').lower()
+        tokens.update(_WORD_RE.findall(value))
+        if value:
+            tokens.add(value)
+    email = (row.get('email') or '').lower()
+    if email:
+        tokens.add(email)
+        tokens.update(_WORD_RE.findall(email.partition('@')[0]))
+    phone = ''.join(ch for ch in row.get('phone') or '' if ch.isdigit())
+    if phone:
+        tokens.add(phone)
+    return tokens
+
+
+def query_terms(query):
+    """Lowercase whitespace-separated terms; phone-looking terms lose punctuation."""
+    terms = []
+    for term in (query or '').lower().split():
+        digits = _PHONE_PUNCTUATION_RE.sub('', term)
+        terms.append(digits if digits.isdigit() else term)
+    return terms
+
+
+class StudentIndex:
+    """Prefix index over the students table.
+
+    loader -- zero-argument callable returning every student as a dict with
+              at least RESULT_FIELDS
+    signal -- optional catalog.FileSignal shared with the other worker processes
+    """
+
+    def __init__(self, loader, signal=None):
+        self._loader = loader
+        self.signal = signal
+        self._tokens = None        # sorted unique tokens
+        self._postings = {}        # token -> {student pk}
+        self._docs = {}            # student pk -> (result dict, frozenset of tokens)
+        self._signal_token = None
+        self._lock = threading.RLock()
+        self.built_at = None
+        self.build_seconds = None
+        self.searches = 0
+        self.updates = 0
+
+    def _stale(self):
+        if self._tokens is None:
+            return True
+        return self.signal is not None and self.signal.token() != self._signal_token
+
+    def _ensure(self):
+        if self._stale():
+            self._build()
+
+    def _build(self):
+        started = time.perf_counter()
+        # Read the token before loading so a bump during the load is not lost.
+        token = self.signal.token() if self.signal is not None else None
+        docs, postings = {}, {}
+        for row in self._loader():
+            result = {field: row.get(field) for field in RESULT_FIELDS}
+            tokens = frozenset(tokens_for(result))
+            docs[result['id']] = (result, tokens)
+            for t in tokens:
+                postings.setdefault(t, set()).add(result['id'])
+        self._docs, self._postings = docs, postings
+        self._tokens = sorted(postings)
+        self._signal_token = token
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    def _add(self, student_pk, result):
+        tokens = frozenset(tokens_for(result))
+        self._docs[student_pk] = (result, tokens)
+        for t in tokens:
+            ids = self._postings.get(t)
+            if ids is None:
+                self._postings[t] = {student_pk}
+                bisect.insort(self._tokens, t)
+            else:
+                ids.add(student_pk)
+
+    def _discard(self, student_pk):
+        doc = self._docs.pop(student_pk, None)
+        if doc is None:
+            return
+        for t in doc[1]:
+            ids = self._postings[t]
+            ids.discard(student_pk)
+            if not ids:
+                del self._postings[t]
+                del self._tokens[bisect.bisect_left(self._tokens, t)]
+
+    def _range(self, term):
+        tokens = self._tokens
+        return bisect.bisect_left(tokens, term), bisect.bisect_left(tokens, term + _MAX_CHAR)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Up to `limit` result dicts whose tokens match every term of `query`."""
+        terms = list(dict.fromkeys(query_terms(query)))
+        if not terms:
+            return []
+        results, seen = [], set()
+        with self._lock:
+            self._ensure()
+            self.searches += 1
+            # The term spanning the fewest tokens drives the scan; the others
+            # are checked against each candidate's own handful of tokens.
+            ranges = {term: self._range(term) for term in terms}
+            driver = min(terms, key=lambda term: (ranges[term][1] - ranges[term][0], -len(term)))
+            rest = [term for term in terms if term != driver]
+            lo, hi = ranges[driver]
+            for i in range(lo, hi):
+                for student_pk in self._postings[self._tokens[i]]:
+                    if student_pk in seen:
+                        continue
+                    seen.add(student_pk)
+                    result, doc_tokens = self._docs[student_pk]
+                    if all(any(t.startswith(term) for t in doc_tokens) for term in rest):
+                        results.append(result)
+                        if len(results) >= limit:
+                            return results
+        return results
+
+    def upsert(self, row):
+        """Index a new or edited student (a dict with RESULT_FIELDS)."""
+        result = {field: row.get(field) for field in RESULT_FIELDS}
+        with self._lock:
+            self._ensure()
+            self._discard(result['id'])
+            self._add(result['id'], result)
+            self.updates += 1
+            self._bump()
+
+    def remove(self, *student_pks):
+        with self._lock:
+            self._ensure()
+            for student_pk in student_pks:
+                self._discard(student_pk)
+            self.updates += 1
+            self._bump()
+
+    def invalidate(self):
+        """Rebuild from the loader on the next search (bulk writes)."""
+        with self._lock:
+            self._tokens = None
+            self._postings, self._docs = {}, {}
+        if self.signal is not None:
+            self.signal.bump()
+
+    def _bump(self):
+        if self.signal is not None:
+            self._signal_token = self.signal.bump(self._signal_token)
+
+    def stats(self):
+        return {
+            'built': self._tokens is not None,
+            'students': len(self._docs),
+            'tokens': len(self._tokens or ()),
+            'build_seconds': round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            'searches': self.searches,
+            'updates': self.updates,
+            'cross_process': self.signal is not None,
+        }
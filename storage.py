@@ -0,0 +1,447 @@
+"""Storage backends under the connection pool: MySQL and embedded SQLite.
+
+Routes and the helper modules are written against mysql.connector's
+interface (%s placeholders, cursor(dictionary=True), ON DUPLICATE KEY
+UPDATE, SELECT ... FOR UPDATE). MySQLBackend hands out real mysql.connector
+connections. SQLiteBackend hands out an adapter that speaks the same
+interface over sqlite3: statements are translated once and the result is
+cached, sqlite3's own per-connection statement cache keeps them prepared,
+and each connection runs in WAL mode so readers never block the writer.
+
+The SQLite schema is generated from student_management.sql, and sync_schema()
+brings an existing SQLite file up to date with it (new tables, columns and
+indexes), which stands in for the MySQL-only migrations in migrations/.
+"""
+import functools
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+try:
+    import mysql.connector
+except ImportError:  # SQLite-only installs
+    mysql = None
+
+import migrate
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'student_management.sql')
+
+
+class StorageError(Exception):
+    """Raised by the app itself for storage failures (e.g. no connection)."""
+
+
+#: Every driver error a route may see; use in `except Error` (it is a tuple, so
+#: extend it as `except Error + (OtherError,)` rather than nesting it).
+Error = (StorageError, sqlite3.Error) + ((mysql.connector.Error,) if mysql is not None else ())
+
+
+# -------------------- MySQL --------------------
+
+class MySQLBackend:
+    name = 'mysql'
+    supports_replicas = True
+
+    def __init__(self, host, port, user, password, database):
+        if mysql is None:
+            raise StorageError("the MySQL backend needs mysql-connector-python "
+                               "(pip install mysql-connector-python)")
+        self.host, self.port = host, port
+        self.user, self.password, self.database = user, password, database
+
+    def connect(self, host=None, port=None):
+        return mysql.connector.connect(
+            host=host or self.host,
+            port=port or self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=False,
+            # Routes share one connection across cursors per request, so results are
+            # read eagerly unless a caller asks for cursor(buffered=False).
+            buffered=True,
+        )
+
+    def upgrade(self, conn, target=None, echo=print):
+        return migrate.upgrade(conn, target, echo)
+
+    def reset(self, conn, sample_data=True):
+        """Drop every table and recreate the fresh-install schema."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SHOW TABLES")
+            tables = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in tables:
+                cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            for statement in schema_statements(sample_data):
+                cursor.execute(statement)
+            _mark_migrations_applied(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+# -------------------- SQLite --------------------
+
+MIN_SQLITE_VERSION = (3, 35, 0)  # target-less ON CONFLICT DO UPDATE
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # durable at checkpoints; safe with WAL
+    'foreign_keys': 'ON',        # ON DELETE CASCADE as in MySQL
+    'busy_timeout': 5000,        # ms a writer waits for the lock before erroring
+    'cache_size': -64000,        # KiB of page cache per connection
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+}
+STATEMENT_CACHE_SIZE = 256
+
+
+def _adapt_date(value):
+    return value.isoformat()
+
+
+def _adapt_datetime(value):
+    return value.isoformat(' ')
+
+
+def _convert_date(raw):
+    return date.fromisoformat(raw.decode()[:10])
+
+
+def _convert_datetime(raw):
+    return datetime.fromisoformat(raw.decode())
+
+
+# Columns declared DATE / DATETIME / TIMESTAMP come back as date / datetime,
+# matching what mysql.connector returns.
+sqlite3.register_adapter(date, _adapt_date)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+
+_PLACEHOLDER_RE = re.compile(r'%s')
+_INSERT_IGNORE_RE = re.compile(r'\bINSERT\s+IGNORE\b', re.I)
+_ON_DUPLICATE_RE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+_VALUES_FN_RE = re.compile(r'\bVALUES\s*\(\s*(\w+)\s*\)', re.I)
+_FOR_UPDATE_RE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.I)
+_INSERT_SELECT_RE = re.compile(r'^\s*INSERT\b[^;]*?\)\s*SELECT\b', re.I | re.S)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(sql):
+    """MySQL dialect -> SQLite for the statement shapes the app uses.
+
+    Returns (sql, locks): `locks` is True for SELECT ... FOR UPDATE, which the
+    cursor turns into BEGIN IMMEDIATE so the rows stay ours until commit.
+    """
+    sql = _PLACEHOLDER_RE.sub('?', sql.strip())
+    sql = _INSERT_IGNORE_RE.sub('INSERT OR IGNORE', sql)
+    match = _ON_DUPLICATE_RE.search(sql)
+    if match:
+        head, updates = sql[:match.start()].rstrip(), sql[match.end():]
+        if _INSERT_SELECT_RE.match(head) and not re.search(r'\bWHERE\b', head[head.upper().rfind('SELECT'):], re.I):
+            head += ' WHERE true'  # resolves the SELECT / ON CONFLICT parsing ambiguity
+        updates = _VALUES_FN_RE.sub(r'excluded.\1', updates).strip()
+        sql = f"{head} ON CONFLICT DO UPDATE SET {updates}"
+    locks = bool(_FOR_UPDATE_RE.search(sql))
+    if locks:
+        sql = _FOR_UPDATE_RE.sub('', sql)
+    return sql, locks
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over sqlite3."""
+
+    def __init__(self, connection, dictionary=False):
+        self._conn = connection
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _prepare(self, sql):
+        sql, locks = translate(sql)
+        if locks and not self._conn.raw.in_transaction:
+            self._cursor.execute("BEGIN IMMEDIATE")
+        return sql
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._prepare(sql), tuple(params or ()))
+        return None
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(self._prepare(sql), [tuple(p) for p in seq_params])
+        return None
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([d[0] for d in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        return [self._row(r) for r in rows] if self._dictionary else rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary or not rows:
+            return rows
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The part of mysql.connector's connection interface the app uses."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._closed = False
+
+    def cursor(self, dictionary=False, buffered=None, **_):
+        # sqlite3 cursors step lazily, so buffered=False costs nothing extra.
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        if self._closed:
+            return False
+        try:
+            self.raw.execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+        return True
+
+    def close(self):
+        self._closed = True
+        self.raw.close()
+
+
+def _sqlite3(conn):
+    """The sqlite3.Connection under a pooled / adapted connection."""
+    while not isinstance(conn, sqlite3.Connection):
+        conn = conn.raw
+    return conn
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    supports_replicas = False
+
+    def __init__(self, path, pragmas=None):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise StorageError(f"SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))}+ is required, "
+                               f"found {sqlite3.sqlite_version}")
+        self.path = path
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+
+    def connect(self, host=None, port=None):
+        raw = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            # The pool moves connections between threads, one user at a time.
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            timeout=self.pragmas['busy_timeout'] / 1000,
+        )
+        for name, value in self.pragmas.items():
+            raw.execute(f"PRAGMA {name} = {value}")
+        return SQLiteConnection(raw)
+
+    def upgrade(self, conn, target=None, echo=print):
+        """Create or update the schema in place; `target` does not apply."""
+        changes = sync_schema(_sqlite3(conn))
+        for change in changes:
+            echo(change)
+        return changes
+
+    def reset(self, conn, sample_data=True):
+        raw = _sqlite3(conn)
+        tables = [row[0] for row in raw.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        raw.execute("PRAGMA foreign_keys = OFF")
+        for table in tables:
+            raw.execute(f'DROP TABLE IF EXISTS "{table}"')
+        raw.execute("PRAGMA foreign_keys = ON")
+        raw.commit()
+        sync_schema(raw)
+        if sample_data:
+            for statement in schema_statements(sample_data=True):
+                if statement.upper().startswith('INSERT'):
+                    raw.execute(statement)
+            raw.commit()
+
+
+# -------------------- schema generation --------------------
+
+def schema_statements(sample_data=True, path=SCHEMA_FILE):
+    """student_management.sql minus the CREATE DATABASE / USE lines."""
+    with open(path, encoding='utf-8') as f:
+        statements = migrate.split_sql(f.read())
+    keep = []
+    for statement in statements:
+        head = statement.split(None, 2)[:2]
+        if head and head[0].upper() == 'USE' or [w.upper() for w in head] == ['CREATE', 'DATABASE']:
+            continue
+        if statement.upper().startswith('INSERT') and not sample_data:
+            continue
+        keep.append(statement)
+    return keep
+
+
+def _mark_migrations_applied(cursor):
+    migrate.ensure_version_table(cursor)
+    for migration in migrate.discover():
+        cursor.execute("INSERT IGNORE INTO schema_migrations (version, name) VALUES (%s, %s)",
+                       (migration.version, migration.name))
+
+
+def _split_top_level(body):
+    parts, depth, current = [], 0, []
+    for ch in body:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+
+_CREATE_TABLE_RE = re.compile(r'^CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)[^)]*$',
+                              re.I | re.S)
+_INDEX_RE = re.compile(r'^(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.*)\)$', re.I | re.S)
+_UNIQUE_KEY_RE = re.compile(r'^UNIQUE\s+(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)$', re.I)
+_ENUM_RE = re.compile(r'\bENUM\s*\(([^)]*)\)', re.I)
+_ON_UPDATE_RE = re.compile(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', re.I)
+_TABLE_NAME_RE = re.compile(r'^CREATE\s+TABLE\s+"?\w+"?\s*', re.I)
+
+
+def _sqlite_column(definition):
+    name, rest = definition.split(None, 1)
+    name = name.strip('`')
+    if re.search(r'\bAUTO_INCREMENT\b', rest, re.I):
+        return name, f"{name} INTEGER PRIMARY KEY AUTOINCREMENT", False
+    touch = bool(_ON_UPDATE_RE.search(rest))
+    rest = _ON_UPDATE_RE.sub('', rest)
+    rest = re.sub(r'\bUNSIGNED\b', '', rest, flags=re.I)
+    rest = re.sub(r'^(?:TINYINT|SMALLINT|MEDIUMINT|BIGINT|INT)\b', 'INTEGER', rest, flags=re.I)
+    rest = _ENUM_RE.sub(lambda m: f"TEXT CHECK ({name} IN ({m.group(1)}))", rest)
+    return name, f"{name} {' '.join(rest.split())}", touch
+
+
+def sqlite_tables(statements=None):
+    """{table: (create_sql, [column names], [index sql], [trigger sql])} from the MySQL DDL."""
+    statements = schema_statements(sample_data=False) if statements is None else statements
+    tables = {}
+    for statement in statements:
+        match = _CREATE_TABLE_RE.match(statement)
+        if not match:
+            continue
+        table, body = match.groups()
+        items, columns, indexes, triggers = [], [], [], []
+        for part in _split_top_level(body):
+            index = _INDEX_RE.match(part)
+            word = part.split(None, 1)[0].upper()
+            if index:
+                unique, name, cols = index.groups()
+                kind = 'UNIQUE INDEX' if unique else 'INDEX'
+                indexes.append(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({cols})")
+            elif word in ('PRIMARY', 'FOREIGN', 'CONSTRAINT', 'CHECK') or part.upper().startswith('UNIQUE ('):
+                items.append(' '.join(part.split()))
+            else:
+                column, definition, touch = _sqlite_column(part)
+                columns.append(column)
+                items.append(definition)
+                if touch:
+                    # MySQL's ON UPDATE CURRENT_TIMESTAMP, unless the UPDATE set it itself.
+                    triggers.append(
+                        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{column}_touch AFTER UPDATE ON {table} "
+                        f"FOR EACH ROW WHEN NEW.{column} IS OLD.{column} BEGIN "
+                        f"UPDATE {table} SET {column} = CURRENT_TIMESTAMP WHERE rowid = NEW.rowid; END")
+        create = f"CREATE TABLE {table} (\n    " + ",\n    ".join(items) + "\n)"
+        tables[table] = (create, columns, indexes, triggers)
+    return tables
+
+
+def sync_schema(raw):
+    """Create missing tables, rebuild tables whose columns changed, add
+    missing indexes and triggers. Returns a list of what was done."""
+    wanted = sqlite_tables()
+    existing = {name: sql for name, sql in raw.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table'")}
+    changes = []
+    raw.execute("PRAGMA foreign_keys = OFF")
+    try:
+        raw.execute("BEGIN IMMEDIATE")
+        try:
+            for table, (create, columns, indexes, triggers) in wanted.items():
+                if table not in existing:
+                    raw.execute(create)
+                    changes.append(f"created {table}")
+                elif _TABLE_NAME_RE.sub('', existing[table]) != _TABLE_NAME_RE.sub('', create):
+                    current = [row[1] for row in raw.execute(f'PRAGMA table_info("{table}")')]
+                    common = ', '.join(c for c in columns if c in current)
+                    # SQLite's ALTER TABLE is limited; rebuild and copy instead.
+                    raw.execute(create.replace(f"CREATE TABLE {table} ", f"CREATE TABLE {table}__new ", 1))
+                    raw.execute(f"INSERT INTO {table}__new ({common}) SELECT {common} FROM {table}")
+                    raw.execute(f"DROP TABLE {table}")
+                    raw.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+                    changes.append(f"rebuilt {table}")
+                for statement in indexes + triggers:
+                    raw.execute(statement)
+            problems = raw.execute("PRAGMA foreign_key_check").fetchall()
+            if problems:
+                raise StorageError(f"schema sync left {len(problems)} dangling foreign keys")
+            raw.commit()
+        except BaseException:
+            raw.rollback()
+            raise
+    finally:
+        raw.execute("PRAGMA foreign_keys = ON")
+    return changes
+
+
+# -------------------- factory --------------------
+
+def backend_from_config(config):
+    kind = (config.get('DB_BACKEND') or 'mysql').lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(config['SQLITE_PATH'])
+    if kind == 'mysql':
+        return MySQLBackend(config['DB_HOST'], config['DB_PORT'], config['DB_USER'],
+                            config['DB_PASSWORD'], config['DB_NAME'])
+    raise StorageError(f"unknown DB_BACKEND {kind!r}; expected mysql or sqlite")
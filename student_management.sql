@@ -1,5 +1,7 @@
 -- --------------------------------------------------------
 -- DATABASE: student_management
+-- Fresh-install schema, equivalent to every file in migrations/ applied.
+-- Existing databases: run `flask db upgrade` instead.
 -- --------------------------------------------------------
 CREATE DATABASE IF NOT EXISTS student_management;
 USE student_management;
@@ -17,7 +19,14 @@ CREATE TABLE students (
     address VARCHAR(255),
     program VARCHAR(100),
     semester VARCHAR(20),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_students_program_semester (program, semester),
+    INDEX idx_students_last_name (last_name),
+    INDEX idx_students_program_sort ((COALESCE(program, '')), id),
+    INDEX idx_students_semester_sort ((COALESCE(semester, '')), id),
+    INDEX idx_students_created_at (created_at),
+    INDEX idx_students_updated_at (updated_at)
 );
 
 -- --------------------------------------------------------
@@ -28,7 +37,9 @@ CREATE TABLE subjects (
     code VARCHAR(20) NOT NULL UNIQUE,
     name VARCHAR(150) NOT NULL,
     credits INT DEFAULT 3,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_subjects_updated_at (updated_at)
 );
 
 -- --------------------------------------------------------
@@ -39,6 +50,10 @@ CREATE TABLE enrollments (
     student_id INT NOT NULL,
     subject_id INT NOT NULL,
     enrollment_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_enrollments_student_subject (student_id, subject_id),
+    INDEX idx_enrollments_subject_student (subject_id, student_id),
+    INDEX idx_enrollments_updated_at (updated_at),
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
 );
@@ -50,9 +65,30 @@ CREATE TABLE marks (
     id INT AUTO_INCREMENT PRIMARY KEY,
     student_id INT NOT NULL,
     subject_id INT NOT NULL,
-    marks_obtained FLOAT DEFAULT 0,
-    total_marks FLOAT DEFAULT 100,
+    marks FLOAT DEFAULT 0,
+    max_marks FLOAT DEFAULT 100,
     exam_date DATE,
+    version INT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_marks_student_subject_exam (student_id, subject_id, exam_date),
+    INDEX idx_marks_student_exam_date (student_id, exam_date),
+    INDEX idx_marks_subject_exam_date (subject_id, exam_date),
+    INDEX idx_marks_updated_at (updated_at),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- --------------------------------------------------------
+-- TABLE: mark_versions
+-- Version a marks cell had when it was cleared; a mark entered into the
+-- cell again continues from it, so a stale gradebook save still conflicts.
+-- --------------------------------------------------------
+CREATE TABLE mark_versions (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    exam_date DATE NOT NULL,
+    version INT NOT NULL,
+    PRIMARY KEY (student_id, subject_id, exam_date),
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
 );
@@ -66,10 +102,130 @@ CREATE TABLE attendance (
     subject_id INT NOT NULL,
     date DATE NOT NULL,
     status ENUM('Present', 'Absent') DEFAULT 'Absent',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_attendance_student_subject_date (student_id, subject_id, date),
+    INDEX idx_attendance_subject_date (subject_id, date),
+    INDEX idx_attendance_student_date (student_id, date),
+    INDEX idx_attendance_date (date),
+    INDEX idx_attendance_updated_at (updated_at),
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
 );
 
+-- --------------------------------------------------------
+-- TABLE: attendance_summary
+-- Per-(student, subject) counts maintained by every attendance write;
+-- rebuild with `flask attendance-summary rebuild`.
+-- --------------------------------------------------------
+CREATE TABLE attendance_summary (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    present_count INT NOT NULL DEFAULT 0,
+    total_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, subject_id),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- --------------------------------------------------------
+-- TABLE: class_sessions
+-- Numbers each subject's classes within a term for the bitmap attendance
+-- store (ATTENDANCE_STORE=bitmap).
+-- --------------------------------------------------------
+CREATE TABLE class_sessions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    subject_id INT NOT NULL,
+    term VARCHAR(10) NOT NULL,
+    session_no INT NOT NULL,
+    date DATE NOT NULL,
+    UNIQUE KEY uq_class_sessions_subject_date (subject_id, date),
+    UNIQUE KEY uq_class_sessions_subject_term_no (subject_id, term, session_no),
+    INDEX idx_class_sessions_date (date),
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- --------------------------------------------------------
+-- TABLE: class_session_locks
+-- Numbering a subject's first class_sessions row of a term has no earlier
+-- row to lock; writers lock this (subject, term) row instead.
+-- --------------------------------------------------------
+CREATE TABLE class_session_locks (
+    subject_id INT NOT NULL,
+    term VARCHAR(10) NOT NULL,
+    PRIMARY KEY (subject_id, term),
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- --------------------------------------------------------
+-- TABLE: attendance_bitmaps
+-- One row per (student, subject, term); bit n of present / recorded is
+-- class_sessions.session_no n. Convert with `flask attendance-store convert`.
+-- --------------------------------------------------------
+CREATE TABLE attendance_bitmaps (
+    student_id INT NOT NULL,
+    subject_id INT NOT NULL,
+    term VARCHAR(10) NOT NULL,
+    present VARBINARY(512) NOT NULL,
+    recorded VARBINARY(512) NOT NULL,
+    PRIMARY KEY (student_id, subject_id, term),
+    INDEX idx_attendance_bitmaps_subject_term (subject_id, term),
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    FOREIGN KEY (subject_id) REFERENCES subjects(id) ON DELETE CASCADE
+);
+
+-- --------------------------------------------------------
+-- TABLE: archive_jobs
+-- One row per `flask archive start`; last_id is the keyset cursor a
+-- resumed job continues from.
+-- --------------------------------------------------------
+CREATE TABLE archive_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    program VARCHAR(100) NOT NULL,
+    semester VARCHAR(20),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    chunk_size INT NOT NULL,
+    last_id INT NOT NULL DEFAULT 0,
+    archived INT NOT NULL DEFAULT 0,
+    total INT NOT NULL DEFAULT 0,
+    error VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- --------------------------------------------------------
+-- TABLE: archived_students
+-- Students moved out by `flask archive`; payload is their profile and
+-- attendance history as zlib-compressed JSON (see archive.py).
+-- --------------------------------------------------------
+CREATE TABLE archived_students (
+    id INT PRIMARY KEY,
+    student_id VARCHAR(20) NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(150) NOT NULL,
+    program VARCHAR(100),
+    semester VARCHAR(20),
+    job_id INT,
+    archived_at DATETIME NOT NULL,
+    payload LONGBLOB NOT NULL,
+    INDEX idx_archived_students_student_id (student_id),
+    INDEX idx_archived_students_program_semester (program, semester),
+    FOREIGN KEY (job_id) REFERENCES archive_jobs(id) ON DELETE SET NULL
+);
+
+-- --------------------------------------------------------
+-- TABLE: deleted_rows
+-- Tombstones for rows deleted from the tables the v1 API syncs (including
+-- those removed by ON DELETE CASCADE), returned to `since` requests.
+-- --------------------------------------------------------
+CREATE TABLE deleted_rows (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    resource VARCHAR(32) NOT NULL,
+    row_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_rows_resource_deleted_at (resource, deleted_at)
+);
+
 -- --------------------------------------------------------
 -- SAMPLE DATA (Optional)
 -- --------------------------------------------------------
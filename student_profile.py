@@ -0,0 +1,203 @@
+"""Student profile aggregate and its HTTP cache validators.
+
+load_profile() fetches a student with their enrollments, marks and attendance
+summary in a single round trip, and StudentProfile is what both the HTML page
+and the JSON endpoint render.
+
+ChangeTracker hands out a per-student version that every write to that
+student's marks, attendance or enrollments bumps. view_student turns it into
+ETag / Last-Modified headers and answers repeat views with 304 before
+touching the database.
+"""
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+
+from attendance import percentage
+
+STUDENT_COLUMNS = ('id', 'student_id', 'first_name', 'last_name', 'email',
+                   'phone', 'address', 'program', 'semester')
+
+# Details are flattened into one shape (kind, row_id, subject_id, code, name,
+# n1, n2, at) so a UNION ALL can return them next to the student columns.
+# The student id is repeated inside every branch so each one is an index
+# lookup rather than a scan of the whole child table.
+PROFILE_SQL = f"""
+    SELECT {', '.join('s.' + c for c in STUDENT_COLUMNS)},
+           d.kind, d.row_id, d.subject_id, d.code, d.name, d.n1, d.n2, d.at
+    FROM students s
+    LEFT JOIN (
+        SELECT 'enrollment' AS kind, e.id AS row_id, sub.id AS subject_id, sub.code, sub.name,
+               sub.credits AS n1, NULL AS n2, e.enrollment_date AS at
+        FROM enrollments e JOIN subjects sub ON sub.id = e.subject_id
+        WHERE e.student_id = %s
+        UNION ALL
+        SELECT 'mark', m.id, m.subject_id, sub.code, sub.name, m.marks, m.max_marks, m.exam_date
+        FROM marks m LEFT JOIN subjects sub ON sub.id = m.subject_id
+        WHERE m.student_id = %s
+        UNION ALL
+        SELECT 'attendance', NULL, sm.subject_id, sub.code, sub.name,
+               sm.present_count, sm.total_count, NULL
+        FROM attendance_summary sm JOIN subjects sub ON sub.id = sm.subject_id
+        WHERE sm.student_id = %s
+    ) d ON 1 = 1
+    WHERE s.id = %s
+"""
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str) and len(value) >= 10:
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class StudentProfile:
+    def __init__(self, student, enrollments, marks, attendance_stats):
+        self.student = student
+        self.enrollments = enrollments
+        self.marks = marks
+        self.attendance_stats = attendance_stats
+
+    def template_context(self):
+        return {
+            'student': self.student,
+            'enrollments': self.enrollments,
+            'marks': self.marks,
+            'attendance_stats': self.attendance_stats,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a profile from as_dict() output (archived students)."""
+        enrollments = [
+            dict(e, enrollment_date=datetime.fromisoformat(e['enrollment_date'])
+                 if e['enrollment_date'] else None)
+            for e in data['enrollments']
+        ]
+        marks = [
+            dict(m, exam_date=_as_date(m['exam_date']),
+                 percentage=percentage(m['marks'] or 0, m['max_marks']))
+            for m in data['marks']
+        ]
+        attendance_stats = {
+            stat['subject_id']: {k: v for k, v in stat.items() if k != 'subject_id'}
+            for stat in data['attendance']
+        }
+        return cls(dict(data['student']), enrollments, marks, attendance_stats)
+
+    def as_dict(self):
+        def plain(value):
+            return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+        return {
+            'student': {k: plain(v) for k, v in self.student.items()},
+            'enrollments': [
+                {'id': e['id'], 'enrollment_date': plain(e['enrollment_date']), 'subject': e['subject']}
+                for e in self.enrollments
+            ],
+            'marks': [
+                {'id': m['id'], 'subject_id': m['subject_id'], 'subject': m['subject'],
+                 'marks': m['marks'], 'max_marks': m['max_marks'],
+                 'exam_date': plain(m['exam_date'])}
+                for m in self.marks
+            ],
+            'attendance': [
+                dict(stat, subject_id=subject_id) for subject_id, stat in self.attendance_stats.items()
+            ],
+        }
+
+
+def load_profile(cursor, student_id):
+    """StudentProfile for `student_id` from one query, or None if not found."""
+    cursor.execute(PROFILE_SQL, (student_id, student_id, student_id, student_id))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+
+    student = {c: rows[0][c] for c in STUDENT_COLUMNS}
+    enrollments, marks, attendance_stats = [], [], {}
+    for row in rows:
+        kind = row['kind']
+        if kind == 'enrollment':
+            enrollments.append({
+                'id': row['row_id'],
+                'enrollment_date': row['at'],
+                'subject': {'id': row['subject_id'], 'code': row['code'],
+                            'name': row['name'], 'credits': row['n1']},
+            })
+        elif kind == 'mark':
+            marks.append({
+                'id': row['row_id'],
+                'subject_id': row['subject_id'],
+                'subject': {'id': row['subject_id'], 'code': row['code'], 'name': row['name']},
+                'marks': row['n1'],
+                'max_marks': row['n2'],
+                'percentage': percentage(row['n1'] or 0, row['n2']),
+                'exam_date': _as_date(row['at']),
+            })
+        elif kind == 'attendance':
+            present, total = int(row['n1']), int(row['n2'])
+            attendance_stats[row['subject_id']] = {
+                'name': row['name'], 'code': row['code'], 'present': present,
+                'total': total, 'percentage': percentage(present, total),
+            }
+
+    enrollments.sort(key=lambda e: e['subject']['code'] or '')
+    marks.sort(key=lambda m: (m['exam_date'] is not None, m['exam_date'] or date.min), reverse=True)
+    attendance_stats = dict(sorted(attendance_stats.items(), key=lambda item: item[1]['code'] or ''))
+    return StudentProfile(student, enrollments, marks, attendance_stats)
+
+
+class ChangeTracker:
+    """Per-student change versions for conditional GETs.
+
+    Versions live in process memory. Pass a FileSignal shared by every
+    process that writes (workers and CLI commands alike): every bump also
+    touches it, and its token is folded into every ETag, so a write anywhere
+    invalidates the validators handed out by all of them.
+    """
+
+    def __init__(self, signal=None):
+        self.signal = signal
+        self._boot = uuid.uuid4().hex[:8]
+        self._started = time.time()
+        self._epoch = 0
+        self._epoch_at = self._started
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *student_ids):
+        now = time.time()
+        with self._lock:
+            for student_id in student_ids:
+                version, _ = self._versions.get(student_id, (0, None))
+                self._versions[student_id] = (version + 1, now)
+        if self.signal is not None and student_ids:
+            self.signal.bump()
+
+    def bump_all(self):
+        """For writes that touch many students or shared data (subjects, imports)."""
+        with self._lock:
+            self._epoch += 1
+            self._epoch_at = time.time()
+            self._versions.clear()
+        if self.signal is not None:
+            self.signal.bump()
+
+    def validators(self, student_id):
+        """(etag, last_modified datetime) for the student's current state."""
+        with self._lock:
+            version, changed_at = self._versions.get(student_id, (0, None))
+            epoch, epoch_at = self._epoch, self._epoch_at
+        last_modified = max(changed_at or self._started, epoch_at)
+        token = 0
+        if self.signal is not None:
+            token = self.signal.token()
+            last_modified = max(last_modified, token / 1e9)
+        etag = f"{self._boot}-{epoch}-{version}-{token:x}-{student_id}"
+        # Last-Modified only has one-second resolution; clients that send
+        # If-None-Match are judged on the ETag alone.
+        return etag, datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
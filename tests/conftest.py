@@ -0,0 +1,46 @@
+"""Route smoke tests run the app on the SQLite backend against a throwaway file."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_db_dir = tempfile.mkdtemp(prefix='student-management-tests-')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(_db_dir, 'test.db')
+os.environ['PROFILE_CHANGE_SIGNAL'] = os.path.join(_db_dir, 'profile-changes.signal')
+
+from app import app as flask_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True)
+    # Same as `flask db reset --yes`: fresh schema + sample data, caches dropped.
+    result = flask_app.test_cli_runner().invoke(args=['db', 'reset', '--yes'])
+    assert result.exit_code == 0, result.output
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query(app):
+    """query(sql, params) -> rows as dicts, on a connection outside any request."""
+    from app import get_db_connection
+
+    def run(sql, params=()):
+        with app.app_context():
+            cursor = get_db_connection(primary=True).cursor(dictionary=True)
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+    return run
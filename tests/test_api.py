@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+
+def add_students(app, count):
+    from app import get_db_connection
+    with app.app_context():
+        conn = get_db_connection(primary=True)
+        cursor = conn.cursor()
+        try:
+            for n in range(count):
+                cursor.execute("INSERT INTO students (student_id, first_name, last_name, email) "
+                               "VALUES (%s, 'Test', 'Student', %s)", (f"T{n:04d}", f"t{n}@example.com"))
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def test_ids_lookup_returns_every_id(app, client):
+    add_students(app, 200)
+    ids = [row['id'] for row in client.get('/api/v1/students?fields=id&limit=1000').json['data']]
+    body = client.get(f"/api/v1/students?ids={','.join(map(str, ids))}").json
+    assert body['count'] == len(ids) > 100
+    assert body['next'] is None
+
+
+def test_since_reports_deleted_rows(client, query):
+    client.post('/students/1/marks', data={'subject_id': 1, 'marks': 80, 'max_marks': 100,
+                                           'exam_date': '2026-01-05'})
+    mark_id = query("SELECT id FROM marks WHERE student_id = 1")[0]['id']
+    client.post(f"/marks/delete/{mark_id}")
+    client.post('/students/delete/2')
+
+    marks = client.get('/api/v1/marks?since=2000-01-01').json
+    assert mark_id in marks['deleted']
+    assert mark_id not in [row['id'] for row in marks['data']]
+    students = client.get('/api/v1/students?since=2000-01-01').json
+    assert students['deleted'] == [2]
+    assert client.get('/api/v1/students').json.get('deleted') is None
+
+
+def test_since_with_an_offset_is_converted_to_database_time(client):
+    client.post('/students/delete/2')
+    # SQLite's clock is UTC: an hour ago in UTC+05:30 is still an hour ago.
+    zone = timezone(timedelta(hours=5, minutes=30))
+    hour_ago = (datetime.now(zone) - timedelta(hours=1)).isoformat(timespec='seconds')
+    hour_ahead = (datetime.now(zone) + timedelta(hours=1)).isoformat(timespec='seconds')
+    assert client.get('/api/v1/students', query_string={'since': hour_ago}).json['deleted'] == [2]
+    assert client.get('/api/v1/students', query_string={'since': hour_ahead}).json['deleted'] == []
@@ -0,0 +1,26 @@
+from datetime import date
+
+import attendance_bitmap
+
+
+def test_sessions_are_numbered_per_subject_term_in_date_order(app):
+    from app import get_db_connection
+    with app.app_context():
+        conn = get_db_connection(primary=True)
+        cursor = conn.cursor()
+        try:
+            first = attendance_bitmap.session_numbers(
+                cursor, [(1, date(2026, 1, 7)), (1, date(2026, 1, 5)), (2, date(2026, 1, 5))])
+            conn.commit()
+            again = attendance_bitmap.session_numbers(
+                cursor, [(1, date(2026, 1, 5)), (1, date(2026, 1, 9)), (1, date(2026, 8, 3))])
+            conn.commit()
+            cursor.execute("SELECT subject_id, term FROM class_session_locks ORDER BY subject_id, term")
+            locks = cursor.fetchall()
+        finally:
+            cursor.close()
+    assert first == {(1, date(2026, 1, 5)): ('2026-1', 0), (1, date(2026, 1, 7)): ('2026-1', 1),
+                     (2, date(2026, 1, 5)): ('2026-1', 0)}
+    assert again == {(1, date(2026, 1, 5)): ('2026-1', 0), (1, date(2026, 1, 9)): ('2026-1', 2),
+                     (1, date(2026, 8, 3)): ('2026-2', 0)}
+    assert [tuple(row) for row in locks] == [(1, '2026-1'), (1, '2026-2'), (2, '2026-1')]
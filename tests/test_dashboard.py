@@ -0,0 +1,51 @@
+import json
+
+
+def read_event(chunks):
+    for chunk in chunks:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('id:'):
+            return json.loads(chunk.split('data: ', 1)[1])
+
+
+def test_stream_survives_a_reload(app, client, monkeypatch):
+    from app import dashboard
+    monkeypatch.setitem(app.config, 'DASHBOARD_HEARTBEAT_SECONDS', 0.05)
+    dashboard.invalidate()
+    response = client.get('/dashboard/stream', buffered=False)
+    chunks = iter(response.response)
+    try:
+        first = read_event(chunks)
+        dashboard.invalidate()
+        second = read_event(chunks)
+    finally:
+        response.close()
+    assert second['version'] > first['version']
+
+
+def test_writes_during_a_reload_neither_block_nor_get_lost():
+    import threading
+    from datetime import date
+
+    import rollups
+
+    today = date(2026, 3, 2)
+    loading, release = threading.Event(), threading.Event()
+
+    def loader(since):
+        if dashboard.warms:
+            loading.set()
+            release.wait(5)
+        return rollups.Warmup(attendance={today: (3, 4)})
+
+    dashboard = rollups.Rollups(loader, ttl=0, today=lambda: today)
+    dashboard.snapshot()
+    dashboard.invalidate()
+    reload = threading.Thread(target=dashboard.snapshot)
+    reload.start()
+    assert loading.wait(5)
+    dashboard.record_attendance({today: [1, 1]})     # returns while the loader is still blocked
+    release.set()
+    reload.join(5)
+    assert dashboard.snapshot()['attendance']['daily'][-1] == {
+        'date': today.isoformat(), 'present': 4, 'total': 5, 'rate': 80.0}
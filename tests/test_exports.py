@@ -0,0 +1,53 @@
+import exports
+from storage import StorageError
+
+
+class UnreadCursor:
+    """Unbuffered cursor that, like mysql.connector, refuses to close with rows left."""
+
+    description = [('id',)]
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.closed = False
+
+    def execute(self, sql, params):
+        pass
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+        if self.rows:
+            raise StorageError("Unread result found")
+
+
+class Connection:
+    def __init__(self, rows):
+        self.cursors = []
+        self.rows = rows
+        self.discarded = False
+
+    def cursor(self, buffered=True):
+        self.cursors.append(UnreadCursor(self.rows))
+        return self.cursors[-1]
+
+    def discard(self):
+        self.discarded = True
+
+
+def test_abandoned_stream_discards_its_connection():
+    conn = Connection([(n,) for n in range(10)])
+    rows = exports.stream_rows(conn, "SELECT id FROM t", [], fetch_size=3)
+    assert next(rows) == ['id']
+    assert next(rows) == (0,)
+    rows.close()
+    assert conn.cursors[0].closed and conn.discarded
+
+
+def test_finished_stream_keeps_its_connection():
+    conn = Connection([(n,) for n in range(10)])
+    assert len(list(exports.stream_rows(conn, "SELECT id FROM t", [], fetch_size=3))) == 11
+    assert conn.cursors[0].closed and not conn.discarded
@@ -0,0 +1,33 @@
+def enroll(app, student_id, subject_id):
+    from app import get_db_connection
+    with app.app_context():
+        conn = get_db_connection(primary=True)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT INTO enrollments (student_id, subject_id, enrollment_date) "
+                           "VALUES (%s, %s, '2026-01-01')", (student_id, subject_id))
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def test_stale_save_after_clear_and_readd_conflicts(app, client, query):
+    enroll(app, 1, 1)
+    url = '/api/gradebook?subject_id=1&exam_date=2026-01-05'
+
+    def save(marks, version):
+        return client.post('/api/gradebook', json={'subject_id': 1, 'exam_date': '2026-01-05', 'records': [
+            {'student_id': 1, 'marks': marks, 'version': version}]})
+
+    def version():
+        return next(row['version'] for row in client.get(url).json['students'] if row['id'] == 1)
+
+    assert save(70, 0).status_code == 200
+    stale = version()
+    assert save('', stale).status_code == 200
+    assert save(80, version()).status_code == 200
+
+    response = save(90, stale)
+    assert response.status_code == 409
+    assert response.json['conflicts']
+    assert query("SELECT marks FROM marks WHERE student_id = 1 AND subject_id = 1")[0]['marks'] == 80
@@ -0,0 +1,79 @@
+import io
+
+import importer
+from storage import Error
+
+HEADER = "student_id,first_name,last_name,email\n"
+
+
+def run_import(app, kind, text, batch_size=importer.BATCH_SIZE):
+    from app import get_db_connection
+    with app.app_context():
+        return importer.import_csv(get_db_connection(primary=True), kind, io.StringIO(text),
+                                   batch_size=batch_size, error_types=Error)
+
+
+def test_students_upsert_on_student_id(app, query):
+    report = run_import(app, 'students', HEADER + "S001,Krishna,Pednekar,krish@example.com\n")
+    assert (report.imported, report.failed) == (1, 0)
+    assert query("SELECT first_name FROM students WHERE student_id = 'S001'") == [{'first_name': 'Krishna'}]
+
+
+def test_email_of_another_student_is_rejected(app, query):
+    report = run_import(app, 'students', HEADER + "S999,Evil,Person,krish@example.com\n")
+    assert (report.imported, report.failed) == (0, 1)
+    assert "belongs to student 'S001'" in report.errors[0][1]
+    assert query("SELECT student_id, first_name FROM students WHERE id = 1") == [
+        {'student_id': 'S001', 'first_name': 'Krish'}]
+    assert query("SELECT id FROM students WHERE student_id = 'S999'") == []
+
+
+def test_email_in_other_case_never_overwrites(app, query):
+    # MySQL's unique index ignores case (the row is rejected); SQLite's does not
+    # (it is a different email). Either way S001 must keep its record.
+    run_import(app, 'students', HEADER + "S999,Evil,Person,KRISH@example.com\n")
+    assert query("SELECT student_id, first_name FROM students WHERE id = 1") == [
+        {'student_id': 'S001', 'first_name': 'Krish'}]
+
+
+def test_email_claimed_twice_in_one_file(app, query):
+    report = run_import(app, 'students', HEADER +
+                        "S100,First,Claim,new@example.com\n"
+                        "S101,Second,Claim,new@example.com\n", batch_size=1)
+    assert (report.imported, report.failed) == (1, 1)
+    assert query("SELECT student_id FROM students WHERE email = 'new@example.com'") == [{'student_id': 'S100'}]
+
+
+def test_cli_import_drops_the_web_caches(app, tmp_path):
+    from app import subject_catalog
+    with app.app_context():
+        assert 'NEW101' not in {s['code'] for s in subject_catalog.get()}
+    path = tmp_path / 'subjects.csv'
+    path.write_text("code,name,credits\nNEW101,New Subject,3\n")
+    result = app.test_cli_runner().invoke(args=['import-csv', 'subjects', str(path)])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert 'NEW101' in {s['code'] for s in subject_catalog.get()}
+
+
+def test_failed_attendance_row_leaves_the_summary_in_step(app, query, monkeypatch):
+    import sqlite3
+
+    import attendance
+    apply_deltas = attendance._apply_summary_deltas
+
+    def fail_for_s002(cursor, deltas):
+        # The attendance row is already written when the summary update fails.
+        if any(student_pk == 2 for student_pk, _ in deltas):
+            raise sqlite3.IntegrityError("summary update failed")
+        apply_deltas(cursor, deltas)
+
+    monkeypatch.setattr(attendance, '_apply_summary_deltas', fail_for_s002)
+    report = run_import(app, 'attendance', "student_id,subject_code,date,status\n"
+                                           "S001,CS101,2026-01-05,Present\n"
+                                           "S002,CS101,2026-01-05,Present\n"
+                                           "S001,CS101,2026-01-06,Absent\n")
+    assert (report.imported, report.failed) == (2, 1)
+    assert query("SELECT student_id FROM attendance") == [{'student_id': 1}, {'student_id': 1}]
+    assert query("SELECT student_id, present_count, total_count FROM attendance_summary") == [
+        {'student_id': 1, 'present_count': 1, 'total_count': 2}]
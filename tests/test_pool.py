@@ -0,0 +1,53 @@
+import pytest
+
+from db import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_rejects_negative_min_size():
+    with pytest.raises(ValueError):
+        ConnectionPool(FakeConnection, min_size=-1, max_size=2)
+
+
+def test_dead_idle_connection_is_replaced_without_holding_the_lock():
+    pool = None
+    held = []
+
+    def ping(raw):
+        # acquire(blocking=False) fails if the pool lock is held by this thread.
+        locked = pool._lock.acquire(blocking=False)
+        if locked:
+            pool._lock.release()
+        held.append(not locked)
+        return raw.alive
+
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=1, ping=ping)
+    dead = pool._idle[0].raw
+    dead.alive = False
+    conn = pool.acquire()
+    assert conn.raw is not dead and dead.closed
+    assert held == [False]
+    assert pool.stats()['size'] == 1
+    conn.close()
+    assert pool.acquire() is conn
+
+
+def test_discarded_connection_is_closed_not_pooled():
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=1)
+    conn = pool.acquire()
+    conn.discard()
+    conn.close()
+    assert conn.raw.closed
+    assert pool.stats()['size'] == 0
+    assert pool.acquire() is not conn
@@ -0,0 +1,30 @@
+import metrics
+import migrate
+
+
+def test_records_each_select_shape_once(tmp_path):
+    log = metrics.QueryLog(str(tmp_path / 'queries.jsonl'))
+    log.record("SELECT * FROM students WHERE id = %s", (1,), 'view_student')
+    log.record("SELECT * FROM students  WHERE id = %s", (2,), 'view_student')
+    log.record("SELECT * FROM students WHERE id = %s", (3,), 'edit_student')
+    log.record("UPDATE students SET phone = %s WHERE id = %s", ('1', 1), 'edit_student')
+    assert metrics.load_query_log(log.path) == [
+        ('view_student', "SELECT * FROM students WHERE id = %s", (1,)),
+        ('edit_student', "SELECT * FROM students WHERE id = %s", (3,)),
+    ]
+
+
+def test_merge_keeps_registered_route_names():
+    registered = [('student_index', "SELECT id FROM students", ())]
+    recorded = [('api_student_search', "SELECT id  FROM students", ()),
+                ('list_students', "SELECT id FROM students WHERE program = %s", ('BCA',))]
+    assert migrate.merge_queries(registered, recorded) == registered + recorded[1:]
+
+
+def test_routes_are_recorded(app, client, tmp_path, monkeypatch):
+    import app as app_module
+    log = metrics.QueryLog(str(tmp_path / 'queries.jsonl'))
+    monkeypatch.setattr(app_module, 'query_log', log)
+    assert client.get('/students/1').status_code == 200
+    routes = {route for route, _, _ in metrics.load_query_log(log.path)}
+    assert 'view_student' in routes
@@ -0,0 +1,134 @@
+import datetime
+
+import pytest
+
+# These routes render templates that have never been in templates/ (the marks
+# pages exist as students/marks.html and students/edit_mark.html).
+MISSING_TEMPLATE = pytest.mark.xfail(strict=True, reason="route renders a template that does not exist")
+
+READ_ONLY_PAGES = [
+    '/',
+    '/students',
+    '/students?sort=name&dir=desc',
+    '/students?program=B.Tech+Computer+Engg&semester=5',
+    '/students/1',
+    '/students/1/report',
+    pytest.param('/students/1/marks', marks=MISSING_TEMPLATE),
+    '/students/1/attendance',
+    '/students/1/enroll',
+    '/students/edit/1',
+    '/students/add',
+    '/subjects',
+    '/subjects/add',
+    '/subjects/edit/1',
+    '/gradebook',
+    '/gradebook?subject_id=1&exam_date=2026-01-05',
+    '/attendance/rollcall',
+    '/reports',
+    pytest.param('/reports/students', marks=MISSING_TEMPLATE),
+    pytest.param('/reports/subjects', marks=MISSING_TEMPLATE),
+    '/reports/attendance',
+    '/reports/grades',
+    '/import',
+    '/health/db',
+    '/health/cache',
+    '/metrics',
+]
+
+JSON_ENDPOINTS = [
+    '/api/students/search?q=kri',
+    '/api/students/1/profile',
+    '/api/dashboard',
+    '/api/gradebook?subject_id=1&exam_date=2026-01-05',
+    '/api/v1/',
+    '/api/v1/students?fields=student_id,email',
+    '/api/v1/marks?since=2000-01-01',
+]
+
+
+@pytest.mark.parametrize('path', READ_ONLY_PAGES)
+def test_page_renders(client, path):
+    assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize('path', JSON_ENDPOINTS)
+def test_json_endpoint(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.is_json
+
+
+@pytest.mark.parametrize('dataset', ['students', 'subjects', 'marks', 'attendance'])
+def test_export(client, dataset):
+    response = client.get(f'/reports/export/{dataset}.csv')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).splitlines()
+
+
+def test_add_edit_delete_student(client, query):
+    response = client.post('/students/add', data={
+        'student_id': 'S100', 'first_name': 'Test', 'last_name': 'Student',
+        'email': 'test@example.com', 'phone': '', 'address': '',
+        'program': 'BSc', 'semester': '1',
+    })
+    assert response.status_code == 302
+    (student,) = query("SELECT id FROM students WHERE student_id = %s", ('S100',))
+    assert client.get('/api/students/search?q=test').json['results'][0]['id'] == student['id']
+
+    client.post(f"/students/edit/{student['id']}", data={
+        'student_id': 'S100', 'first_name': 'Renamed', 'last_name': 'Student',
+        'email': 'test@example.com', 'phone': '', 'address': '',
+        'program': 'BSc', 'semester': '1',
+    })
+    assert query("SELECT first_name FROM students WHERE id = %s", (student['id'],))[0]['first_name'] == 'Renamed'
+
+    client.post(f"/students/delete/{student['id']}")
+    assert query("SELECT id FROM students WHERE id = %s", (student['id'],)) == []
+
+
+def test_enroll_mark_and_attendance(client, query):
+    client.post('/students/1/enroll', data={'subject': 1})
+    client.post('/students/1/marks', data={'subject_id': 1, 'marks': 80, 'max_marks': 100,
+                                           'exam_date': '2026-01-05'})
+    client.post('/students/1/attendance', data={'subject': 1, 'date': '2026-01-05', 'status': 'Present'})
+
+    assert query("SELECT marks FROM marks WHERE student_id = 1")[0]['marks'] == 80
+    assert query("SELECT present_count, total_count FROM attendance_summary WHERE student_id = 1") == [
+        {'present_count': 1, 'total_count': 1}]
+    profile = client.get('/api/students/1/profile').json
+    assert [m['marks'] for m in profile['marks']] == [80]
+
+
+def test_roll_call_api(client, query):
+    client.post('/students/1/enroll', data={'subject': 1})
+    client.post('/students/2/enroll', data={'subject': 1})
+    today = datetime.date.today().isoformat()
+    response = client.post('/api/attendance/rollcall', json={
+        'subject_id': 1, 'date': today,
+        'records': [{'student_id': 1, 'status': 'Present'}, {'student_id': 2, 'status': 'Absent'}],
+    })
+    assert response.json['written'] == 2
+    assert len(query("SELECT id FROM attendance WHERE subject_id = 1")) == 2
+
+
+def test_roll_call_form_rejects_bad_field(client, query):
+    response = client.post('/attendance/rollcall', data={
+        'subject_id': 1, 'date': '2026-01-05', 'status_x': 'Present'}, follow_redirects=True)
+    assert response.status_code == 200
+    assert b'invalid student id' in response.data
+    assert query("SELECT id FROM attendance WHERE subject_id = 1") == []
+
+
+def test_unknown_student_redirects(client):
+    assert client.get('/students/9999').status_code == 302
+    assert client.get('/api/students/9999/profile').status_code == 404
+
+
+def test_profile_etag_changes_after_a_write_from_another_process(app, client):
+    from app import FileSignal
+    from student_profile import ChangeTracker
+    etag = client.get('/students/1').headers['ETag']
+    assert client.get('/students/1', headers={'If-None-Match': etag}).status_code == 304
+    # What a `flask import-csv` process does to its own tracker.
+    ChangeTracker(signal=FileSignal(app.config['PROFILE_CHANGE_SIGNAL'])).bump_all()
+    assert client.get('/students/1', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,62 @@
+from catalog import FileSignal
+from grading import GradeCache
+from rollups import Rollups, Warmup
+from search import StudentIndex
+
+
+def test_own_bump_does_not_hide_another_process_bump(tmp_path):
+    path = str(tmp_path / 'grades.signal')
+    loads = []
+
+    def loader(program, semester):
+        loads.append((program, semester))
+        return set()
+
+    ours = GradeCache(loader, signal=FileSignal(path))
+    theirs = GradeCache(loader, signal=FileSignal(path))
+    ours.get('BSc', 1)
+    theirs.invalidate_all()
+    ours.invalidate(42)
+    ours.get('BSc', 1)
+    assert len(loads) == 2
+
+
+class RacingSignal(FileSignal):
+    """Lets another process bump right before each of ours."""
+
+    def bump(self, seen=None):
+        FileSignal(self.path).bump()
+        return super().bump(seen)
+
+
+def test_index_rebuilds_after_another_process_bump_despite_its_own(tmp_path):
+    students = [{'id': 1, 'first_name': 'Asha', 'last_name': 'Rao'}]
+    index = StudentIndex(lambda: list(students), signal=RacingSignal(str(tmp_path / 'index.signal')))
+    index.search('asha')
+    students.append({'id': 2, 'first_name': 'Asha', 'last_name': 'Iyer'})
+    index.remove(99)
+    assert {r['id'] for r in index.search('asha')} == {1, 2}
+
+
+def test_dashboard_rewarms_after_another_process_bump_despite_its_own(tmp_path):
+    warms = []
+
+    def loader(since):
+        warms.append(since)
+        return Warmup()
+
+    dashboard = Rollups(loader, signal=RacingSignal(str(tmp_path / 'dashboard.signal')))
+    dashboard.record_event('marks', "Marks updated")
+    dashboard.record_event('marks', "Marks updated")
+    assert len(warms) == 2
+
+
+def test_bump_reports_whether_the_seen_token_was_current(tmp_path):
+    signal = FileSignal(str(tmp_path / 'x.signal'))
+    signal.bump()
+    seen = signal.token()
+    seen = signal.bump(seen)
+    assert seen == signal.token()
+    stale = seen
+    FileSignal(signal.path).bump()
+    assert signal.bump(stale) == stale != signal.token()